@@ -0,0 +1,307 @@
+"""
+Admission Control for the AAP Authorization Server Token Endpoint
+
+Keeps one client or operator from saturating signing CPU:
+
+- Per-client and per-operator token buckets on issuance and exchange,
+  charged only once the caller is authenticated (rejections: 429 with
+  ``Retry-After`` = time until the bucket refills).
+- A global cap on concurrent token computations. Excess requests wait in a
+  FIFO queue; when the queue is full, or a caller holds more than its fair
+  share of queue slots, the request is shed (503 with ``Retry-After``
+  estimated from queue depth and recent service time). The cap applies
+  before authentication, so the server keys callers by peer address.
+
+The fair share is ``queue_depth / callers currently waiting``. When the queue
+is full, a caller under its share preempts the newest waiter of the caller
+furthest over its share, so under overload a single bursty caller is shed
+first while others still get queued.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from common.metrics import REGISTRY
+
+
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "aap_admission_rejections_total",
+    "Token endpoint requests refused by admission control",
+    ("reason",),
+)
+
+
+class AdmissionRejected(Exception):
+    """Request rejected by admission control"""
+
+    def __init__(self, http_status: int, error: str, description: str, retry_after: float):
+        self.http_status = http_status
+        self.error = error
+        self.description = description
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(description)
+
+
+class TokenBucket:
+    """Token bucket (not thread-safe; guarded by the owning limiter)"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def try_acquire(self, now: float) -> float:
+        """
+        Take one token
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class KeyedRateLimiter:
+    """Token buckets keyed by client or operator, at most max_keys (least recently used dropped)"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        """
+        Initialize limiter
+
+        Args:
+            rate: Sustained requests per second per key
+            burst: Bucket size (requests allowed at once)
+            max_keys: Buckets kept; the least recently used is dropped beyond it
+        """
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Take one token for a key
+
+        Returns:
+            0 if allowed, otherwise seconds until the key may retry
+        """
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.try_acquire(now)
+
+
+class _Ticket:
+    """A request waiting for a concurrency slot"""
+
+    __slots__ = ("client_id", "event", "granted", "shed")
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.event = threading.Event()
+        self.granted = False
+        self.shed = False
+
+
+class AdmissionController:
+    """Quotas plus a global concurrency cap with fair load shedding"""
+
+    def __init__(
+        self,
+        max_concurrent: int = 0,
+        queue_depth: int = 64,
+        queue_timeout: float = 2.0,
+        client_rate: float = 0.0,
+        client_burst: float = 10.0,
+        operator_rate: float = 0.0,
+        operator_burst: float = 50.0,
+    ):
+        """
+        Initialize admission controller
+
+        Args:
+            max_concurrent: Concurrent token computations (0: unlimited)
+            queue_depth: Requests allowed to wait for a slot before shedding
+            queue_timeout: Seconds a queued request waits before it is shed
+            client_rate: Requests per second per client (0: no client quota)
+            client_burst: Client bucket size
+            operator_rate: Tokens per second per operator (0: no operator quota)
+            operator_burst: Operator bucket size
+        """
+        self.max_concurrent = max_concurrent
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.client_limiter = KeyedRateLimiter(client_rate, client_burst) if client_rate > 0 else None
+        self.operator_limiter = (
+            KeyedRateLimiter(operator_rate, operator_burst) if operator_rate > 0 else None
+        )
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue: Deque[_Ticket] = deque()
+        self._queued_per_client: Dict[str, int] = {}
+        self._service_time = 0.05  # EWMA of seconds per token computation
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_concurrent or self.client_limiter or self.operator_limiter)
+
+    @property
+    def in_flight(self) -> int:
+        """Requests holding a concurrency slot (0 when the cap is off)"""
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        """Requests waiting for a slot"""
+        return len(self._queue)
+
+    def charge_client(self, client_id: str):
+        """
+        Apply the per-client quota (called once the client is authenticated)
+
+        Raises:
+            AdmissionRejected: 429 if the client is over quota
+        """
+        if self.client_limiter is None:
+            return
+        retry_after = self.client_limiter.acquire(client_id)
+        if retry_after:
+            ADMISSION_REJECTIONS.inc("client_quota")
+            raise AdmissionRejected(
+                429, "slow_down", "Client token request quota exceeded", retry_after
+            )
+
+    def charge_operator(self, operator: str):
+        """
+        Apply the per-operator quota (called once the operator is known)
+
+        Raises:
+            AdmissionRejected: 429 if the operator is over quota
+        """
+        if self.operator_limiter is None:
+            return
+        retry_after = self.operator_limiter.acquire(operator)
+        if retry_after:
+            ADMISSION_REJECTIONS.inc("operator_quota")
+            raise AdmissionRejected(
+                429, "slow_down", "Operator token issuance quota exceeded", retry_after
+            )
+
+    @contextmanager
+    def slot(self, client_id: str) -> Iterator[None]:
+        """
+        Hold one of the global concurrency slots
+
+        Raises:
+            AdmissionRejected: 503 if the request is shed
+        """
+        if not self.max_concurrent:
+            yield
+            return
+
+        self._acquire_slot(client_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release_slot(time.monotonic() - started)
+
+    def _acquire_slot(self, client_id: str):
+        """Take a slot now, or wait in the FIFO queue for one"""
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._queue:
+                self._in_flight += 1
+                return
+
+            waiting_clients = len(self._queued_per_client) + (
+                0 if client_id in self._queued_per_client else 1
+            )
+            fair_share = max(1, self.queue_depth // waiting_clients)
+            if self._queued_per_client.get(client_id, 0) >= fair_share:
+                raise self._overloaded(len(self._queue))
+            if len(self._queue) >= self.queue_depth and not self._preempt(fair_share):
+                raise self._overloaded(len(self._queue))
+
+            ticket = _Ticket(client_id)
+            self._queue.append(ticket)
+            self._queued_per_client[client_id] = self._queued_per_client.get(client_id, 0) + 1
+
+        ticket.event.wait(self.queue_timeout)
+
+        with self._lock:
+            if ticket.granted:
+                return  # Slot was handed over by _release_slot (in_flight already counted)
+            if not ticket.shed:
+                self._queue.remove(ticket)
+                self._dequeued(client_id)
+            raise self._overloaded(len(self._queue))
+
+    def _preempt(self, fair_share: int) -> bool:
+        """
+        Shed the newest waiter of the client furthest over its fair share (caller holds the lock)
+
+        Returns:
+            True if a queue slot was freed
+        """
+        heaviest = max(self._queued_per_client, key=self._queued_per_client.get)
+        if self._queued_per_client[heaviest] <= fair_share:
+            return False
+
+        for ticket in reversed(self._queue):
+            if ticket.client_id == heaviest:
+                self._queue.remove(ticket)
+                self._dequeued(heaviest)
+                ticket.shed = True
+                ticket.event.set()
+                return True
+        return False
+
+    def _release_slot(self, elapsed: float):
+        """Return a slot, handing it to the oldest waiter if any"""
+        with self._lock:
+            self._service_time = 0.9 * self._service_time + 0.1 * elapsed
+            if self._queue:
+                ticket = self._queue.popleft()
+                self._dequeued(ticket.client_id)
+                ticket.granted = True  # Slot passes to the waiter; in_flight unchanged
+                ticket.event.set()
+            else:
+                self._in_flight -= 1
+
+    def _dequeued(self, client_id: str):
+        """Update per-client queue accounting (caller holds the lock)"""
+        remaining = self._queued_per_client[client_id] - 1
+        if remaining:
+            self._queued_per_client[client_id] = remaining
+        else:
+            del self._queued_per_client[client_id]
+
+    def _overloaded(self, queued: int) -> AdmissionRejected:
+        """503 with Retry-After from queue depth and service time (caller holds the lock)"""
+        ADMISSION_REJECTIONS.inc("overloaded")
+        retry_after = (queued + 1) * self._service_time / self.max_concurrent
+        return AdmissionRejected(
+            503, "temporarily_unavailable", "Token endpoint is overloaded", retry_after
+        )
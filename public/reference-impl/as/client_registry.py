@@ -0,0 +1,367 @@
+"""
+Client Registry for AAP Authorization Server
+
+Stores registered clients (client_id -> salted PBKDF2-SHA256 secret hash,
+allowed operators, allowed audiences) in a JSON file or an SQLite database.
+
+Verifying a slow hash on every token request would make PBKDF2 the hot spot,
+so successful verifications are cached:
+
+- The cache key is HMAC-SHA256(process-local random key, client_id || secret),
+  so neither secrets nor offline-verifiable digests of them are kept in memory.
+- Entries expire after a TTL, the cache is bounded (LRU), and the whole cache
+  is dropped whenever the registry file changes (checked at most once per
+  ``reload_interval``) or a client is registered/removed through this object.
+- Failed verifications are never cached.
+
+Unknown client_ids are checked against a dummy hash with the same iteration
+count, so response time does not reveal which clients exist. A registry file
+that fails to parse on reload is logged and ignored: the last good registry
+stays in use until the file is fixed.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+from common.metrics import CACHE_REQUESTS
+
+
+PBKDF2_ITERATIONS = 600_000
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# Verified in place of unknown clients' hashes (random salt and digest: matches nothing)
+DUMMY_SECRET_HASH = "$".join(
+    [
+        "pbkdf2_sha256",
+        str(PBKDF2_ITERATIONS),
+        base64.b64encode(secrets.token_bytes(16)).decode("ascii"),
+        base64.b64encode(secrets.token_bytes(32)).decode("ascii"),
+    ]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def hash_secret(secret: str, iterations: int = PBKDF2_ITERATIONS) -> str:
+    """
+    Hash a client secret
+
+    Returns:
+        ``pbkdf2_sha256$<iterations>$<salt>$<hash>`` (base64 salt and hash)
+    """
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", secret.encode("utf-8"), salt, iterations)
+    return "$".join(
+        [
+            "pbkdf2_sha256",
+            str(iterations),
+            base64.b64encode(salt).decode("ascii"),
+            base64.b64encode(digest).decode("ascii"),
+        ]
+    )
+
+
+def verify_secret(secret: str, encoded: str) -> bool:
+    """Check a client secret against its stored hash (constant-time compare; False if malformed)"""
+    try:
+        scheme, iterations, salt, expected = encoded.split("$")
+        if scheme != "pbkdf2_sha256":
+            return False
+        salt_bytes = base64.b64decode(salt, validate=True)
+        expected_bytes = base64.b64decode(expected, validate=True)
+        digest = hashlib.pbkdf2_hmac("sha256", secret.encode("utf-8"), salt_bytes, int(iterations))
+    except (ValueError, OverflowError):  # binascii.Error is a ValueError
+        return False
+    return hmac.compare_digest(digest, expected_bytes)
+
+
+@dataclass
+class ClientRecord:
+    """A registered client"""
+
+    client_id: str
+    secret_hash: str = ""
+    allowed_operators: List[str] = field(default_factory=list)
+    allowed_audiences: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, client_id: str, data: Dict[str, Any]) -> "ClientRecord":
+        """
+        Create record from its registry entry
+
+        Raises:
+            ValueError: If the entry is not a map of a string hash and string lists
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Client {client_id!r}: entry must be an object")
+        record = cls(
+            client_id=client_id,
+            secret_hash=data.get("secret_hash", ""),
+            allowed_operators=data.get("allowed_operators", []),
+            allowed_audiences=data.get("allowed_audiences", []),
+        )
+        if not isinstance(record.secret_hash, str):
+            raise ValueError(f"Client {client_id!r}: secret_hash must be a string")
+        for name in ("allowed_operators", "allowed_audiences"):
+            values = getattr(record, name)
+            if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+                raise ValueError(f"Client {client_id!r}: {name} must be a list of strings")
+        return record
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to registry entry"""
+        return {
+            "secret_hash": self.secret_hash,
+            "allowed_operators": self.allowed_operators,
+            "allowed_audiences": self.allowed_audiences,
+        }
+
+    def allows_operator(self, operator: str) -> bool:
+        return "*" in self.allowed_operators or operator in self.allowed_operators
+
+    def allows_audience(self, audience: str) -> bool:
+        return "*" in self.allowed_audiences or audience in self.allowed_audiences
+
+
+class ClientRegistry:
+    """File- or SQLite-backed client registry with a verified-credential cache"""
+
+    def __init__(
+        self,
+        path: str,
+        cache_ttl: float = 300,
+        cache_size: int = 10_000,
+        reload_interval: float = 1.0,
+    ):
+        """
+        Initialize client registry
+
+        Args:
+            path: JSON file, or SQLite database (.db, .sqlite, .sqlite3)
+            cache_ttl: Seconds a verified credential stays cached
+            cache_size: Maximum cached credentials
+            reload_interval: Minimum seconds between registry change checks
+        """
+        self.path = path
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.reload_interval = reload_interval
+        self.use_sqlite = path.endswith(SQLITE_SUFFIXES)
+
+        self._lock = threading.Lock()
+        self._cache_key = secrets.token_bytes(32)
+        self._cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+        self._clients: Dict[str, ClientRecord] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._check_reload(force=True, keep_last_good=False)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def clients(self) -> List[ClientRecord]:
+        """All registered clients, sorted by client_id"""
+        self._check_reload()
+        return [self._clients[client_id] for client_id in sorted(self._clients)]
+
+    def get(self, client_id: str) -> Optional[ClientRecord]:
+        """Look up a client (reloads the registry if it changed)"""
+        self._check_reload()
+        return self._clients.get(client_id)
+
+    def authenticate(self, client_id: str, secret: str) -> Optional[ClientRecord]:
+        """
+        Verify client credentials
+
+        Returns:
+            Client record if the credentials are valid, None otherwise
+        """
+        self._check_reload()
+        key = hmac.new(
+            self._cache_key, client_id.encode("utf-8") + b"\0" + secret.encode("utf-8"), "sha256"
+        ).digest()
+        now = time.monotonic()
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[0] > now and cached[1] == client_id:
+                    self._cache.move_to_end(key)
+                    CACHE_REQUESTS.inc("client_credentials", "hit")
+                    return self._clients.get(client_id)
+                del self._cache[key]
+            clients = self._clients
+
+        CACHE_REQUESTS.inc("client_credentials", "miss")
+
+        client = clients.get(client_id)
+        if client is None:
+            # Same work as a wrong secret, so unknown client_ids cannot be told apart
+            verify_secret(secret, DUMMY_SECRET_HASH)
+            return None
+        if not verify_secret(secret, client.secret_hash):
+            return None
+
+        with self._lock:
+            # Skip caching if the registry was reloaded while we were hashing
+            if self._clients is clients:
+                self._cache[key] = (now + self.cache_ttl, client_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return client
+
+    def register(
+        self,
+        client_id: str,
+        secret: str,
+        allowed_operators: List[str],
+        allowed_audiences: List[str],
+    ) -> ClientRecord:
+        """Add or replace a client and persist the registry"""
+        record = ClientRecord(client_id, hash_secret(secret), allowed_operators, allowed_audiences)
+        if self.use_sqlite:
+            with self._database() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO clients VALUES (?, ?, ?, ?)",
+                    (
+                        client_id,
+                        record.secret_hash,
+                        json.dumps(allowed_operators),
+                        json.dumps(allowed_audiences),
+                    ),
+                )
+        else:
+            clients = dict(self._clients)
+            clients[client_id] = record
+            self._write_json(clients)
+        self._check_reload(force=True)
+        return record
+
+    def remove(self, client_id: str) -> bool:
+        """Remove a client and persist the registry"""
+        if client_id not in self._clients:
+            return False
+        if self.use_sqlite:
+            with self._database() as db:
+                db.execute("DELETE FROM clients WHERE client_id = ?", (client_id,))
+        else:
+            clients = dict(self._clients)
+            del clients[client_id]
+            self._write_json(clients)
+        self._check_reload(force=True)
+        return True
+
+    def invalidate(self):
+        """Drop all cached verifications"""
+        with self._lock:
+            self._cache.clear()
+
+    def _check_reload(self, force: bool = False, keep_last_good: bool = True):
+        """
+        Reload clients and drop the cache if the registry changed on disk
+
+        Args:
+            force: Reload even if the registry looks unchanged
+            keep_last_good: Log a registry that fails to load and keep the
+                current clients (until the registry changes again) instead of raising
+        """
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+
+        stamp = self._file_stamp()
+        if not force and stamp == self._stamp:
+            return
+
+        try:
+            clients = self._load()
+        except (OSError, ValueError, TypeError, AttributeError, sqlite3.Error) as e:
+            if not keep_last_good:
+                raise
+            logger.error(
+                "Client registry %s failed to load, keeping last good registry: %s", self.path, e
+            )
+            self._stamp = stamp  # Logged once per change, not on every check
+            return
+        with self._lock:
+            self._clients = clients
+            self._stamp = stamp
+            self._cache.clear()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of the registry, including an SQLite WAL file"""
+        stamp = (0, 0)
+        for path in (self.path, self.path + "-wal") if self.use_sqlite else (self.path,):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stamp = (max(stamp[0], st.st_mtime_ns), stamp[1] + st.st_size)
+        return stamp
+
+    def _load(self) -> Dict[str, ClientRecord]:
+        """Read all clients from the registry"""
+        if self.use_sqlite:
+            with self._database() as db:
+                rows = db.execute(
+                    "SELECT client_id, secret_hash, allowed_operators, allowed_audiences FROM clients"
+                ).fetchall()
+            return {
+                row[0]: ClientRecord.from_dict(
+                    row[0],
+                    {
+                        "secret_hash": row[1],
+                        "allowed_operators": json.loads(row[2]),
+                        "allowed_audiences": json.loads(row[3]),
+                    },
+                )
+                for row in rows
+            }
+
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get("clients", {}), dict):
+            raise ValueError("Registry must be an object with a \"clients\" object")
+        return {
+            client_id: ClientRecord.from_dict(client_id, entry)
+            for client_id, entry in data.get("clients", {}).items()
+        }
+
+    @contextmanager
+    def _database(self) -> Iterator[sqlite3.Connection]:
+        """Open the SQLite registry in a transaction, creating the table if needed"""
+        db = sqlite3.connect(self.path)
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS clients ("
+                    "client_id TEXT PRIMARY KEY, secret_hash TEXT NOT NULL, "
+                    "allowed_operators TEXT NOT NULL, allowed_audiences TEXT NOT NULL)"
+                )
+                yield db
+        finally:
+            db.close()
+
+    def _write_json(self, clients: Dict[str, ClientRecord]):
+        """Atomically rewrite the JSON registry"""
+        data = {"clients": {cid: record.to_dict() for cid, record in sorted(clients.items())}}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
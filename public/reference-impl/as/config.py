@@ -32,16 +32,73 @@ class ASConfig:
             "AAP_PUBLIC_KEY_PATH", "keys/as_public_key.pem"
         )
         self.key_id = os.getenv("AAP_KEY_ID", "aap-as-key-1")
+        self.token_format = os.getenv("AAP_TOKEN_FORMAT", "jwt")  # jwt, cwt, or reference
 
         # Policy configuration
         self.policy_path = os.getenv("AAP_POLICY_PATH", "policies")
+        # "reference" scans policies on every request; "compiled" uses an action
+        # index and an evaluation cache (same grants)
+        self.policy_engine = os.getenv("AAP_POLICY_ENGINE", "reference")
+        self.policy_cache_size = int(os.getenv("AAP_POLICY_CACHE_SIZE", "10000"))
         self.default_max_delegation_depth = int(
             os.getenv("AAP_DEFAULT_MAX_DELEGATION_DEPTH", "2")
         )
+        # "full" keeps every hop in delegation.chain; "digest" keeps the last
+        # delegation_chain_tail hops plus a rolling chain_digest
+        self.delegation_chain_mode = os.getenv("AAP_DELEGATION_CHAIN_MODE", "full")
+        self.delegation_chain_tail = int(os.getenv("AAP_DELEGATION_CHAIN_TAIL", "3"))
+        if self.delegation_chain_tail < 1:
+            raise ValueError("AAP_DELEGATION_CHAIN_TAIL must be at least 1")
+
+        # Issuance coalescing: identical concurrent client-credentials requests
+        # share one signature; a reuse window returns a recently minted token
+        self.issue_coalescing = os.getenv("AAP_ISSUE_COALESCING", "false").lower() == "true"
+        self.issue_reuse_window = float(os.getenv("AAP_ISSUE_REUSE_WINDOW", "0"))
+
+        # Admission control on /token (0 disables each limit)
+        self.max_concurrent_issuance = int(os.getenv("AAP_MAX_CONCURRENT_ISSUANCE", "0"))
+        self.issuance_queue_depth = int(os.getenv("AAP_ISSUANCE_QUEUE_DEPTH", "64"))
+        self.issuance_queue_timeout = float(os.getenv("AAP_ISSUANCE_QUEUE_TIMEOUT", "2.0"))
+        self.client_token_rate = float(os.getenv("AAP_CLIENT_TOKEN_RATE", "0"))  # per second
+        self.client_token_burst = float(os.getenv("AAP_CLIENT_TOKEN_BURST", "10"))
+        self.operator_token_rate = float(os.getenv("AAP_OPERATOR_TOKEN_RATE", "0"))  # per second
+        self.operator_token_burst = float(os.getenv("AAP_OPERATOR_TOKEN_BURST", "50"))
+
+        # Client registry (JSON file or SQLite database). When unset, the demo
+        # behaviour applies: any client_id with client_secret "secret" is accepted
+        self.client_registry_path = os.getenv("AAP_CLIENT_REGISTRY_PATH", "")
+        self.client_cache_ttl = float(os.getenv("AAP_CLIENT_CACHE_TTL", "300"))
+        self.client_cache_size = int(os.getenv("AAP_CLIENT_CACHE_SIZE", "10000"))
 
         # Revocation configuration
         self.enable_revocation = os.getenv("AAP_ENABLE_REVOCATION", "true").lower() == "true"
         self.revocation_cache_ttl = int(os.getenv("AAP_REVOCATION_CACHE_TTL", "300"))
+        # Seconds revocations are kept past token expiry; at least the RS clock skew tolerance
+        self.revocation_grace = int(os.getenv("AAP_REVOCATION_GRACE", "300"))
+        # Registered clients that may revoke by task_id or any agent_id (other
+        # clients may only revoke their own tokens and their own agent)
+        self.revocation_admin_clients = [
+            c for c in os.getenv("AAP_REVOCATION_ADMIN_CLIENTS", "").split(",") if c
+        ]
+        self.lineage_max_entries = int(os.getenv("AAP_LINEAGE_MAX_ENTRIES", "1000000"))
+
+        # Reference tokens and introspection (RFC 7662)
+        self.reference_token_max_entries = int(
+            os.getenv("AAP_REFERENCE_TOKEN_MAX_ENTRIES", "1000000")
+        )
+        # Bearer credential Resource Servers present to /introspect. Without one the
+        # endpoint refuses every call unless explicitly opened (local testing only)
+        self.introspection_token = os.getenv("AAP_INTROSPECTION_TOKEN", "")
+        self.introspection_open = os.getenv("AAP_INTROSPECTION_OPEN", "false").lower() == "true"
+
+        # Audit pipeline: events are queued and written by a background thread to
+        # rotated JSONL segments under audit_log_dir (unset: no audit log)
+        self.audit_log_dir = os.getenv("AAP_AUDIT_LOG_DIR", "")
+        self.audit_queue_size = int(os.getenv("AAP_AUDIT_QUEUE_SIZE", "10000"))
+        self.audit_overflow = os.getenv("AAP_AUDIT_OVERFLOW", "drop_newest")  # or drop_oldest, block
+        self.audit_max_segment_mb = float(os.getenv("AAP_AUDIT_MAX_SEGMENT_MB", "64"))
+        self.audit_rotate_seconds = float(os.getenv("AAP_AUDIT_ROTATE_SECONDS", "3600"))
+        self.audit_compress = os.getenv("AAP_AUDIT_COMPRESS", "false").lower() == "true"
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert configuration to dictionary"""
@@ -52,7 +109,11 @@ class ASConfig:
             "default_token_lifetime": self.default_token_lifetime,
             "signing_algorithm": self.signing_algorithm,
             "key_id": self.key_id,
+            "token_format": self.token_format,
+            "policy_engine": self.policy_engine,
             "default_max_delegation_depth": self.default_max_delegation_depth,
+            "delegation_chain_mode": self.delegation_chain_mode,
+            "enable_revocation": self.enable_revocation,
         }
 
 
@@ -0,0 +1,210 @@
+"""
+Delegation Lineage Index for AAP Authorization Server
+
+Links derived tokens to their parents (``delegation.parent_jti``) so that
+revoking a token can cascade to every descendant in one revocation delta.
+
+Only tokens that take part in delegation are indexed: a node is created for a
+derived token and for its parent. Each node is kept until its own expiry and
+that of all its descendants has passed (a derived token may outlive its
+parent), and is dropped through time buckets so purging costs O(expired).
+Live nodes are never evicted: cascading revocation would silently miss the
+evicted subtree. When the index is full, ``record`` raises ``LineageFull`` and
+the AS refuses to issue the derived token until entries expire.
+
+In ``digest`` delegation chain mode, tokens carry only the last hops of
+``delegation.chain`` plus a rolling ``chain_digest``; the index keeps each
+token's digest so a presented chain can be checked against the AS's records.
+"""
+
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from common.dpop import b64url
+from common.metrics import REGISTRY
+
+
+LINEAGE_REFUSALS = REGISTRY.counter(
+    "aap_lineage_refusals_total",
+    "Derived tokens refused because the delegation lineage index was full",
+)
+
+
+class LineageFull(Exception):
+    """Lineage index at capacity; derived tokens cannot be tracked"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__("Delegation lineage index is full; retry later")
+
+
+def extend_chain_digest(digest: Optional[str], hop: str) -> str:
+    """
+    Extend a rolling delegation chain digest by one hop
+
+    digest_0 = b64url(SHA-256(hop_0)); digest_n = b64url(SHA-256(digest_{n-1} || hop_n)).
+    Digests have a fixed length, so the concatenation is unambiguous.
+    """
+    return b64url(hashlib.sha256(((digest or "") + hop).encode("utf-8")).digest())
+
+
+def chain_digest(chain: List[str]) -> str:
+    """Rolling digest of a full delegation chain"""
+    digest = None
+    for hop in chain:
+        digest = extend_chain_digest(digest, hop)
+    return digest
+
+
+class _Node:
+    """Lineage entry for one token"""
+
+    __slots__ = ("exp", "keep_until", "parent", "children", "digest")
+
+    def __init__(self, exp: int, parent: Optional[str] = None, digest: Optional[str] = None):
+        self.exp = exp
+        self.keep_until = exp
+        self.parent = parent
+        self.children: List[str] = []
+        self.digest = digest
+
+
+class DelegationLineage:
+    """Memory-bounded parent jti -> child jtis index with expiry"""
+
+    def __init__(self, max_entries: int = 1_000_000, bucket_seconds: int = 60):
+        """
+        Initialize lineage index
+
+        Args:
+            max_entries: Upper bound on indexed tokens; recording beyond it
+                raises LineageFull
+            bucket_seconds: Granularity of expiry buckets
+        """
+        self.max_entries = max_entries
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, _Node] = {}
+        self._buckets: Dict[int, List[str]] = defaultdict(list)  # bucket -> jtis
+        self._last_purge_bucket = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def record(
+        self,
+        jti: str,
+        exp: int,
+        parent_jti: str,
+        parent_exp: int,
+        digest: Optional[str] = None,
+        parent_digest: Optional[str] = None,
+    ):
+        """
+        Record a derived token
+
+        Args:
+            jti: Derived token identifier
+            exp: Derived token expiration
+            parent_jti: Parent token identifier
+            parent_exp: Parent token expiration
+            digest: Delegation chain digest of the derived token
+            parent_digest: Delegation chain digest of the parent token
+
+        Raises:
+            LineageFull: If the index holds max_entries live tokens
+        """
+        with self._lock:
+            now = int(time.time())
+            if now // self.bucket_seconds > self._last_purge_bucket:
+                self._purge(now)
+
+            added = (jti not in self._nodes) + (parent_jti not in self._nodes)
+            if len(self._nodes) + added > self.max_entries:
+                LINEAGE_REFUSALS.inc()
+                # Earliest time a bucket can be purged
+                next_bucket = min(self._buckets, default=now // self.bucket_seconds) + 1
+                raise LineageFull(max(1, next_bucket * self.bucket_seconds - now))
+
+            parent = self._nodes.get(parent_jti)
+            if parent is None:
+                parent = self._nodes[parent_jti] = _Node(parent_exp, digest=parent_digest)
+                self._schedule(parent_jti, parent_exp)
+            parent.children.append(jti)
+
+            self._nodes[jti] = _Node(exp, parent_jti, digest)
+            self._schedule(jti, exp)
+
+            # Ancestors must outlive their longest-lived descendant
+            ancestor_jti, ancestor = parent_jti, parent
+            while ancestor is not None and ancestor.keep_until < exp:
+                ancestor.keep_until = exp
+                self._schedule(ancestor_jti, exp)
+                ancestor_jti = ancestor.parent
+                ancestor = self._nodes.get(ancestor_jti) if ancestor_jti else None
+
+    def chain_digest(self, jti: str) -> Optional[str]:
+        """Recorded delegation chain digest of a token (None if unknown)"""
+        node = self._nodes.get(jti)
+        return node.digest if node else None
+
+    def descendants(self, jti: str, now: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        All live descendants of a token
+
+        Args:
+            jti: Root of the walk
+            now: Current time (default: time.time())
+
+        Returns:
+            List of (jti, exp) pairs for unexpired descendants
+        """
+        now = now if now is not None else int(time.time())
+        result: List[Tuple[str, int]] = []
+
+        with self._lock:
+            root = self._nodes.get(jti)
+            stack = list(root.children) if root else []
+            while stack:
+                child_jti = stack.pop()
+                child = self._nodes.get(child_jti)
+                if child is None:
+                    continue
+                if child.exp > now:
+                    result.append((child_jti, child.exp))
+                stack.extend(child.children)
+
+        return result
+
+    def purge_expired(self, now: Optional[int] = None):
+        """Drop entries whose subtree has fully expired"""
+        with self._lock:
+            self._purge(now if now is not None else int(time.time()))
+
+    def _schedule(self, jti: str, keep_until: int):
+        """Place a jti in the bucket of its keep-until time (caller holds the lock)"""
+        self._buckets[keep_until // self.bucket_seconds].append(jti)
+
+    def _purge(self, now: int):
+        """
+        Drop expired buckets (caller holds the lock)
+
+        Buckets may hold stale jtis that were rescheduled later; those are
+        skipped by comparing against the node's current keep_until.
+        """
+        current_bucket = now // self.bucket_seconds
+        self._last_purge_bucket = current_bucket
+
+        for bucket in sorted(self._buckets):
+            if bucket >= current_bucket:
+                break
+
+            for jti in self._buckets.pop(bucket):
+                node = self._nodes.get(jti)
+                if node is None:
+                    continue
+                if node.keep_until // self.bucket_seconds <= bucket:
+                    del self._nodes[jti]
@@ -2,13 +2,31 @@
 Policy Engine for AAP Authorization Server
 
 Evaluates operator policies to determine which capabilities to grant to agents.
+
+Policies can grant action namespaces (``cms.*``); a requested action is
+granted by the most specific capability covering it (see common/actions.py).
+
+Policy files are checked against the AAP policy schema
+(public/schemas/aap-policy.schema.json) once, when they are loaded; a policy
+that does not match is reported and skipped.
+
+``PolicyEngine`` is the reference implementation: every evaluation scans the
+operator's capability list. ``CompiledPolicyEngine`` (opt-in) returns the same
+grants from an action index built at load time and an LRU of evaluations;
+scripts/differential_check.py checks the two agree.
 """
 
 import json
 import os
-from typing import Dict, List, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 
+from common.actions import ActionTrie, action_permitted, most_specific, namespace_prefix
+from common.metrics import CACHE_REQUESTS
+from common.schemas import POLICY_SCHEMA, get_validator, schema_error
+
 
 @dataclass
 class Capability:
@@ -31,6 +49,72 @@ class Capability:
         return result
 
 
+@dataclass
+class PurposeRules:
+    """
+    Purpose-based capability rules of a policy, indexed at load time
+
+    Narrows the actions granted for a task. The rule for the exact task
+    purpose applies first, then the rule for the task category, then the
+    default. Without a default, tasks matching no rule are not narrowed.
+    Rules may permit namespaces (``cms.*``).
+
+    Policy format::
+
+        "purpose_rules": {
+            "purposes": {"research_climate_data": ["search.web", "data.analyze"]},
+            "categories": {"content-creation": ["search.web", "cms.create_draft"]},
+            "default": ["search.web"]
+        }
+    """
+
+    purposes: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    categories: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    default: Optional[FrozenSet[str]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PurposeRules":
+        """
+        Compile purpose rules from a policy's ``purpose_rules``
+
+        Raises:
+            ValueError: If the rules are malformed
+        """
+        if not isinstance(data, dict):
+            raise ValueError("purpose_rules must be an object")
+
+        def actions(value: Any, where: str) -> FrozenSet[str]:
+            if not isinstance(value, list) or not all(isinstance(a, str) for a in value):
+                raise ValueError(f"purpose_rules.{where} must be a list of action names")
+            return frozenset(value)
+
+        def rules(name: str) -> Dict[str, FrozenSet[str]]:
+            value = data.get(name, {})
+            if not isinstance(value, dict):
+                raise ValueError(f"purpose_rules.{name} must be an object")
+            return {key: actions(acts, f"{name}.{key}") for key, acts in value.items()}
+
+        return cls(
+            purposes=rules("purposes"),
+            categories=rules("categories"),
+            default=actions(data["default"], "default") if "default" in data else None,
+        )
+
+    def allowed_actions(
+        self, purpose: Optional[str], category: Optional[str] = None
+    ) -> Optional[FrozenSet[str]]:
+        """
+        Actions permitted for a task (at most two dict lookups)
+
+        Returns:
+            Set of permitted actions, or None if the task is not narrowed
+        """
+        allowed = self.purposes.get(purpose) if isinstance(purpose, str) else None
+        if allowed is None and isinstance(category, str):
+            allowed = self.categories.get(category)
+        return allowed if allowed is not None else self.default
+
+
 @dataclass
 class OperatorPolicy:
     """Represents an operator's authorization policy for agents"""
@@ -45,10 +129,26 @@ class OperatorPolicy:
     token_lifetime: int = 3600
     max_delegation_depth: int = 2
     require_pop: bool = False
+    purpose_rules: Optional[PurposeRules] = None
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "OperatorPolicy":
-        """Create policy from dictionary"""
+    def from_dict(cls, data: Dict[str, Any], validate: bool = True) -> "OperatorPolicy":
+        """
+        Create policy from dictionary
+
+        Args:
+            data: Policy document
+            validate: Check the document against the AAP policy schema
+                (public/schemas/aap-policy.schema.json) first
+
+        Raises:
+            ValueError: If the policy is malformed
+        """
+        if validate:
+            error = schema_error(get_validator(POLICY_SCHEMA), data)
+            if error is not None:
+                raise ValueError(f"Policy does not match the AAP policy schema: {error}")
+
         return cls(
             policy_id=data.get("policy_id", ""),
             policy_version=data.get("policy_version", "1.0"),
@@ -64,20 +164,26 @@ class OperatorPolicy:
                 "max_delegation_depth", 2
             ),
             require_pop=data.get("global_constraints", {}).get("require_pop", False),
+            purpose_rules=(
+                PurposeRules.from_dict(data["purpose_rules"]) if "purpose_rules" in data else None
+            ),
         )
 
 
 class PolicyEngine:
     """Engine for evaluating authorization policies"""
 
-    def __init__(self, policy_dir: str):
+    def __init__(self, policy_dir: str, validate_schema: bool = True):
         """
         Initialize policy engine
 
         Args:
             policy_dir: Directory containing policy JSON files
+            validate_schema: Skip policies that do not match the AAP policy
+                schema (checked once, at load time)
         """
         self.policy_dir = policy_dir
+        self.validate_schema = validate_schema
         self.policies: Dict[str, OperatorPolicy] = {}
         self._load_policies()
 
@@ -93,7 +199,7 @@ class PolicyEngine:
                 try:
                     with open(filepath, "r") as f:
                         policy_data = json.load(f)
-                        policy = OperatorPolicy.from_dict(policy_data)
+                        policy = OperatorPolicy.from_dict(policy_data, validate=self.validate_schema)
                         operator = policy.operator
                         self.policies[operator] = policy
                 except Exception as e:
@@ -116,6 +222,7 @@ class PolicyEngine:
         operator: str,
         requested_capabilities: List[str],
         task_purpose: Optional[str] = None,
+        task_category: Optional[str] = None,
     ) -> List[Capability]:
         """
         Evaluate requested capabilities against operator policy
@@ -123,7 +230,8 @@ class PolicyEngine:
         Args:
             operator: Operator identifier
             requested_capabilities: List of requested action names
-            task_purpose: Task purpose (for future purpose-based filtering)
+            task_purpose: Task purpose (matched against the policy's purpose rules)
+            task_category: Task category (used if no rule names the exact purpose)
 
         Returns:
             List of granted Capability objects
@@ -133,25 +241,44 @@ class PolicyEngine:
             # No policy found; deny all
             return []
 
+        allowed_actions = (
+            policy.purpose_rules.allowed_actions(task_purpose, task_category)
+            if policy.purpose_rules
+            else None
+        )
+
         granted = []
 
         for requested_action in requested_capabilities:
-            # Find matching capability in policy
-            for allowed_cap in policy.allowed_capabilities:
-                if allowed_cap.get("action") == requested_action:
-                    # Capability is allowed
-                    constraints = allowed_cap.get("default_constraints", {}).copy()
+            if allowed_actions is not None and not action_permitted(
+                allowed_actions, requested_action
+            ):
+                continue  # Not permitted for this task's purpose
+
+            # Find the most specific matching capability in policy
+            allowed_cap = most_specific(
+                policy.allowed_capabilities, requested_action, lambda cap: cap.get("action")
+            )
+            if allowed_cap is None:
+                continue
 
-                    # Merge with global constraints
-                    constraints.update(policy.global_constraints)
+            # Capability is allowed
+            constraints = allowed_cap.get("default_constraints", {}).copy()
 
-                    capability = Capability(
-                        action=requested_action,
-                        constraints=constraints,
-                        description=allowed_cap.get("description"),
-                    )
-                    granted.append(capability)
-                    break
+            # Merge with global constraints
+            constraints.update(policy.global_constraints)
+
+            resources = allowed_cap.get("resources")
+            if isinstance(resources, list):
+                resources = resources.copy()
+
+            capability = Capability(
+                action=requested_action,
+                constraints=constraints,
+                description=allowed_cap.get("description"),
+                resources=resources,
+            )
+            granted.append(capability)
 
         return granted
 
@@ -240,3 +367,144 @@ class PolicyEngine:
                         merged[key] = list(set(merged[key]) | set(value))
 
         return merged
+
+
+# Granted capability before it is copied for the caller:
+# (action, constraints, description, resources)
+_CapabilityTemplate = Tuple[str, Dict[str, Any], Optional[str], Any]
+
+
+class CompiledPolicyEngine(PolicyEngine):
+    """
+    Policy engine with precompiled policies
+
+    Grants exactly what PolicyEngine grants. At load time each operator's
+    capabilities are indexed by action with default and global constraints
+    already merged, and namespace capabilities (``cms.*``) go in an action
+    trie, so evaluation is one dict lookup per requested action (plus one per
+    action component for actions granted through a namespace) instead of a
+    scan, and purpose rules are compiled to sets. Evaluations
+    are cached by (operator, requested actions, task purpose, task category);
+    every call returns fresh Capability objects and constraint dicts, as the
+    reference engine does.
+    """
+
+    def __init__(self, policy_dir: str, cache_size: int = 10_000, validate_schema: bool = True):
+        """
+        Initialize policy engine
+
+        Args:
+            policy_dir: Directory containing policy JSON files
+            cache_size: Maximum cached evaluations (0 disables the cache)
+            validate_schema: As for PolicyEngine
+        """
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[Any, ...], Tuple[_CapabilityTemplate, ...]]" = OrderedDict()
+        self._index: Dict[str, Dict[Any, _CapabilityTemplate]] = {}
+        self._namespaces: Dict[str, Optional[ActionTrie]] = {}
+        super().__init__(policy_dir, validate_schema)
+        self._compile()
+
+    def _compile(self):
+        """Build the per-operator action index (and drop cached evaluations)"""
+        index = {}
+        namespaces = {}
+        for operator, policy in self.policies.items():
+            try:
+                actions: Dict[Any, _CapabilityTemplate] = {}
+                for allowed_cap in policy.allowed_capabilities:
+                    action = allowed_cap.get("action")
+                    if action in actions:
+                        continue  # First match wins, as in the scan
+                    constraints = allowed_cap.get("default_constraints", {}).copy()
+                    constraints.update(policy.global_constraints)
+                    actions[action] = (
+                        action,
+                        constraints,
+                        allowed_cap.get("description"),
+                        allowed_cap.get("resources"),
+                    )
+            except (AttributeError, TypeError):
+                # Malformed policy: evaluated by the reference scan instead
+                continue
+            index[operator] = actions
+            wildcards = [t for t in actions.values() if namespace_prefix(t[0]) is not None]
+            namespaces[operator] = ActionTrie(wildcards, lambda t: t[0]) if wildcards else None
+
+        with self._lock:
+            self._index = index
+            self._namespaces = namespaces
+            self._cache.clear()
+
+    def evaluate_capabilities(
+        self,
+        operator: str,
+        requested_capabilities: List[str],
+        task_purpose: Optional[str] = None,
+        task_category: Optional[str] = None,
+    ) -> List[Capability]:
+        """
+        Evaluate requested capabilities against operator policy
+
+        Args:
+            operator: Operator identifier
+            requested_capabilities: List of requested action names
+            task_purpose: Task purpose (matched against the policy's purpose rules)
+            task_category: Task category (used if no rule names the exact purpose)
+
+        Returns:
+            List of granted Capability objects
+        """
+        actions = self._index.get(operator)
+        key = (operator, tuple(requested_capabilities), task_purpose, task_category)
+        try:
+            hash(key)
+        except TypeError:
+            actions = None  # Unhashable action names cannot be looked up
+        if actions is None:
+            return super().evaluate_capabilities(
+                operator, requested_capabilities, task_purpose, task_category
+            )
+
+        with self._lock:
+            templates = self._cache.get(key)
+            if templates is not None:
+                self._cache.move_to_end(key)
+
+        if templates is None:
+            purpose_rules = self.policies[operator].purpose_rules
+            allowed = (
+                purpose_rules.allowed_actions(task_purpose, task_category) if purpose_rules else None
+            )
+            namespaces = self._namespaces.get(operator)
+            matched = []
+            for action in requested_capabilities:
+                if allowed is not None and not action_permitted(allowed, action):
+                    continue
+                template = actions.get(action)
+                if template is None and namespaces is not None and isinstance(action, str):
+                    template = namespaces.find(action)
+                    if template is not None:
+                        template = (action,) + template[1:]  # Granted for the requested action
+                if template is not None:
+                    matched.append(template)
+            templates = tuple(matched)
+            if self.cache_size > 0:
+                with self._lock:
+                    self._cache[key] = templates
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            CACHE_REQUESTS.inc("policy_evaluation", "miss")
+        else:
+            CACHE_REQUESTS.inc("policy_evaluation", "hit")
+
+        return [
+            Capability(
+                action=action,
+                constraints=constraints.copy(),
+                description=description,
+                resources=resources.copy() if isinstance(resources, list) else resources,
+            )
+            for action, constraints, description, resources in templates
+        ]
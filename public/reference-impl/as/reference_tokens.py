@@ -0,0 +1,121 @@
+"""
+Reference Token Store for AAP Authorization Server
+
+With ``AAP_TOKEN_FORMAT=reference`` the AS hands out short opaque handles
+instead of self-contained tokens and keeps the full payload here. Resource
+Servers resolve handles through the introspection endpoint (RFC 7662).
+
+Entries are dropped through expiry time buckets, so purging costs O(expired)
+and memory is bounded by ``max_entries``. Live entries are never evicted: an
+evicted handle would stop introspecting as active while its token is still
+valid. When the store is full, ``store`` raises ``ReferenceStoreFull`` and the
+AS refuses to issue reference tokens until entries expire.
+"""
+
+import secrets
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+
+from common.metrics import REGISTRY
+from common.token_format import REFERENCE_TOKEN_PREFIX
+
+
+REFERENCE_TOKEN_REFUSALS = REGISTRY.counter(
+    "aap_reference_token_refusals_total",
+    "Reference tokens refused because the reference token store was full",
+)
+
+
+class ReferenceStoreFull(Exception):
+    """Reference token store at capacity; new handles cannot be stored"""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__("Reference token store is full; retry later")
+
+
+class ReferenceTokenStore:
+    """In-memory handle -> payload store with expiry"""
+
+    def __init__(self, max_entries: int = 1_000_000, bucket_seconds: int = 60):
+        """
+        Initialize reference token store
+
+        Args:
+            max_entries: Upper bound on stored tokens; storing beyond it
+                raises ReferenceStoreFull
+            bucket_seconds: Granularity of expiry buckets
+        """
+        self.max_entries = max_entries
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[int, List[str]] = defaultdict(list)  # bucket -> handles
+        self._last_purge_bucket = 0
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def store(self, payload: Dict[str, Any]) -> str:
+        """
+        Store a token payload
+
+        Args:
+            payload: Token claims (must contain ``exp``)
+
+        Returns:
+            Opaque reference token (``aapr_`` + 256 random bits)
+
+        Raises:
+            ReferenceStoreFull: If the store holds max_entries live tokens
+        """
+        handle = REFERENCE_TOKEN_PREFIX + secrets.token_urlsafe(32)
+        now = int(time.time())
+
+        with self._lock:
+            if now // self.bucket_seconds > self._last_purge_bucket:
+                self._purge(now)
+
+            if len(self._tokens) >= self.max_entries:
+                REFERENCE_TOKEN_REFUSALS.inc()
+                # Earliest time a bucket can be purged
+                next_bucket = min(self._buckets, default=now // self.bucket_seconds) + 1
+                raise ReferenceStoreFull(max(1, next_bucket * self.bucket_seconds - now))
+
+            self._tokens[handle] = payload
+            self._buckets[payload["exp"] // self.bucket_seconds].append(handle)
+
+        return handle
+
+    def lookup(self, handle: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a reference token
+
+        Returns:
+            Token payload, or None if the handle is unknown or expired
+        """
+        payload = self._tokens.get(handle)
+        if payload is None:
+            return None
+        if payload["exp"] <= (now if now is not None else time.time()):
+            return None
+        return payload
+
+    def purge_expired(self, now: Optional[int] = None):
+        """Drop expired entries"""
+        with self._lock:
+            self._purge(now if now is not None else int(time.time()))
+
+    def _purge(self, now: int):
+        """Drop expired buckets (caller holds the lock)"""
+        current_bucket = now // self.bucket_seconds
+        self._last_purge_bucket = current_bucket
+
+        for bucket in sorted(self._buckets):
+            if bucket >= current_bucket:
+                break
+
+            for handle in self._buckets.pop(bucket):
+                self._tokens.pop(handle, None)
@@ -0,0 +1,226 @@
+"""
+Revocation Store for AAP Authorization Server
+
+Holds revoked token identifiers (jti) and revoked tasks/agents, and publishes
+them to Resource Servers as versioned snapshots plus incremental deltas.
+
+Distribution format (compact, sorted jti array with parallel expirations):
+
+    {
+        "type": "snapshot" | "delta",
+        "epoch": "5f0c2a9e",           # changes when the AS store restarts
+        "version": 42,
+        "from_version": 40,            # deltas only
+        "jtis": ["0a1f...", "9c2e..."],
+        "exp": [1735689600, 1735686000],
+        "tasks": {"task-123": 1735682400},
+        "agents": {"agent-researcher-01": 1735682400},
+        "subject_ttl": 3600
+    }
+
+Task and agent entries map to the revocation time: every token for that task
+or agent issued at or before that time is revoked. Such a token expires at
+most ``subject_ttl`` seconds (the longest token lifetime) after the
+revocation time, so task and agent entries are dropped after that, as jti
+entries are dropped after their token's ``exp``. Both are kept ``grace``
+seconds longer: Resource Servers accept expired tokens within their clock
+skew tolerance, so a snapshot must not un-revoke a token they still accept.
+
+Expired entries are purged at most once per ``purge_interval`` whenever the
+store is revoked into or read, so the store stays bounded whether Resource
+Servers poll snapshots or only deltas.
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+class RevocationStore:
+    """In-memory revocation set with versioned snapshots and deltas"""
+
+    def __init__(
+        self,
+        subject_ttl: int = 3600,
+        max_deltas: int = 1024,
+        purge_interval: float = 60.0,
+        grace: int = 300,
+    ):
+        """
+        Initialize revocation store
+
+        Args:
+            subject_ttl: Seconds to retain task/agent revocations (the longest
+                token lifetime; older tokens have expired anyway)
+            max_deltas: Number of deltas retained; older RS versions get a snapshot
+            purge_interval: Minimum seconds between purges of expired entries
+            grace: Seconds entries are kept past expiry (at least the Resource
+                Servers' clock skew tolerance)
+        """
+        self.subject_ttl = subject_ttl
+        self.grace = grace
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._lock = threading.Lock()
+        self._jtis: Dict[str, int] = {}  # jti -> token exp
+        self._tasks: Dict[str, int] = {}  # task id -> revoked_at
+        self._agents: Dict[str, int] = {}  # agent id -> revoked_at
+        self._deltas: deque = deque(maxlen=max_deltas)  # (version, delta entries)
+
+    def revoke_jti(self, jti: str, exp: int) -> int:
+        """
+        Revoke a single token
+
+        Args:
+            jti: Token identifier
+            exp: Token expiration (entry is dropped after this time)
+
+        Returns:
+            New revocation version
+        """
+        return self.revoke_jtis([(jti, exp)])
+
+    def revoke_jtis(self, entries: Iterable[Tuple[str, int]]) -> int:
+        """
+        Revoke several tokens in one delta
+
+        Args:
+            entries: Iterable of (jti, exp) pairs
+
+        Returns:
+            New revocation version
+        """
+        with self._lock:
+            added = {jti: exp for jti, exp in entries if jti not in self._jtis}
+            if not added:
+                return self.version
+            self._jtis.update(added)
+            return self._record_delta({"jtis": added})
+
+    def revoke_task(self, task_id: str, revoked_at: Optional[int] = None) -> int:
+        """Revoke every token issued for a task up to now"""
+        revoked_at = revoked_at if revoked_at is not None else int(time.time())
+        with self._lock:
+            self._tasks[task_id] = revoked_at
+            return self._record_delta({"tasks": {task_id: revoked_at}})
+
+    def revoke_agent(self, agent_id: str, revoked_at: Optional[int] = None) -> int:
+        """Revoke every token issued to an agent up to now"""
+        revoked_at = revoked_at if revoked_at is not None else int(time.time())
+        with self._lock:
+            self._agents[agent_id] = revoked_at
+            return self._record_delta({"agents": {agent_id: revoked_at}})
+
+    def _record_delta(self, entries: Dict[str, Dict[str, int]]) -> int:
+        """Bump version and append a delta (caller holds the lock)"""
+        self._maybe_purge()
+        self.version += 1
+        self._deltas.append((self.version, entries))
+        return self.version
+
+    def __len__(self) -> int:
+        """Revoked jtis, tasks and agents currently held"""
+        return len(self._jtis) + len(self._tasks) + len(self._agents)
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """
+        Check whether a token payload is revoked
+
+        O(1): one set lookup for the jti and one dict lookup each for task and agent.
+        """
+        if payload.get("jti") in self._jtis:
+            return True
+
+        iat = payload.get("iat", 0)
+
+        task_revoked_at = self._tasks.get((payload.get("task") or {}).get("id"))
+        if task_revoked_at is not None and iat <= task_revoked_at:
+            return True
+
+        agent_revoked_at = self._agents.get((payload.get("agent") or {}).get("id"))
+        if agent_revoked_at is not None and iat <= agent_revoked_at:
+            return True
+
+        return False
+
+    def purge_expired(self, now: Optional[int] = None):
+        """Drop entries that can no longer match a live token"""
+        with self._lock:
+            self._purge(now if now is not None else int(time.time()))
+
+    def _purge(self, now: int):
+        """Drop entries expired for longer than the grace period (caller holds the lock)"""
+        self._next_purge = now + self.purge_interval
+        now -= self.grace
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+        cutoff = now - self.subject_ttl
+        self._tasks = {k: ts for k, ts in self._tasks.items() if ts > cutoff}
+        self._agents = {k: ts for k, ts in self._agents.items() if ts > cutoff}
+
+    def _maybe_purge(self):
+        """Purge if the purge interval has elapsed (caller holds the lock)"""
+        now = time.time()
+        if now >= self._next_purge:
+            self._purge(int(now))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full revocation set at the current version"""
+        with self._lock:
+            self._maybe_purge()
+            return self._encode(
+                "snapshot", self.version, self._jtis, self._tasks, self._agents
+            )
+
+    def changes_since(self, since: Optional[int]) -> Dict[str, Any]:
+        """
+        Revocation changes after a given version
+
+        Args:
+            since: Version the caller already has (None for a full snapshot)
+
+        Returns:
+            A delta if all changes since that version are retained, else a snapshot
+        """
+        with self._lock:
+            self._maybe_purge()
+            oldest = self._deltas[0][0] if self._deltas else self.version + 1
+            if since is not None and oldest - 1 <= since <= self.version:
+                jtis: Dict[str, int] = {}
+                tasks: Dict[str, int] = {}
+                agents: Dict[str, int] = {}
+                for version, entries in self._deltas:
+                    if version <= since:
+                        continue
+                    jtis.update(entries.get("jtis", {}))
+                    tasks.update(entries.get("tasks", {}))
+                    agents.update(entries.get("agents", {}))
+                delta = self._encode("delta", self.version, jtis, tasks, agents)
+                delta["from_version"] = since
+                return delta
+
+        return self.snapshot()
+
+    def _encode(
+        self,
+        kind: str,
+        version: int,
+        jtis: Dict[str, int],
+        tasks: Dict[str, int],
+        agents: Dict[str, int],
+    ) -> Dict[str, Any]:
+        """Encode entries as a sorted jti array with parallel expirations"""
+        sorted_jtis: List[str] = sorted(jtis)
+        return {
+            "type": kind,
+            "epoch": self.epoch,
+            "version": version,
+            "jtis": sorted_jtis,
+            "exp": [jtis[jti] for jti in sorted_jtis],
+            "tasks": dict(tasks),
+            "agents": dict(agents),
+            "subject_ttl": self.subject_ttl,
+        }
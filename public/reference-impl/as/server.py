@@ -2,52 +2,327 @@
 AAP Authorization Server - HTTP Server
 
 Provides OAuth 2.0 endpoints for token issuance and Token Exchange.
+
+The server is built by an application factory (``create_app``). Importing this
+module has no side effects beyond reading environment configuration: policies
+are compiled and signing keys are loaded on the first request, or earlier via
+an explicit ``warm_up()`` (e.g. in a worker ``post_fork`` hook).
 """
 
 import os
 import json
-from flask import Flask, request, jsonify
-from typing import Dict, Any
+import hmac
+import threading
+from flask import Flask, Blueprint, current_app, request, jsonify
+from typing import Dict, Any, List, Optional, Tuple
 
-from .config import config
-from .policy_engine import PolicyEngine
+from .config import ASConfig, config
+from .policy_engine import CompiledPolicyEngine, PolicyEngine
 from .token_issuer import TokenIssuer
+from .revocation import RevocationStore
+from .lineage import DelegationLineage, LineageFull
+from .reference_tokens import ReferenceStoreFull, ReferenceTokenStore
+from .singleflight import IssuanceCoalescer
+from .admission import AdmissionController, AdmissionRejected
+from .client_registry import ClientRegistry, ClientRecord
+from common.audit_log import AuditLog
+from common.metrics import REGISTRY, CONTENT_TYPE, Gauge
+from common.dpop import DPoPVerifier, DPoPError
 
 
-app = Flask(__name__)
+bp = Blueprint("aap_as", __name__)
 
-# Initialize components
-policy_engine = PolicyEngine(config.policy_path)
+TOKEN_REQUESTS = REGISTRY.counter(
+    "aap_token_requests_total",
+    "Token endpoint requests by grant type and outcome",
+    ("grant_type", "outcome"),
+)
+TOKEN_OUTCOMES = {200: "issued", 429: "rate_limited", 503: "shed"}
 
-# Load signing keys
-private_key_path = config.private_key_path
-public_key_path = config.public_key_path
+EXTENSION_KEY = "aap_as"
 
-if not os.path.exists(private_key_path):
-    raise FileNotFoundError(
-        f"Private key not found at {private_key_path}. "
-        "Generate keys using: openssl ecparam -genkey -name prime256v1 -noout -out as_private_key.pem"
-    )
 
-with open(private_key_path, "rb") as f:
-    private_key = f.read()
+def load_signing_keys(cfg: ASConfig) -> Tuple[bytes, bytes]:
+    """
+    Load the AS signing key pair from disk
+
+    Args:
+        cfg: Authorization Server configuration
+
+    Returns:
+        Tuple of (private_key, public_key) in PEM format
+
+    Raises:
+        FileNotFoundError: If the private key does not exist
+    """
+    if not os.path.exists(cfg.private_key_path):
+        raise FileNotFoundError(
+            f"Private key not found at {cfg.private_key_path}. "
+            "Generate keys using: openssl ecparam -genkey -name prime256v1 -noout -out as_private_key.pem"
+        )
+
+    with open(cfg.private_key_path, "rb") as f:
+        private_key = f.read()
+
+    with open(cfg.public_key_path, "rb") as f:
+        public_key = f.read()
+
+    return private_key, public_key
+
+
+class ServerComponents:
+    """Lazily-initialized Authorization Server components"""
+
+    def __init__(self, cfg: ASConfig):
+        """
+        Initialize component holder (no I/O is performed here)
+
+        Args:
+            cfg: Authorization Server configuration
+        """
+        self.config = cfg
+        self._lock = threading.Lock()
+        self._policy_engine: Optional[PolicyEngine] = None
+        self._token_issuer: Optional[TokenIssuer] = None
+        self._issuance: Any = None
+        self._public_key: Optional[bytes] = None
+        self._revocation_store: Optional[RevocationStore] = None
+        self._lineage: Optional[DelegationLineage] = None
+        self._reference_store: Optional[ReferenceTokenStore] = None
+        self._client_registry: Optional[ClientRegistry] = None
+        self._jwks: Optional[Dict[str, Any]] = None
+        self.dpop_verifier = DPoPVerifier()
+        self.admission = AdmissionController(
+            max_concurrent=cfg.max_concurrent_issuance,
+            queue_depth=cfg.issuance_queue_depth,
+            queue_timeout=cfg.issuance_queue_timeout,
+            client_rate=cfg.client_token_rate,
+            client_burst=cfg.client_token_burst,
+            operator_rate=cfg.operator_token_rate,
+            operator_burst=cfg.operator_token_burst,
+        )
+        # Writer thread and segment files are created on the first event
+        self.audit_log: Optional[AuditLog] = None
+        if cfg.audit_log_dir:
+            self.audit_log = AuditLog(
+                cfg.audit_log_dir,
+                prefix="as-audit",
+                max_queue=cfg.audit_queue_size,
+                overflow=cfg.audit_overflow,
+                max_segment_bytes=int(cfg.audit_max_segment_mb * 1024 * 1024),
+                max_segment_seconds=cfg.audit_rotate_seconds,
+                compress=cfg.audit_compress,
+            )
+
+    @property
+    def initialized(self) -> bool:
+        """True once policies are compiled and keys are loaded"""
+        return self._token_issuer is not None
+
+    def init(self):
+        """
+        Compile policies and load signing keys (idempotent, thread-safe)
+
+        Raises:
+            FileNotFoundError: If signing keys are missing
+        """
+        if self._token_issuer is not None:
+            return
+
+        with self._lock:
+            if self._token_issuer is not None:
+                return
+
+            if self.config.policy_engine == "compiled":
+                policy_engine = CompiledPolicyEngine(
+                    self.config.policy_path, cache_size=self.config.policy_cache_size
+                )
+            else:
+                policy_engine = PolicyEngine(self.config.policy_path)
+            private_key, public_key = load_signing_keys(self.config)
+
+            revocation_store = None
+            lineage = None
+            if self.config.enable_revocation:
+                # Keep task/agent revocations as long as the longest-lived token
+                lifetimes = [p.token_lifetime for p in policy_engine.policies.values()]
+                revocation_store = RevocationStore(
+                    subject_ttl=max(lifetimes + [self.config.default_token_lifetime]),
+                    grace=self.config.revocation_grace,
+                )
+                lineage = DelegationLineage(max_entries=self.config.lineage_max_entries)
+
+            client_registry = None
+            if self.config.client_registry_path:
+                client_registry = ClientRegistry(
+                    self.config.client_registry_path,
+                    cache_ttl=self.config.client_cache_ttl,
+                    cache_size=self.config.client_cache_size,
+                )
+
+            reference_store = None
+            if self.config.token_format == "reference":
+                reference_store = ReferenceTokenStore(
+                    max_entries=self.config.reference_token_max_entries
+                )
+
+            self._policy_engine = policy_engine
+            self._public_key = public_key
+            self._revocation_store = revocation_store
+            self._lineage = lineage
+            self._reference_store = reference_store
+            self._client_registry = client_registry
+            token_issuer = TokenIssuer(
+                policy_engine,
+                private_key,
+                self.config.signing_algorithm,
+                cfg=self.config,
+                revocation_store=revocation_store,
+                lineage=lineage,
+                reference_store=reference_store,
+                admission=self.admission if self.admission.enabled else None,
+                audit_log=self.audit_log,
+            )
+            self._issuance = (
+                IssuanceCoalescer(token_issuer, self.config.issue_reuse_window)
+                if self.config.issue_coalescing
+                else token_issuer
+            )
+            # Assigned last: a non-None issuer marks initialization complete
+            self._token_issuer = token_issuer
+
+    def warm_up(self):
+        """
+        Initialize components and prime the signing path
+
+        Loads the signing key into its parsed form so the first token request
+        does not pay for PEM parsing.
+        """
+        self.init()
+        self._token_issuer.signing_key
+
+    def gauges(self) -> List[Gauge]:
+        """Scrape-time gauges for this application's in-memory state"""
+        if not self.initialized:
+            return []
+
+        def state_entries() -> Dict[Tuple[str, ...], float]:
+            entries = {
+                ("admission_in_flight",): self.admission.in_flight,
+                ("admission_queued",): self.admission.queued,
+            }
+            for name, state in (
+                ("revocations", self._revocation_store),
+                ("lineage", self._lineage),
+                ("reference_tokens", self._reference_store),
+                ("clients", self._client_registry),
+            ):
+                if state is not None:
+                    entries[(name,)] = len(state)
+            return entries
+
+        return [
+            Gauge("aap_as_state_entries", "Entries held in AS in-memory state", state_entries, ("state",))
+        ]
+
+    @property
+    def policy_engine(self) -> PolicyEngine:
+        self.init()
+        return self._policy_engine
+
+    @property
+    def token_issuer(self) -> TokenIssuer:
+        self.init()
+        return self._token_issuer
+
+    @property
+    def issuance(self) -> Any:
+        """TokenIssuer, or its coalescing front when AAP_ISSUE_COALESCING is enabled"""
+        self.init()
+        return self._issuance
+
+    @property
+    def public_key(self) -> bytes:
+        self.init()
+        return self._public_key
+
+    @property
+    def jwks(self) -> Dict[str, Any]:
+        """JWK Set with the AS public key (computed once)"""
+        if self._jwks is None:
+            import jwt
+
+            algorithm = jwt.get_algorithm_by_name(self.config.signing_algorithm)
+            jwk = algorithm.to_jwk(algorithm.prepare_key(self.public_key), as_dict=True)
+            jwk.update({"kid": self.config.key_id, "use": "sig", "alg": self.config.signing_algorithm})
+            self._jwks = {"keys": [jwk]}
+        return self._jwks
+
+    @property
+    def revocation_store(self) -> Optional[RevocationStore]:
+        self.init()
+        return self._revocation_store
+
+    @property
+    def lineage(self) -> Optional[DelegationLineage]:
+        self.init()
+        return self._lineage
+
+    @property
+    def reference_store(self) -> Optional[ReferenceTokenStore]:
+        self.init()
+        return self._reference_store
+
+    @property
+    def client_registry(self) -> Optional[ClientRegistry]:
+        self.init()
+        return self._client_registry
+
+
+def create_app(cfg: Optional[ASConfig] = None, warm_up: bool = False) -> Flask:
+    """
+    Create the Authorization Server Flask application
+
+    Args:
+        cfg: Configuration to use (default: global config from environment)
+        warm_up: Compile policies and load keys immediately instead of on
+            the first request
+
+    Returns:
+        Configured Flask application
+    """
+    cfg = cfg or config
+
+    flask_app = Flask(__name__)
+    flask_app.extensions[EXTENSION_KEY] = ServerComponents(cfg)
+    flask_app.register_blueprint(bp)
+
+    if warm_up:
+        flask_app.extensions[EXTENSION_KEY].warm_up()
+
+    return flask_app
 
-with open(public_key_path, "rb") as f:
-    public_key = f.read()
 
-token_issuer = TokenIssuer(policy_engine, private_key, config.signing_algorithm)
+def get_components(flask_app: Optional[Flask] = None) -> ServerComponents:
+    """Return the components of the given (or current) application"""
+    return (flask_app or current_app).extensions[EXTENSION_KEY]
 
 
-@app.route("/")
+@bp.route("/")
 def index():
     """Server information endpoint"""
+    cfg = get_components().config
     return jsonify(
         {
             "service": "AAP Authorization Server",
             "version": "0.1.0",
-            "issuer": config.issuer,
+            "issuer": cfg.issuer,
             "endpoints": {
                 "token": "/token",
+                "revocation": "/revoke",
+                "revocation_list": "/revocations",
+                "introspection": "/introspect",
+                "metrics": "/metrics",
                 "jwks": "/.well-known/jwks.json",
                 "metadata": "/.well-known/oauth-authorization-server",
             },
@@ -55,34 +330,44 @@ def index():
     )
 
 
-@app.route("/.well-known/oauth-authorization-server")
+@bp.route("/.well-known/oauth-authorization-server")
 def metadata():
     """OAuth 2.0 Authorization Server Metadata (RFC 8414)"""
+    cfg = get_components().config
     return jsonify(
         {
-            "issuer": config.issuer,
-            "token_endpoint": f"{config.issuer}/token",
-            "jwks_uri": f"{config.issuer}/.well-known/jwks.json",
+            "issuer": cfg.issuer,
+            "token_endpoint": f"{cfg.issuer}/token",
+            "revocation_endpoint": f"{cfg.issuer}/revoke",
+            "introspection_endpoint": f"{cfg.issuer}/introspect",
+            "jwks_uri": f"{cfg.issuer}/.well-known/jwks.json",
             "grant_types_supported": [
                 "client_credentials",
                 "urn:ietf:params:oauth:grant-type:token-exchange",
             ],
             "token_endpoint_auth_methods_supported": ["client_secret_basic", "client_secret_post"],
+            "dpop_signing_alg_values_supported": get_components().dpop_verifier.algorithms,
+            "token_signing_alg_values_supported": [cfg.signing_algorithm],
             "response_types_supported": [],  # No authorization endpoint
             "scopes_supported": ["aap:research", "aap:content-creation", "aap:data-analysis"],
         }
     )
 
 
-@app.route("/.well-known/jwks.json")
+@bp.route("/.well-known/jwks.json")
 def jwks():
     """JSON Web Key Set (JWKS) endpoint"""
-    # TODO: Implement proper JWKS with public key
-    # For now, return empty set (requires cryptography library to export public key in JWK format)
-    return jsonify({"keys": []})
+    return jsonify(get_components().jwks)
+
+
+@bp.route("/metrics")
+def metrics():
+    """Prometheus metrics: process-wide counters and histograms plus this app's state sizes"""
+    body = REGISTRY.render(extra=get_components().gauges())
+    return current_app.response_class(body, content_type=CONTENT_TYPE)
 
 
-@app.route("/token", methods=["POST"])
+@bp.route("/token", methods=["POST"])
 def token():
     """
     Token endpoint - handles Client Credentials Grant and Token Exchange
@@ -94,10 +379,13 @@ def token():
     grant_type = request.form.get("grant_type")
 
     if grant_type == "client_credentials":
-        return handle_client_credentials()
+        handler = handle_client_credentials
+        grant_label = "client_credentials"
     elif grant_type == "urn:ietf:params:oauth:grant-type:token-exchange":
-        return handle_token_exchange()
+        handler = handle_token_exchange
+        grant_label = "token_exchange"
     else:
+        TOKEN_REQUESTS.inc("unsupported", "denied")
         return (
             jsonify(
                 {
@@ -108,38 +396,129 @@ def token():
             400,
         )
 
+    # Admission control: only the global concurrency cap applies before the caller
+    # is authenticated; fair queueing is by peer address since a claimed client_id
+    # could drain another client's share. Client quotas are charged by the handlers.
+    admission = get_components().admission
+    try:
+        with admission.slot(request.remote_addr or "anonymous"):
+            response = handler()
+    except AdmissionRejected as e:
+        response = admission_rejected_response(e)
 
-def handle_client_credentials():
-    """Handle Client Credentials Grant for initial token issuance"""
-    # Extract parameters
-    client_id = request.form.get("client_id")
-    client_secret = request.form.get("client_secret")
+    status = response[1] if isinstance(response, tuple) else response.status_code
+    TOKEN_REQUESTS.inc(grant_label, TOKEN_OUTCOMES.get(status, "error" if status >= 500 else "denied"))
+    return response
+
+
+def admission_rejected_response(rejection: AdmissionRejected):
+    """429/503 response with Retry-After for requests refused by admission control"""
+    response = jsonify({"error": rejection.error, "error_description": rejection.description})
+    response.headers["Retry-After"] = str(rejection.retry_after)
+    return response, rejection.http_status
+
+
+def authenticate_client():
+    """
+    Authenticate the client (client_secret_basic or client_secret_post)
+
+    Credentials are checked against the client registry when one is
+    configured; otherwise the demo rule (client_secret "secret") applies.
+
+    Returns:
+        Tuple of (client record, error response tuple or None)
+    """
+    auth = request.authorization
+    if auth is not None and auth.type == "basic":
+        client_id, client_secret = auth.username, auth.password
+    else:
+        client_id = request.form.get("client_id")
+        client_secret = request.form.get("client_secret")
 
-    # Authentication (simplified - production should use proper client auth)
     if not client_id or not client_secret:
         return (
-            jsonify(
-                {
-                    "error": "invalid_client",
-                    "error_description": "Client authentication failed",
-                }
+            None,
+            (
+                jsonify(
+                    {
+                        "error": "invalid_client",
+                        "error_description": "Client authentication failed",
+                    }
+                ),
+                401,
             ),
-            401,
         )
 
-    # TODO: Validate client credentials against database
-    # For reference implementation, accept any client with secret "secret"
-    if client_secret != "secret":
+    registry = get_components().client_registry
+    if registry is not None:
+        client = registry.authenticate(client_id, client_secret)
+    elif client_secret == "secret":
+        # Demo mode (no AAP_CLIENT_REGISTRY_PATH): any client, operator and audience
+        client = ClientRecord(client_id, allowed_operators=["*"], allowed_audiences=["*"])
+    else:
+        client = None
+
+    if client is None:
         return (
+            None,
+            (
+                jsonify(
+                    {
+                        "error": "invalid_client",
+                        "error_description": "Invalid client credentials",
+                    }
+                ),
+                401,
+            ),
+        )
+
+    return client, None
+
+
+def verify_dpop_header():
+    """
+    Verify the DPoP proof sent to the token endpoint, if any
+
+    Returns:
+        Tuple of (jkt, error_response); jkt is None when no proof was sent
+    """
+    proof = request.headers.get("DPoP")
+    if not proof:
+        return None, None
+
+    components = get_components()
+    try:
+        jkt = components.dpop_verifier.verify(
+            proof, htm="POST", htu=f"{components.config.issuer}/token"
+        )
+    except DPoPError as e:
+        return None, (
             jsonify(
                 {
-                    "error": "invalid_client",
-                    "error_description": "Invalid client credentials",
+                    "error": "invalid_dpop_proof",
+                    "error_description": e.description,
                 }
             ),
-            401,
+            400,
         )
 
+    return jkt, None
+
+
+def handle_client_credentials():
+    """Handle Client Credentials Grant for initial token issuance"""
+    client, auth_error = authenticate_client()
+    if auth_error:
+        return auth_error
+
+    client_id = client.client_id
+    get_components().admission.charge_client(client_id)
+
+    # Optional DPoP proof binds the token to the client's key (RFC 9449)
+    confirmation_jkt, dpop_error = verify_dpop_header()
+    if dpop_error:
+        return dpop_error
+
     # Extract AAP-specific parameters from request
     # In production, these might come from request body as JSON or from client registration
     agent_type = request.form.get("agent_type", "llm-autonomous")
@@ -149,6 +528,29 @@ def handle_client_credentials():
     audience = request.form.get("audience", "https://api.example.com")
     requested_capabilities = request.form.get("capabilities", "search.web").split(",")
 
+    # Registered clients are limited to their operators and audiences
+    if not client.allows_operator(operator):
+        return (
+            jsonify(
+                {
+                    "error": "unauthorized_client",
+                    "error_description": f"Client is not allowed to act for operator: {operator}",
+                }
+            ),
+            400,
+        )
+
+    if not client.allows_audience(audience):
+        return (
+            jsonify(
+                {
+                    "error": "invalid_target",
+                    "error_description": f"Client is not allowed to request audience: {audience}",
+                }
+            ),
+            400,
+        )
+
     # Parse optional metadata
     agent_metadata = {}
     if request.form.get("agent_metadata"):
@@ -164,9 +566,11 @@ def handle_client_credentials():
         except json.JSONDecodeError:
             pass
 
+    components = get_components()
+
     try:
         # Issue token
-        access_token = token_issuer.issue_token(
+        access_token = components.issuance.issue_token(
             agent_id=client_id,
             agent_type=agent_type,
             operator=operator,
@@ -176,18 +580,36 @@ def handle_client_credentials():
             audience=audience,
             agent_metadata=agent_metadata,
             task_metadata=task_metadata,
+            confirmation_jkt=confirmation_jkt,
         )
 
         return jsonify(
             {
                 "access_token": access_token,
-                "token_type": "Bearer",
-                "expires_in": config.default_token_lifetime,
+                "token_type": "DPoP" if confirmation_jkt else "Bearer",
+                "expires_in": components.config.default_token_lifetime,
                 "scope": "aap:" + task_purpose,
             }
         )
 
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except ReferenceStoreFull as e:
+        # Evicting live handles would deactivate tokens before they expire
+        return admission_rejected_response(
+            AdmissionRejected(503, "temporarily_unavailable", str(e), e.retry_after)
+        )
     except ValueError as e:
+        audit_denial(
+            "token.denied",
+            str(e),
+            grant_type="client_credentials",
+            client_id=client_id,
+            operator=operator,
+            task_id=task_id,
+            audience=audience,
+            capabilities=requested_capabilities,
+        )
         return (
             jsonify(
                 {
@@ -251,30 +673,55 @@ def handle_token_exchange():
             400,
         )
 
+    confirmation_jkt, dpop_error = verify_dpop_header()
+    if dpop_error:
+        return dpop_error
+
+    components = get_components()
+
     try:
         # Perform token exchange
-        derived_token = token_issuer.exchange_token(
+        derived_token = components.token_issuer.exchange_token(
             parent_token=subject_token,
             new_audience=resource,
-            public_key=public_key,
+            public_key=components.public_key,
             requested_capabilities=requested_capabilities,
+            confirmation_jkt=confirmation_jkt,
         )
 
         # Calculate expires_in from token
-        import jwt
-        payload = jwt.decode(derived_token, options={"verify_signature": False})
+        payload = components.token_issuer.read_claims(derived_token)
         expires_in = payload["exp"] - payload["iat"]
 
         return jsonify(
             {
                 "access_token": derived_token,
                 "issued_token_type": "urn:ietf:params:oauth:token-type:access_token",
-                "token_type": "Bearer",
+                "token_type": "DPoP" if confirmation_jkt else "Bearer",
                 "expires_in": expires_in,
             }
         )
 
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except LineageFull as e:
+        # Untracked derived tokens would escape cascading revocation
+        return admission_rejected_response(
+            AdmissionRejected(503, "temporarily_unavailable", str(e), e.retry_after)
+        )
+    except ReferenceStoreFull as e:
+        # Evicting live handles would deactivate tokens before they expire
+        return admission_rejected_response(
+            AdmissionRejected(503, "temporarily_unavailable", str(e), e.retry_after)
+        )
     except ValueError as e:
+        audit_denial(
+            "token.denied",
+            str(e),
+            grant_type="token-exchange",
+            audience=resource,
+            capabilities=requested_capabilities,
+        )
         return (
             jsonify(
                 {
@@ -296,8 +743,211 @@ def handle_token_exchange():
         )
 
 
+def audit_denial(event_type: str, reason: str, **fields: Any):
+    """Record a refused request in the audit log (if enabled)"""
+    audit_log = get_components().audit_log
+    if audit_log is not None:
+        audit_log.emit(event_type, reason=reason, **fields)
+
+
+def revocation_refused_response(description: str):
+    """Error response for a revocation the client is not allowed to make (RFC 7009 Section 2.1)"""
+    return (
+        jsonify(
+            {
+                "error": "unauthorized_client",
+                "error_description": description,
+            }
+        ),
+        403,
+    )
+
+
+def revocation_disabled_response():
+    """Error response when revocation is disabled in configuration"""
+    return (
+        jsonify(
+            {
+                "error": "unsupported_operation",
+                "error_description": "Token revocation is not enabled",
+            }
+        ),
+        404,
+    )
+
+
+@bp.route("/revoke", methods=["POST"])
+def revoke():
+    """
+    Revocation endpoint (RFC 7009, with AAP extensions)
+
+    Revokes a token (``token``) together with every token derived from it,
+    or every token issued for a task (``task_id``) or agent (``agent_id``)
+    up to now.
+
+    A client may revoke only tokens issued to it (``sub``, RFC 7009 Section
+    2.1) and its own agent. Revoking by task, or another client's tokens or
+    agent, needs an admin client (``AAP_REVOCATION_ADMIN_CLIENTS``, honoured
+    only with a client registry: in demo mode anyone can claim a client_id).
+    """
+    components = get_components()
+    store = components.revocation_store
+    if store is None:
+        return revocation_disabled_response()
+
+    client, auth_error = authenticate_client()
+    if auth_error:
+        return auth_error
+
+    token_value = request.form.get("token")
+    task_id = request.form.get("task_id")
+    agent_id = request.form.get("agent_id")
+
+    if not (token_value or task_id or agent_id):
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "error_description": "token, task_id or agent_id is required",
+                }
+            ),
+            400,
+        )
+
+    admin = (
+        components.client_registry is not None
+        and client.client_id in components.config.revocation_admin_clients
+    )
+    if not admin and (task_id or (agent_id and agent_id != client.client_id)):
+        return revocation_refused_response("Revoking by task or another agent requires an admin client")
+
+    payload = None
+    if token_value:
+        import jwt
+
+        try:
+            payload = components.token_issuer.verify_token(
+                token_value, components.public_key, verify_exp=False
+            )
+        except jwt.InvalidTokenError:
+            # RFC 7009 Section 2.2: invalid tokens do not cause an error response
+            payload = None
+
+        if payload and not admin and payload.get("sub") != client.client_id:
+            return revocation_refused_response("The token was not issued to this client")
+
+    revoked_jti = None
+    if payload and payload.get("jti"):
+        revoked_jti = payload["jti"]
+        # Cascade through the delegation tree in a single delta
+        entries = [(payload["jti"], payload.get("exp", 0))]
+        if components.lineage is not None:
+            entries.extend(components.lineage.descendants(payload["jti"]))
+        store.revoke_jtis(entries)
+
+    if task_id:
+        store.revoke_task(task_id)
+
+    if agent_id:
+        store.revoke_agent(agent_id)
+
+    if components.audit_log is not None:
+        components.audit_log.emit(
+            "token.revoked",
+            client_id=client.client_id,
+            jti=revoked_jti,
+            task_id=task_id,
+            agent_id=agent_id,
+            revocation_version=store.version,
+        )
+
+    return jsonify({"revocation_version": store.version})
+
+
+@bp.route("/revocations", methods=["GET"])
+def revocations():
+    """
+    Revocation list distribution endpoint
+
+    Returns a delta since ``?since=<version>`` when available, otherwise a
+    full snapshot. Resource Servers poll this and apply the result locally.
+    """
+    components = get_components()
+    store = components.revocation_store
+    if store is None:
+        return revocation_disabled_response()
+
+    since = request.args.get("since", type=int)
+    response = jsonify(store.changes_since(since))
+    response.headers["Cache-Control"] = f"max-age={components.config.revocation_cache_ttl}"
+    return response
+
+
+@bp.route("/introspect", methods=["POST"])
+def introspect():
+    """
+    Token introspection endpoint (RFC 7662)
+
+    Resolves reference tokens and also accepts JWT/CWT tokens issued by this
+    AS. Active responses carry the full AAP claims, so callers must present
+    ``AAP_INTROSPECTION_TOKEN`` as a Bearer credential; without one configured
+    the endpoint is closed unless ``AAP_INTROSPECTION_OPEN`` is set.
+    """
+    components = get_components()
+
+    expected = components.config.introspection_token
+    if expected or not components.config.introspection_open:
+        presented = request.headers.get("Authorization", "")
+        if not expected or not hmac.compare_digest(
+            presented.encode(), f"Bearer {expected}".encode()
+        ):
+            response = jsonify(
+                {
+                    "error": "invalid_client",
+                    "error_description": "Introspection requires a valid Bearer credential",
+                }
+            )
+            response.headers["WWW-Authenticate"] = "Bearer"
+            return response, 401
+
+    token_value = request.form.get("token")
+    if not token_value:
+        return (
+            jsonify(
+                {
+                    "error": "invalid_request",
+                    "error_description": "token is required",
+                }
+            ),
+            400,
+        )
+
+    import jwt
+
+    try:
+        payload = components.token_issuer.verify_token(token_value, components.public_key)
+    except jwt.InvalidTokenError:
+        payload = None
+
+    store = components.revocation_store
+    if payload is None or (store is not None and store.is_revoked(payload)):
+        return jsonify({"active": False})
+
+    claims = dict(payload)
+    claims["active"] = True
+    claims["token_type"] = "DPoP" if (payload.get("cnf") or {}).get("jkt") else "Bearer"
+    return jsonify(claims)
+
+
+# Default application instance (components are initialized lazily)
+app = create_app()
+
+
 def run_server():
     """Run the Authorization Server"""
+    # Fail fast on missing keys or broken policies before accepting traffic
+    get_components(app).warm_up()
+
     print(f"Starting AAP Authorization Server")
     print(f"Issuer: {config.issuer}")
     print(f"Listening on {config.host}:{config.port}")
@@ -0,0 +1,131 @@
+"""
+Singleflight Coalescing for AAP Token Issuance
+
+Opt-in front for ``TokenIssuer.issue_token``. When a fleet of agent replicas
+starts at once, the AS receives bursts of identical client-credentials
+requests (same client, operator, task, capabilities, audience and DPoP key).
+Concurrent identical requests share one in-flight policy evaluation and
+signature instead of each minting its own token.
+
+With a reuse window, a token minted for the same request less than
+``reuse_window`` seconds ago is returned as-is (unless it has been revoked).
+Replicas then share one token ``jti``, which also means they share
+rate-limit counters and are revoked together.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from common.metrics import CACHE_REQUESTS
+from .token_issuer import TokenIssuer
+
+
+class _Flight:
+    """In-flight issuance shared by concurrent identical requests"""
+
+    __slots__ = ("done", "token", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token: Optional[str] = None
+        self.error: Optional[Exception] = None
+
+
+class IssuanceCoalescer:
+    """Coalesces identical concurrent issue_token calls"""
+
+    def __init__(
+        self, token_issuer: TokenIssuer, reuse_window: float = 0.0, max_entries: int = 10_000
+    ):
+        """
+        Initialize coalescer
+
+        Args:
+            token_issuer: Issuer doing the actual work
+            reuse_window: Seconds a minted token is handed out again for an
+                identical request (0 disables reuse; only in-flight calls are shared)
+            max_entries: Upper bound on remembered tokens
+        """
+        self.token_issuer = token_issuer
+        self.reuse_window = reuse_window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        # request key -> (minted_at, token, payload), in mint order
+        self._recent: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+
+    def issue_token(self, **request: Any) -> str:
+        """
+        Issue a token, sharing work with identical concurrent requests
+
+        Takes the same keyword arguments as ``TokenIssuer.issue_token``.
+
+        Raises:
+            ValueError: If issuance fails (raised to every waiting caller)
+        """
+        key = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        now = time.time()
+
+        with self._lock:
+            recent = self._reusable(key, now)
+            if recent is not None:
+                CACHE_REQUESTS.inc("issuance", "hit")
+                return recent
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        CACHE_REQUESTS.inc("issuance", "miss" if leader else "coalesced")
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.token
+
+        try:
+            flight.token = self.token_issuer.issue_token(**request)
+            if self.reuse_window > 0:
+                self._remember(key, flight.token)
+            return flight.token
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _reusable(self, key: str, now: float) -> Optional[str]:
+        """Return a recent token for this request if still reusable (caller holds the lock)"""
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+
+        minted_at, token, payload = entry
+        store = self.token_issuer.revocation_store
+        if now - minted_at >= self.reuse_window or (store is not None and store.is_revoked(payload)):
+            del self._recent[key]
+            return None
+
+        return token
+
+    def _remember(self, key: str, token: str):
+        """Record a freshly minted token for reuse"""
+        payload = self.token_issuer.read_claims(token)
+        now = time.time()
+
+        with self._lock:
+            self._recent.pop(key, None)
+            self._recent[key] = (now, token, payload)
+
+            # Entries are in mint order: expired ones are at the front
+            while self._recent:
+                minted_at = next(iter(self._recent.values()))[0]
+                if now - minted_at < self.reuse_window and len(self._recent) <= self.max_entries:
+                    break
+                self._recent.popitem(last=False)
@@ -1,7 +1,9 @@
 """
 Token Issuer for AAP Authorization Server
 
-Issues AAP-compliant JWT tokens with agent, task, and capability claims.
+Issues AAP-compliant tokens with agent, task, and capability claims, as
+JWTs (default), compact CBOR-encoded CWTs (``AAP_TOKEN_FORMAT=cwt``), or
+opaque reference tokens resolved by introspection (``AAP_TOKEN_FORMAT=reference``).
 """
 
 import jwt
@@ -10,26 +12,167 @@ import time
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 
+from common import cwt
+from common.actions import most_specific, valid_action_name
+from common.audit_log import AuditLog
+from common.jsoncodec import JWT
+from common.metrics import REGISTRY
+from common.token_format import detect_token_format
 from .policy_engine import PolicyEngine, Capability
-from .config import config
+from .config import ASConfig, config
+from .revocation import RevocationStore
+from .lineage import DelegationLineage, chain_digest, extend_chain_digest
+from .reference_tokens import ReferenceTokenStore
+from .admission import AdmissionController
+
+
+POLICY_EVALUATION_SECONDS = REGISTRY.histogram(
+    "aap_policy_evaluation_seconds",
+    "Policy evaluation time (issuance: evaluate, exchange: reduce)",
+    ("operation",),
+)
+SIGNING_SECONDS = REGISTRY.histogram(
+    "aap_token_signing_seconds", "Time to sign (or store) a token", ("format",)
+)
+VERIFICATION_SECONDS = REGISTRY.histogram(
+    "aap_token_verification_seconds", "Time to verify a token", ("format",)
+)
 
 
 class TokenIssuer:
     """Issues AAP tokens"""
 
-    def __init__(self, policy_engine: PolicyEngine, private_key: bytes, algorithm: str = "ES256"):
+    def __init__(
+        self,
+        policy_engine: PolicyEngine,
+        private_key: bytes,
+        algorithm: str = "ES256",
+        cfg: Optional[ASConfig] = None,
+        revocation_store: Optional[RevocationStore] = None,
+        lineage: Optional[DelegationLineage] = None,
+        reference_store: Optional[ReferenceTokenStore] = None,
+        admission: Optional[AdmissionController] = None,
+        audit_log: Optional[AuditLog] = None,
+    ):
         """
         Initialize token issuer
 
         Args:
             policy_engine: PolicyEngine instance
             private_key: Private key for signing tokens (PEM format)
-            algorithm: Signing algorithm (ES256 or RS256)
+            algorithm: Signing algorithm (ES256, RS256, or EdDSA)
+            cfg: AS configuration (default: global config)
+            revocation_store: Optional revocation store (revoked parents cannot be exchanged)
+            lineage: Optional delegation lineage index (records derived tokens)
+            reference_store: Store for reference tokens (required for the reference format)
+            admission: Optional admission controller (per-client quota on exchange,
+                per-operator quotas)
+            audit_log: Optional audit log (records issued and exchanged tokens)
         """
         self.policy_engine = policy_engine
         self.private_key = private_key
         self.algorithm = algorithm
-        self.issuer = config.issuer
+        self.config = cfg or config
+        self.issuer = self.config.issuer
+        self.token_format = self.config.token_format
+        self.revocation_store = revocation_store
+        self.lineage = lineage
+        self.reference_store = reference_store
+        self.admission = admission
+        self.audit_log = audit_log
+        self._signing_key = None
+        self._verification_keys: Dict[bytes, Any] = {}  # PEM -> parsed public key
+
+    @property
+    def signing_key(self) -> Any:
+        """
+        Parsed signing key
+
+        PEM parsing is done once and reused, instead of on every JWT.encode call.
+        """
+        if self._signing_key is None:
+            self._signing_key = jwt.get_algorithm_by_name(self.algorithm).prepare_key(
+                self.private_key
+            )
+        return self._signing_key
+
+    def _verification_key(self, public_key: bytes) -> Any:
+        """Parsed public key for verifying parent tokens (parsed once per PEM)"""
+        key = self._verification_keys.get(public_key)
+        if key is None:
+            key = jwt.get_algorithm_by_name(self.algorithm).prepare_key(public_key)
+            self._verification_keys[public_key] = key
+        return key
+
+    def _encode(self, payload: Dict[str, Any]) -> str:
+        """Sign (or store) a payload in the configured token format"""
+        with SIGNING_SECONDS.time(self.token_format):
+            if self.token_format == "reference":
+                return self.reference_store.store(payload)
+            if self.token_format == "cwt":
+                return cwt.encode_cwt(
+                    payload, self.signing_key, self.algorithm, kid=self.config.key_id
+                )
+            return JWT.encode(
+                payload,
+                self.signing_key,
+                algorithm=self.algorithm,
+                headers={"kid": self.config.key_id},
+            )
+
+    def verify_token(
+        self, token: str, public_key: bytes, verify_exp: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Verify a token issued by this AS (any format) and return its claims
+
+        The audience is not checked: any audience may delegate or revoke.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is invalid or expired
+        """
+        token_format = detect_token_format(token)
+        with VERIFICATION_SECONDS.time(token_format):
+            return self._verify_token(token, token_format, public_key, verify_exp)
+
+    def _verify_token(
+        self, token: str, token_format: str, public_key: bytes, verify_exp: bool
+    ) -> Dict[str, Any]:
+        """Format-specific part of verify_token"""
+        if token_format == "reference":
+            payload = self.reference_store.lookup(token) if self.reference_store else None
+            if payload is None:
+                raise jwt.InvalidTokenError("Unknown or expired reference token")
+            return payload
+
+        key = self._verification_key(public_key)
+
+        if token_format == "jwt":
+            return JWT.decode(
+                token,
+                key,
+                algorithms=[self.algorithm],  # Must be signed with the AS key
+                options={"verify_exp": verify_exp, "verify_aud": False},
+            )
+
+        try:
+            payload = cwt.decode_cwt(token, key, algorithms=[self.algorithm])
+        except cwt.CWTError as e:
+            raise jwt.InvalidTokenError(str(e))
+
+        if verify_exp and payload.get("exp", 0) <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+
+        return payload
+
+    def read_claims(self, token: str) -> Dict[str, Any]:
+        """Read the claims of a token this AS just issued, without verification"""
+        token_format = detect_token_format(token)
+        if token_format == "reference":
+            return self.reference_store.lookup(token)
+        if token_format == "cwt":
+            return cwt.decode_cwt(token, verify_signature=False)
+        return JWT.decode(token, options={"verify_signature": False})
 
     def issue_token(
         self,
@@ -42,6 +185,7 @@ class TokenIssuer:
         audience: str,
         agent_metadata: Optional[Dict[str, Any]] = None,
         task_metadata: Optional[Dict[str, Any]] = None,
+        confirmation_jkt: Optional[str] = None,
     ) -> str:
         """
         Issue an AAP access token
@@ -56,19 +200,30 @@ class TokenIssuer:
             audience: Intended audience (Resource Server)
             agent_metadata: Optional additional agent metadata
             task_metadata: Optional additional task metadata
+            confirmation_jkt: DPoP key thumbprint to bind the token to (``cnf.jkt``)
 
         Returns:
-            Signed JWT token as string
+            Signed token (JWT or CWT) as string
         """
         # Get operator policy
         policy = self.policy_engine.get_policy(operator)
         if not policy:
             raise ValueError(f"No policy found for operator: {operator}")
 
+        if policy.require_pop and not confirmation_jkt:
+            raise ValueError("Operator policy requires proof-of-possession (DPoP)")
+
+        if self.admission is not None:
+            self.admission.charge_operator(operator)
+
         # Evaluate capabilities
-        capabilities = self.policy_engine.evaluate_capabilities(
-            operator, requested_capabilities, task_purpose
-        )
+        with POLICY_EVALUATION_SECONDS.time("evaluate"):
+            capabilities = self.policy_engine.evaluate_capabilities(
+                operator,
+                requested_capabilities,
+                task_purpose,
+                task_category=(task_metadata or {}).get("category"),
+            )
 
         if not capabilities:
             raise ValueError(
@@ -103,7 +258,13 @@ class TokenIssuer:
             },
         }
 
+        if self.config.delegation_chain_mode == "digest":
+            payload["delegation"]["chain_digest"] = chain_digest([agent_id])
+
         # Add optional claims
+        if confirmation_jkt:
+            payload["cnf"] = {"jkt": confirmation_jkt}
+
         if policy.oversight:
             payload["oversight"] = policy.oversight
 
@@ -111,10 +272,8 @@ class TokenIssuer:
             payload["audit"] = self._build_audit_claim(policy.audit, task_id)
 
         # Sign token
-        token = jwt.encode(
-            payload, self.private_key, algorithm=self.algorithm, headers={"kid": config.key_id}
-        )
-
+        token = self._encode(payload)
+        self._record_audit("token.issued", payload)
         return token
 
     def _build_agent_claim(
@@ -188,43 +347,82 @@ class TokenIssuer:
 
         return claim
 
+    def _record_audit(self, event_type: str, payload: Dict[str, Any]):
+        """Enqueue an audit event describing a minted token"""
+        if self.audit_log is None:
+            return
+
+        delegation = payload["delegation"]
+        audit = payload.get("audit", {})
+        self.audit_log.emit(
+            event_type,
+            jti=payload["jti"],
+            sub=payload["sub"],
+            aud=payload["aud"],
+            exp=payload["exp"],
+            operator=payload["agent"].get("operator"),
+            task_id=payload["task"].get("id"),
+            capabilities=[cap["action"] for cap in payload["capabilities"]],
+            delegation_depth=delegation["depth"],
+            parent_jti=delegation.get("parent_jti"),
+            trace_id=audit.get("trace_id"),
+            log_level=audit.get("log_level"),
+            retention_period=audit.get("retention_period"),
+        )
+
     def exchange_token(
         self,
         parent_token: str,
         new_audience: str,
         public_key: bytes,
         requested_capabilities: Optional[List[str]] = None,
+        confirmation_jkt: Optional[str] = None,
     ) -> str:
         """
         Exchange a token for a derived token (OAuth 2.0 Token Exchange)
 
         Args:
-            parent_token: Original AAP token
+            parent_token: Original AAP token (JWT or CWT)
             new_audience: New audience for derived token
             public_key: Public key for verifying parent token
             requested_capabilities: Optional subset of capabilities to request
+            confirmation_jkt: DPoP key thumbprint of the requester; required to
+                match the parent binding when the parent is sender-constrained
 
         Returns:
             Derived AAP token as string
         """
         # Validate parent token
         try:
-            parent_payload = jwt.decode(
-                parent_token,
-                public_key,
-                algorithms=[self.algorithm, "RS256"],  # Support both ES256 and RS256
-                audience=jwt.api_jwt.get_unverified_claims(parent_token).get("aud"),
-                options={"verify_exp": True},
-            )
+            parent_payload = self.verify_token(parent_token, public_key)
         except jwt.InvalidTokenError as e:
             raise ValueError(f"Invalid parent token: {e}")
 
+        if self.revocation_store and self.revocation_store.is_revoked(parent_payload):
+            raise ValueError("Invalid parent token: token has been revoked")
+
+        # Proof-of-possession: a bound parent can only be exchanged by its key holder
+        parent_jkt = (parent_payload.get("cnf") or {}).get("jkt")
+        if parent_jkt and confirmation_jkt != parent_jkt:
+            raise ValueError("Parent token is DPoP-bound; proof of possession required")
+
+        policy = self.policy_engine.get_policy(parent_payload["agent"].get("operator"))
+        if policy and policy.require_pop and not confirmation_jkt:
+            raise ValueError("Operator policy requires proof-of-possession (DPoP)")
+
+        # Client and operator quotas are charged only once the parent token is verified
+        if self.admission is not None:
+            self.admission.charge_client(parent_payload.get("sub", ""))
+            self.admission.charge_operator(parent_payload["agent"].get("operator", ""))
+
         # Extract parent claims
         agent = parent_payload["agent"]
         task = parent_payload["task"]
         parent_capabilities = parent_payload["capabilities"]
         parent_delegation = parent_payload.get("delegation", {})
         parent_jti = parent_payload["jti"]
+        # Root of the delegation tree (shared rate-limit accounting on the RS)
+        root_jti = parent_delegation.get("root_jti", parent_jti)
 
         # Validate delegation depth
         current_depth = parent_delegation.get("depth", 0)
@@ -241,9 +439,17 @@ class TokenIssuer:
             parent_actions = {cap["action"] for cap in parent_capabilities}
             requested_set = set(requested_capabilities)
 
+            # Actions the parent grants through a namespace (cms.publish under cms.*)
+            narrowed = {}
+            for action in dict.fromkeys(requested_capabilities):
+                if action not in parent_actions and valid_action_name(action):
+                    covering = most_specific(parent_capabilities, action, lambda cap: cap["action"])
+                    if covering is not None:
+                        narrowed[action] = {**covering, "action": action}
+
             # Ensure requested capabilities are subset of parent
-            if not requested_set.issubset(parent_actions):
-                unauthorized = requested_set - parent_actions
+            if not requested_set.issubset(parent_actions | narrowed.keys()):
+                unauthorized = requested_set - parent_actions - narrowed.keys()
                 raise ValueError(
                     f"Requested capabilities not in parent token: {unauthorized}"
                 )
@@ -251,7 +457,7 @@ class TokenIssuer:
             # Keep only requested capabilities
             derived_capabilities = [
                 cap for cap in parent_capabilities if cap["action"] in requested_set
-            ]
+            ] + list(narrowed.values())
         else:
             # Keep all parent capabilities (still apply reduction)
             derived_capabilities = parent_capabilities.copy()
@@ -269,13 +475,14 @@ class TokenIssuer:
 
         # Apply privilege reduction
         new_depth = current_depth + 1
-        reduced_capabilities = self.policy_engine.reduce_capabilities_for_delegation(
-            capability_objects, new_depth
-        )
+        with POLICY_EVALUATION_SECONDS.time("reduce"):
+            reduced_capabilities = self.policy_engine.reduce_capabilities_for_delegation(
+                capability_objects, new_depth
+            )
 
         # Calculate reduced lifetime (50% reduction per delegation level)
         parent_lifetime = parent_payload["exp"] - parent_payload["iat"]
-        reduced_lifetime = int(parent_lifetime * config.delegated_token_lifetime_reduction)
+        reduced_lifetime = int(parent_lifetime * self.config.delegated_token_lifetime_reduction)
 
         # Build derived token payload
         now = int(time.time())
@@ -286,6 +493,19 @@ class TokenIssuer:
         parent_chain = parent_delegation.get("chain", [agent["id"]])
         new_chain = parent_chain + [new_audience]  # Append new tool/service to chain
 
+        # Compact chain: rolling digest + last hops (a digest parent stays compact)
+        new_digest = None
+        parent_digest = parent_delegation.get("chain_digest")
+        if parent_digest or self.config.delegation_chain_mode == "digest":
+            parent_digest = parent_digest or chain_digest(parent_chain)
+            recorded = self.lineage.chain_digest(parent_jti) if self.lineage else None
+            if recorded is not None and recorded != parent_digest:
+                raise ValueError("Invalid parent token: delegation chain digest mismatch")
+            new_digest = extend_chain_digest(parent_digest, new_audience)
+            # Explicit start: a tail of 0 would slice [-0:] and keep the whole chain
+            tail = max(self.config.delegation_chain_tail, 1)
+            new_chain = new_chain[max(len(new_chain) - tail, 0):]
+
         payload = {
             # Standard JWT claims
             "iss": self.issuer,
@@ -303,6 +523,7 @@ class TokenIssuer:
                 "max_depth": max_depth,
                 "chain": new_chain,
                 "parent_jti": parent_jti,
+                "root_jti": root_jti,
                 "privilege_reduction": {
                     "capabilities_removed": list(
                         {cap["action"] for cap in parent_capabilities}
@@ -313,7 +534,13 @@ class TokenIssuer:
             },
         }
 
+        if new_digest:
+            payload["delegation"]["chain_digest"] = new_digest
+
         # Copy optional claims if present
+        if confirmation_jkt:
+            payload["cnf"] = {"jkt": confirmation_jkt}
+
         if "oversight" in parent_payload:
             payload["oversight"] = parent_payload["oversight"]
 
@@ -326,9 +553,13 @@ class TokenIssuer:
                 audit["trace_id_scope"] = "domain"
             payload["audit"] = audit
 
-        # Sign derived token
-        token = jwt.encode(
-            payload, self.private_key, algorithm=self.algorithm, headers={"kid": config.key_id}
-        )
+        # Link derived token to its parent for cascading revocation
+        if self.lineage is not None:
+            self.lineage.record(
+                jti, exp, parent_jti, parent_payload["exp"], new_digest, parent_digest
+            )
 
+        # Sign derived token
+        token = self._encode(payload)
+        self._record_audit("token.exchanged", payload)
         return token
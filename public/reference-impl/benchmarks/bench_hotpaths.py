@@ -0,0 +1,297 @@
+"""
+Hot-path microbenchmarks for the AAP Authorization Server and Resource Server
+
+Times the per-request code paths with real objects (no HTTP):
+
+- AS: PolicyEngine.evaluate_capabilities, TokenIssuer.issue_token,
+  TokenIssuer.exchange_token
+- RS: TokenValidator.validate, CapabilityMatcher.find_matching_capability
+  (and the trie-based CompiledCapabilityMatcher, exact and namespace
+  grants), ConstraintEnforcer.enforce_constraints, resource matching (reference
+  resource_matches vs the compiled ResourceMatcher)
+
+Each case is swept over one workload axis: capability count, domain-list
+size, delegation depth, token size (bytes of agent metadata padding), or
+resource pattern count.
+Results are written as JSON; compare two runs with benchmarks/compare.py.
+
+Usage:
+    python benchmarks/bench_hotpaths.py --output hotpaths.json
+    python benchmarks/bench_hotpaths.py --capabilities 1,16 --depths 0,2 --quick
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import tempfile
+
+from bench_utils import REFERENCE_IMPL_DIR, generate_key_pair, measure
+
+from rs.validator import TokenValidator
+from rs.capability_matcher import CapabilityMatcher, CompiledCapabilityMatcher
+from rs.constraint_enforcer import ConstraintEnforcer
+from rs.resource_matcher import ResourceMatcher, resource_matches
+
+# "as" is a Python keyword, so the AS package is imported by name
+ASConfig = importlib.import_module("as.config").ASConfig
+PolicyEngine = importlib.import_module("as.policy_engine").PolicyEngine
+TokenIssuer = importlib.import_module("as.token_issuer").TokenIssuer
+
+OPERATOR = "org:bench"
+AUDIENCE = "https://api.example.com"
+ISSUER = "https://as.example.com"
+
+
+def parse_ints(value: str) -> list:
+    return [int(v) for v in value.split(",") if v]
+
+
+def write_policy(directory: str, capability_count: int, max_depth: int):
+    """Write an operator policy with ``capability_count`` actions"""
+    policy = {
+        "policy_id": "policy-bench",
+        "applies_to": {"operator": OPERATOR},
+        "allowed_capabilities": [
+            {
+                "action": f"bench.action{i}",
+                "default_constraints": {
+                    "domains_allowed": ["example.org", "trusted.com"],
+                    "max_requests_per_hour": 100,
+                    "max_requests_per_minute": 10,
+                },
+            }
+            for i in range(capability_count)
+        ],
+        "global_constraints": {"token_lifetime": 3600, "max_delegation_depth": max_depth},
+        "oversight": {"requires_human_approval_for": ["cms.publish"]},
+        "audit": {"log_level": "full", "retention_period_days": 90},
+    }
+    with open(os.path.join(directory, "bench.json"), "w") as f:
+        json.dump(policy, f)
+
+
+def actions(count: int) -> list:
+    return [f"bench.action{i}" for i in range(count)]
+
+
+def issue(issuer: TokenIssuer, capability_count: int, padding: int = 0) -> str:
+    return issuer.issue_token(
+        agent_id="agent-bench-01",
+        agent_type="llm-autonomous",
+        operator=OPERATOR,
+        task_id="task-bench",
+        task_purpose="benchmark",
+        requested_capabilities=actions(capability_count),
+        audience=AUDIENCE,
+        agent_metadata={"name": "x" * padding} if padding else None,
+    )
+
+
+def delegate(issuer: TokenIssuer, token: str, public_pem: bytes, hops: int) -> str:
+    """Exchange a token ``hops`` times (each hop keeps every capability)"""
+    for _ in range(hops):
+        token = issuer.exchange_token(token, AUDIENCE, public_pem)
+    return token
+
+
+def run(args) -> dict:
+    results = {}
+    max_caps = max(args.capabilities)
+    max_depth = max(args.depths)
+    private_pem, public_pem = generate_key_pair(args.algorithm)
+
+    with tempfile.TemporaryDirectory() as policy_dir:
+        write_policy(policy_dir, max_caps, max_depth + 1)
+        cfg = ASConfig()
+        cfg.issuer = ISSUER
+        cfg.token_format = "jwt"
+        policy_engine = PolicyEngine(policy_dir)
+
+    issuer = TokenIssuer(policy_engine, private_pem, args.algorithm, cfg=cfg)
+    validator = TokenValidator(
+        public_key=public_pem,
+        audience=AUDIENCE,
+        trusted_issuers=[ISSUER],
+        algorithms=[args.algorithm],
+    )
+    matcher = CapabilityMatcher()
+    compiled_matcher = CompiledCapabilityMatcher()
+
+    def record(case: str, params: dict, func, **extra):
+        name = f"{case}[{','.join(f'{k}={v}' for k, v in params.items())}]"
+        results[name] = {"case": case, "params": params, **measure(func, args.min_time), **extra}
+        print(f"{name:<64} {results[name]['median_us']:>12.1f} us")
+
+    # AS: policy evaluation and issuance, by capability count
+    for caps in args.capabilities:
+        requested = actions(caps)
+        record(
+            "evaluate_capabilities",
+            {"caps": caps},
+            lambda: policy_engine.evaluate_capabilities(OPERATOR, requested, "benchmark"),
+        )
+        record("issue_token", {"caps": caps}, lambda: issue(issuer, caps))
+
+    # AS: exchange of a parent at depth-1, by capability count and resulting depth
+    for caps in args.capabilities:
+        root = issue(issuer, caps)
+        for depth in args.depths:
+            if depth == 0:
+                continue
+            parent = delegate(issuer, root, public_pem, depth - 1)
+            record(
+                "exchange_token",
+                {"caps": caps, "depth": depth},
+                lambda: issuer.exchange_token(parent, AUDIENCE, public_pem),
+            )
+
+    # RS: full validation, by capability count and delegation depth, then by token size
+    for caps in args.capabilities:
+        root = issue(issuer, caps)
+        for depth in args.depths:
+            token = delegate(issuer, root, public_pem, depth)
+            record(
+                "validate",
+                {"caps": caps, "depth": depth},
+                lambda: validator.validate(token),
+                token_bytes=len(token),
+            )
+    for padding in args.padding:
+        token = issue(issuer, 4, padding)
+        record(
+            "validate",
+            {"caps": 4, "depth": 0, "padding": padding},
+            lambda: validator.validate(token),
+            token_bytes=len(token),
+        )
+
+    # RS: capability matching (requested action is the last one: worst case). The
+    # compiled matcher reuses the trie of the token's (cached) capability list.
+    for caps in args.capabilities:
+        capabilities = [{"action": action} for action in actions(caps)]
+        requested = capabilities[-1]["action"]
+        record(
+            "find_matching_capability",
+            {"caps": caps},
+            lambda: matcher.find_matching_capability(capabilities, requested),
+        )
+        record(
+            "find_matching_capability",
+            {"caps": caps, "matcher": "compiled"},
+            lambda: compiled_matcher.find_matching_capability(capabilities, requested),
+        )
+        # A namespace grant (bench.ns.*) listed last, behind every exact capability
+        namespaced = capabilities[:-1] + [{"action": "bench.ns.*"}]
+        for name, find in (
+            ("reference", matcher.find_matching_capability),
+            ("compiled", compiled_matcher.find_matching_capability),
+        ):
+            record(
+                "find_matching_capability",
+                {"caps": caps, "matcher": name, "grant": "namespace"},
+                lambda: find(namespaced, "bench.ns.drafts.create"),
+            )
+
+    # RS: constraint enforcement, by domain-list size (target is the last domain).
+    # Only the hourly limit is set: the per-minute sliding window keeps one
+    # timestamp per request, so its cost depends on how long the benchmark runs.
+    for domains in args.domains:
+        enforcer = ConstraintEnforcer()
+        constraints = {
+            "domains_allowed": [f"d{i}.example.com" for i in range(domains)],
+            "max_requests_per_hour": 10**12,
+            "allowed_methods": ["GET"],
+        }
+        request = {"method": "GET", "target_url": f"https://d{domains - 1}.example.com/page"}
+        record(
+            "enforce_constraints",
+            {"domains": domains},
+            lambda: enforcer.enforce_constraints(constraints, request, "jti-bench"),
+        )
+
+    # RS: resource matching, by pattern count (a mix of exact, prefix and template
+    # patterns; the resource matches only the last one)
+    resource_matcher = ResourceMatcher()
+    for count in args.resources:
+        patterns = []
+        for i in range(count):
+            kind = i % 3
+            if kind == 0:
+                patterns.append(f"{AUDIENCE}/v2/t{i}/articles/42")
+            elif kind == 1:
+                patterns.append(f"{AUDIENCE}/v2/t{i}/articles/*")
+            else:
+                patterns.append(f"{AUDIENCE}/v2/t{i}/articles/{{id}}/comments")
+        patterns[-1] = f"{AUDIENCE}/v2/target/*"
+        resource = f"{AUDIENCE}/v2/target/articles/42"
+        for name, match in (("reference", resource_matches), ("compiled", resource_matcher.matches)):
+            record(
+                "match_resource",
+                {"patterns": count, "matcher": name},
+                lambda: match(patterns, resource),
+            )
+
+    return results
+
+
+def environment() -> dict:
+    """Where the results came from (for comparing runs)"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REFERENCE_IMPL_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "commit": commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP AS/RS hot-path microbenchmarks")
+    parser.add_argument("--algorithm", default="ES256", help="Signing algorithm")
+    parser.add_argument("--capabilities", type=parse_ints, default=[1, 4, 16, 64])
+    parser.add_argument("--domains", type=parse_ints, default=[1, 10, 100, 1000])
+    parser.add_argument("--depths", type=parse_ints, default=[0, 1, 2, 4])
+    parser.add_argument(
+        "--padding", type=parse_ints, default=[0, 1024, 8192], help="Token padding bytes"
+    )
+    parser.add_argument(
+        "--resources", type=parse_ints, default=[1, 100, 1000], help="Resource pattern counts"
+    )
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds per round")
+    parser.add_argument("--quick", action="store_true", help="Short rounds (smoke test)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    if args.quick:
+        args.min_time = 0.02
+
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "benchmark": "hotpaths",
+                    "algorithm": args.algorithm,
+                    "environment": environment(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+JSON codec benchmark: token payload (de)serialization per JSON library
+
+For growing capability counts and delegation depths (and one payload with
+non-ASCII text), compares stock PyJWT (stdlib json, ``\\uXXXX`` escapes)
+with ``common.jsoncodec`` on each installed library (json, ujson, orjson):
+- encoded token size in bytes
+- payload serialize / parse time alone
+- JWT encode (serialize + sign) and decode (verify + parse) time
+
+Usage:
+    python benchmarks/bench_json_codec.py [--algorithm ES256] [--output codec.json]
+"""
+
+import argparse
+import json
+
+from bench_utils import generate_key_pair, measure, sample_payload
+
+import jwt
+
+from common import jsoncodec
+
+
+# (capability_count, delegation_depth, non-ASCII text)
+SCENARIOS = [(1, 0, False), (16, 0, False), (16, 4, False), (64, 4, False), (16, 4, True)]
+
+
+def localized(payload: dict) -> dict:
+    """Payload with non-ASCII free text (stdlib json escapes it as \\uXXXX)"""
+    payload["task"]["purpose"] = "recherche_données_climatiques_région_Île-de-France"
+    payload["agent"]["operator"] = "org:société-générale-de-données"
+    payload["oversight"]["approval_reference"] = "https://approbation.exemple.fr/actions-d’agents"
+    return payload
+
+
+def bench_scenario(payload: dict, algorithm: str, keys: tuple, min_time: float) -> dict:
+    """Measure stock PyJWT and every available codec for one payload"""
+    private_pem, public_pem = keys
+    jwt_algorithm = jwt.get_algorithm_by_name(algorithm)
+    signing_key = jwt_algorithm.prepare_key(private_pem)
+    verification_key = jwt_algorithm.prepare_key(public_pem)
+    decode_options = {"verify_aud": False}
+
+    apis = {"pyjwt": jwt.PyJWT()}
+    for name in ("json", "ujson", "orjson"):
+        try:
+            apis[name] = jsoncodec.CodecJWT(jsoncodec.get_codec(name))
+        except ValueError:
+            pass  # Library not installed
+
+    result = {}
+    for name, api in apis.items():
+        token = api.encode(payload, signing_key, algorithm=algorithm)
+        decode = lambda: api.decode(token, verification_key, algorithms=[algorithm], options=decode_options)
+        assert decode() == payload, f"{name} round trip mismatch"
+
+        if name == "pyjwt":
+            # PyJWT's own payload serialization
+            dumps = lambda: json.dumps(payload, separators=(",", ":")).encode("utf-8")
+            loads = json.loads
+        else:
+            dumps = lambda: api.codec.dumps(payload)
+            loads = api.codec.loads
+        serialized = dumps()
+
+        result[name] = {
+            "token_bytes": len(token),
+            "dumps": measure(dumps, min_time),
+            "loads": measure(lambda: loads(serialized), min_time),
+            "encode": measure(lambda: api.encode(payload, signing_key, algorithm=algorithm), min_time),
+            "decode": measure(decode, min_time),
+        }
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP JSON codec benchmark")
+    parser.add_argument("--algorithm", default="ES256", help="Signing algorithm")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds per round")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    keys = generate_key_pair(args.algorithm)
+    results = {}
+    for caps, depth, non_ascii in SCENARIOS:
+        payload = sample_payload(caps, depth)
+        name = f"caps={caps},depth={depth}"
+        if non_ascii:
+            payload = localized(payload)
+            name += ",non-ascii"
+        results[name] = bench_scenario(payload, args.algorithm, keys, args.min_time)
+
+    print(f"default codec: {jsoncodec.CODEC.name}")
+    print(
+        f"{'scenario':<28} {'codec':<7} {'bytes':>6} {'dumps us':>9} {'loads us':>9} "
+        f"{'encode us':>10} {'decode us':>10}"
+    )
+    for scenario, result in results.items():
+        for name, timing in result.items():
+            print(
+                f"{scenario:<28} {name:<7} {timing['token_bytes']:>6} {timing['dumps']['median_us']:>9.1f} "
+                f"{timing['loads']['median_us']:>9.1f} {timing['encode']['median_us']:>10.1f} "
+                f"{timing['decode']['median_us']:>10.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "benchmark": "json_codec",
+                    "algorithm": args.algorithm,
+                    "default_codec": jsoncodec.CODEC.name,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
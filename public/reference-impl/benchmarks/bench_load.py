@@ -0,0 +1,587 @@
+"""
+End-to-end load generator for the AAP Authorization Server and Resource Server
+
+Starts the AS and RS locally (one subprocess each, threaded WSGI servers on
+loopback ports, throwaway keys and a benchmark policy), mints tokens for a
+population of agents, then drives a mix of requests:
+
+- token:    client-credentials issuance (POST /token)
+- exchange: delegation via token exchange (POST /token)
+- search:   GET /api/search with an agent's token
+- draft:    POST /api/cms/draft with an agent's token
+
+Two load models are supported:
+
+- open loop (--rate): requests arrive on a fixed schedule whatever the
+  servers do; latency is measured from the scheduled arrival time, so
+  queueing caused by a slow server is included (no coordinated omission)
+- closed loop (--concurrency): N workers each send the next request as
+  soon as the previous one completes
+
+The report gives throughput, p50/p95/p99/p99.9 latency per operation and
+errors broken down by operation, status and error code. RS requests run
+with AAP_SERVER_TIMING, so denials also show the last authorization stage
+they passed, and the mean server time per stage is reported.
+
+The client is Python too: at high rates check that the load generator is
+not the bottleneck (its CPU usage, or a rising p50 at low server load).
+
+Usage:
+    python benchmarks/bench_load.py --rate 200 --duration 30
+    python benchmarks/bench_load.py --concurrency 32 --mix token=1,search=8 --output load.json
+    python benchmarks/bench_load.py --rate 500 --as-env AAP_TOKEN_FORMAT=cwt
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from bench_utils import REFERENCE_IMPL_DIR, write_key_pair
+
+
+OPERATOR = "org:load"
+AUDIENCE = "https://api.example.com"
+ISSUER = "https://as.example.com"
+CAPABILITIES = "search.web,cms.create_draft"
+EXCHANGE_GRANT = "urn:ietf:params:oauth:grant-type:token-exchange"
+ACCESS_TOKEN_TYPE = "urn:ietf:params:oauth:token-type:access_token"
+
+DEFAULT_MIX = "token=1,exchange=1,search=16,draft=2"
+OPERATIONS = ("token", "exchange", "search", "draft")
+
+# Served in a fresh interpreter; argv[1] is the port
+AS_SCRIPT = """
+import importlib, logging, sys
+from werkzeug.serving import make_server
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+app = importlib.import_module("as.server").create_app(warm_up=True)
+make_server("127.0.0.1", int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+RS_SCRIPT = """
+import logging, sys
+from werkzeug.serving import make_server
+logging.getLogger("werkzeug").setLevel(logging.ERROR)
+from rs.server import app
+make_server("127.0.0.1", int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse ``op=weight`` pairs, e.g. ``token=1,search=8``"""
+    mix = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        op, sep, weight = entry.partition("=")
+        if not sep or op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Invalid mix entry: {entry} (operations: {', '.join(OPERATIONS)})")
+        if float(weight) > 0:
+            mix[op] = float(weight)
+    if not mix:
+        raise argparse.ArgumentTypeError("The mix must contain at least one operation")
+    return mix
+
+
+def parse_env(value: str) -> Tuple[str, str]:
+    key, sep, val = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE: {value}")
+    return key, val
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_policy(directory: str):
+    """Policy for the load operator: rate limits high enough not to interfere"""
+    policy = {
+        "policy_id": "policy-load",
+        "applies_to": {"operator": OPERATOR},
+        "allowed_capabilities": [
+            {
+                "action": "search.web",
+                "default_constraints": {
+                    "domains_allowed": ["example.org", "trusted.com"],
+                    "max_requests_per_hour": 10**9,
+                },
+            },
+            {"action": "cms.create_draft", "default_constraints": {"max_requests_per_hour": 10**9}},
+        ],
+        "global_constraints": {"token_lifetime": 3600, "max_delegation_depth": 2},
+        "audit": {"log_level": "full", "retention_period_days": 90},
+    }
+    with open(os.path.join(directory, "load.json"), "w") as f:
+        json.dump(policy, f)
+
+
+class LocalServers:
+    """AS and RS subprocesses on loopback ports, torn down on exit"""
+
+    def __init__(self, workdir: str, as_env: List[Tuple[str, str]], rs_env: List[Tuple[str, str]]):
+        private_path, public_path = write_key_pair(workdir)
+        policy_dir = os.path.join(workdir, "policies")
+        os.mkdir(policy_dir)
+        write_policy(policy_dir)
+
+        self.as_port, self.rs_port = free_port(), free_port()
+        self.as_url = f"http://127.0.0.1:{self.as_port}"
+        self.rs_url = f"http://127.0.0.1:{self.rs_port}"
+
+        base = dict(os.environ, PYTHONPATH=REFERENCE_IMPL_DIR)
+        self._as_env = dict(
+            base,
+            AAP_ISSUER=ISSUER,
+            AAP_PRIVATE_KEY_PATH=private_path,
+            AAP_PUBLIC_KEY_PATH=public_path,
+            AAP_POLICY_PATH=policy_dir,
+        )
+        self._as_env.update(as_env)
+        self._rs_env = dict(
+            base,
+            AAP_RS_AUDIENCE=AUDIENCE,
+            AAP_TRUSTED_ISSUERS=ISSUER,
+            AAP_PUBLIC_KEY_PATH=public_path,
+            AAP_SERVER_TIMING="true",
+        )
+        self._rs_env.update(rs_env)
+        self._workdir = workdir
+        self._processes: List[subprocess.Popen] = []
+
+    def _spawn(self, name: str, script: str, port: int, env: Dict[str, str]):
+        log = open(os.path.join(self._workdir, f"{name}.log"), "wb")
+        self._processes.append(
+            subprocess.Popen(
+                [sys.executable, "-c", script, str(port)],
+                cwd=REFERENCE_IMPL_DIR,
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        )
+
+    def _wait_ready(self, name: str, url: str, process: subprocess.Popen, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                break
+            try:
+                requests.get(url + "/", timeout=1)
+                return
+            except requests.RequestException:
+                time.sleep(0.05)
+        with open(os.path.join(self._workdir, f"{name}.log")) as f:
+            raise RuntimeError(f"{name.upper()} did not start:\n{f.read()}")
+
+    def __enter__(self):
+        self._spawn("as", AS_SCRIPT, self.as_port, self._as_env)
+        self._spawn("rs", RS_SCRIPT, self.rs_port, self._rs_env)
+        try:
+            self._wait_ready("as", self.as_url, self._processes[0])
+            self._wait_ready("rs", self.rs_url, self._processes[1])
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def last_passed_stage(server_timing: Optional[str]) -> Optional[str]:
+    """
+    Last authorization stage a refused request passed
+
+    The stage that refused the request is timed as ``rejected``, so the
+    refusal happened in the stage following the returned one.
+    """
+    stages = [part.split(";", 1)[0].strip() for part in (server_timing or "").split(",")]
+    if "rejected" in stages:
+        index = stages.index("rejected")
+        return stages[index - 1] if index > 0 else "start"
+    return None
+
+
+def stage_durations(server_timing: Optional[str]) -> Dict[str, float]:
+    """Server-Timing header -> {stage: milliseconds}"""
+    durations = {}
+    for part in filter(None, (server_timing or "").split(",")):
+        stage, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            durations[stage] = float(params[4:])
+    return durations
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class Recorder:
+    """Thread-safe collection of request outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {op: [] for op in OPERATIONS}
+        self.errors: Dict[str, Dict[str, int]] = {op: {} for op in OPERATIONS}
+        self.stage_ms: Dict[str, List[float]] = {}  # stage -> [total ms, samples]
+
+    def success(self, op: str, latency: float, server_timing: Optional[str] = None):
+        with self._lock:
+            self.latencies[op].append(latency)
+            for stage, ms in stage_durations(server_timing).items():
+                totals = self.stage_ms.setdefault(stage, [0.0, 0])
+                totals[0] += ms
+                totals[1] += 1
+
+    def error(self, op: str, kind: str):
+        with self._lock:
+            self.errors[op][kind] = self.errors[op].get(kind, 0) + 1
+
+    def report(self, elapsed: float) -> dict:
+        results = {}
+        everything = []
+        for op in OPERATIONS:
+            ordered = sorted(self.latencies[op])
+            errors = sum(self.errors[op].values())
+            if not ordered and not errors:
+                continue
+            everything.extend(ordered)
+            results[op] = self._summary(ordered, errors, elapsed)
+            results[op]["errors_by_kind"] = dict(sorted(self.errors[op].items()))
+        everything.sort()
+        results["all"] = self._summary(
+            everything, sum(sum(kinds.values()) for kinds in self.errors.values()), elapsed
+        )
+        return results
+
+    @staticmethod
+    def _summary(ordered: List[float], errors: int, elapsed: float) -> dict:
+        summary = {
+            "requests": len(ordered) + errors,
+            "errors": errors,
+            "throughput_rps": len(ordered) / elapsed,
+        }
+        if ordered:
+            summary.update(
+                {
+                    "median_us": percentile(ordered, 0.50) * 1e6,
+                    "p95_us": percentile(ordered, 0.95) * 1e6,
+                    "p99_us": percentile(ordered, 0.99) * 1e6,
+                    "p999_us": percentile(ordered, 0.999) * 1e6,
+                    "max_us": ordered[-1] * 1e6,
+                }
+            )
+        return summary
+
+    def stages(self) -> Dict[str, float]:
+        """Mean RS server time per authorization stage (ms) over allowed requests"""
+        return {stage: total / count for stage, (total, count) in sorted(self.stage_ms.items())}
+
+
+class LoadGenerator:
+    """Agent population and the requests issued on its behalf"""
+
+    def __init__(self, as_url: str, rs_url: str, agents: int, mix: Dict[str, float], timeout: float):
+        self.as_url = as_url
+        self.rs_url = rs_url
+        self.agents = agents
+        self.timeout = timeout
+        self.ops = list(mix)
+        self.weights = list(mix.values())
+        self.root_tokens: List[Optional[str]] = [None] * agents
+        self.delegated_tokens: List[Optional[str]] = [None] * agents
+        self.recorder = Recorder()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        try:
+            return self._local.session
+        except AttributeError:
+            session = self._local.session = requests.Session()
+            return session
+
+    def _mint(self, agent: int) -> requests.Response:
+        return self.session.post(
+            self.as_url + "/token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": f"agent-load-{agent}",
+                "client_secret": "secret",
+                "operator": OPERATOR,
+                "task_id": f"task-load-{agent}",
+                "task_purpose": "load_test",
+                "capabilities": CAPABILITIES,
+                "audience": AUDIENCE,
+            },
+            timeout=self.timeout,
+        )
+
+    def populate(self):
+        """Mint a root token for every agent (not measured)"""
+        for agent in range(self.agents):
+            response = self._mint(agent)
+            if response.status_code != 200:
+                raise RuntimeError(f"Minting failed for agent-load-{agent}: {response.text}")
+            self.root_tokens[agent] = response.json()["access_token"]
+
+    def _token_for(self, agent: int) -> str:
+        delegated = self.delegated_tokens[agent]
+        return delegated if delegated and random.random() < 0.5 else self.root_tokens[agent]
+
+    def _send(self, op: str, agent: int) -> requests.Response:
+        if op == "token":
+            response = self._mint(agent)
+            if response.status_code == 200:
+                self.root_tokens[agent] = response.json()["access_token"]
+        elif op == "exchange":
+            response = self.session.post(
+                self.as_url + "/token",
+                data={
+                    "grant_type": EXCHANGE_GRANT,
+                    "subject_token": self.root_tokens[agent],
+                    "subject_token_type": ACCESS_TOKEN_TYPE,
+                    "resource": AUDIENCE,
+                },
+                timeout=self.timeout,
+            )
+            if response.status_code == 200:
+                self.delegated_tokens[agent] = response.json()["access_token"]
+        elif op == "search":
+            response = self.session.get(
+                self.rs_url + "/api/search",
+                params={"q": "load", "url": "https://example.org/page"},
+                headers={"Authorization": f"Bearer {self._token_for(agent)}"},
+                timeout=self.timeout,
+            )
+        else:
+            response = self.session.post(
+                self.rs_url + "/api/cms/draft",
+                json={"title": "load"},
+                headers={"Authorization": f"Bearer {self._token_for(agent)}"},
+                timeout=self.timeout,
+            )
+        return response
+
+    def next_operation(self) -> str:
+        """Draw an operation from the mix"""
+        return random.choices(self.ops, self.weights)[0]
+
+    def execute(self, op: str, started: float, record: bool):
+        """
+        Send one request and record its outcome
+
+        Args:
+            op: Operation to perform
+            started: perf_counter() time latency is measured from (the
+                scheduled arrival in open-loop mode)
+            record: False during warm-up
+        """
+        try:
+            response = self._send(op, random.randrange(self.agents))
+        except requests.Timeout:
+            if record:
+                self.recorder.error(op, "timeout")
+            return
+        except requests.RequestException:
+            if record:
+                self.recorder.error(op, "connection_error")
+            return
+        latency = time.perf_counter() - started
+        if not record:
+            return
+
+        server_timing = response.headers.get("Server-Timing")
+        if response.status_code == 200:
+            self.recorder.success(op, latency, server_timing)
+            return
+        try:
+            error = response.json().get("error", "unknown")
+        except ValueError:
+            error = "unknown"
+        kind = f"{response.status_code} {error}"
+        stage = last_passed_stage(server_timing)
+        self.recorder.error(op, f"{kind} (after {stage})" if stage else kind)
+
+
+def run_closed_loop(generator: LoadGenerator, concurrency: int, warmup: float, duration: float, think_time: float):
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    def worker():
+        while True:
+            started = time.perf_counter()
+            if started >= deadline:
+                return
+            generator.execute(generator.next_operation(), started, record=started >= measure_from)
+            if think_time:
+                time.sleep(think_time)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(
+    generator: LoadGenerator, rate: float, workers: int, warmup: float, duration: float, poisson: bool
+) -> int:
+    """
+    Dispatch requests at ``rate`` per second to a worker pool
+
+    Arrivals still queued shortly after the last one was scheduled are
+    recorded as ``not_sent`` errors.
+
+    Returns:
+        Number of measured arrivals never sent (the servers, or the worker
+        pool, could not keep up)
+    """
+    arrivals: "queue.Queue[Optional[Tuple[float, str]]]" = queue.Queue()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    stopped = threading.Event()
+
+    def worker():
+        while True:
+            arrival = arrivals.get()
+            if arrival is None or stopped.is_set():
+                return
+            scheduled, op = arrival
+            generator.execute(op, scheduled, record=scheduled >= measure_from)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    scheduled = start
+    while scheduled < deadline:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        arrivals.put((scheduled, generator.next_operation()))
+        scheduled += random.expovariate(rate) if poisson else 1.0 / rate
+
+    # Let the pool catch up briefly; whatever is still queued then was not sent
+    time.sleep(1.0)
+    stopped.set()
+    backlog = 0
+    while True:
+        try:
+            scheduled, op = arrivals.get_nowait()
+        except queue.Empty:
+            break
+        if scheduled >= measure_from:
+            generator.recorder.error(op, "not_sent")
+            backlog += 1
+    for _ in threads:
+        arrivals.put(None)
+    for thread in threads:
+        thread.join(generator.timeout)
+    return backlog
+
+
+def print_report(results: dict, stages: Dict[str, float], backlog: Optional[int]):
+    print(f"\n{'operation':<10} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9}")
+    for op, summary in results.items():
+        latencies = [summary.get(key) for key in ("median_us", "p95_us", "p99_us", "p999_us")]
+        columns = " ".join(
+            f"{value / 1000:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+            for value, width in zip(latencies, (8, 8, 8, 9))
+        )
+        print(f"{op:<10} {summary['requests']:>9} {summary['errors']:>7} {summary['throughput_rps']:>9.1f} {columns}")
+
+    errors = [(op, kind, count) for op, summary in results.items() for kind, count in summary.get("errors_by_kind", {}).items()]
+    if errors:
+        print("\nErrors:")
+        for op, kind, count in errors:
+            print(f"  {op:<10} {kind:<48} {count:>7}")
+    if backlog:
+        print(f"\n{backlog} scheduled requests were never sent (offered rate above capacity)")
+    if stages:
+        print("\nRS server time per stage (mean ms, allowed requests):")
+        for stage, ms in stages.items():
+            print(f"  {stage:<16} {ms:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP AS+RS end-to-end load generator")
+    model = parser.add_mutually_exclusive_group()
+    model.add_argument("--rate", type=float, help="Open loop: arrivals per second")
+    model.add_argument("--concurrency", type=int, help="Closed loop: number of concurrent workers")
+    parser.add_argument("--workers", type=int, default=64, help="Open loop: worker threads sending requests")
+    parser.add_argument("--poisson", action="store_true", help="Open loop: exponential inter-arrival times")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: pause between requests (s)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the run")
+    parser.add_argument("--agents", type=int, default=100, help="Agent population size")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout (s)")
+    parser.add_argument("--as-env", type=parse_env, action="append", default=[], metavar="KEY=VALUE", help="Extra AS environment (repeatable)")
+    parser.add_argument("--rs-env", type=parse_env, action="append", default=[], metavar="KEY=VALUE", help="Extra RS environment (repeatable)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    if args.rate is None and args.concurrency is None:
+        args.concurrency = 16
+
+    with tempfile.TemporaryDirectory() as workdir, LocalServers(workdir, args.as_env, args.rs_env) as servers:
+        print(f"AS {servers.as_url}  RS {servers.rs_url}")
+        generator = LoadGenerator(servers.as_url, servers.rs_url, args.agents, args.mix, args.timeout)
+        generator.populate()
+        print(f"Minted tokens for {args.agents} agents")
+
+        backlog = None
+        if args.rate is not None:
+            print(f"Open loop: {args.rate:g} req/s for {args.duration:g}s (+{args.warmup:g}s warm-up)")
+            backlog = run_open_loop(generator, args.rate, args.workers, args.warmup, args.duration, args.poisson)
+        else:
+            print(f"Closed loop: {args.concurrency} workers for {args.duration:g}s (+{args.warmup:g}s warm-up)")
+            run_closed_loop(generator, args.concurrency, args.warmup, args.duration, args.think_time)
+
+    results = generator.recorder.report(args.duration)
+    stages = generator.recorder.stages()
+    print_report(results, stages, backlog)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "benchmark": "load",
+                    "mode": "open" if args.rate is not None else "closed",
+                    "rate": args.rate,
+                    "concurrency": args.concurrency,
+                    "duration": args.duration,
+                    "agents": args.agents,
+                    "mix": args.mix,
+                    "backlog": backlog,
+                    "rs_stage_ms": stages,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Signing algorithm benchmark for AAP tokens
+
+Compares sign and verify throughput of ES256, RS256 and EdDSA (Ed25519)
+for a realistic AAP payload, using the same PyJWT calls as the AS
+(TokenIssuer) and RS (TokenValidator) with pre-parsed keys.
+
+Usage:
+    python benchmarks/bench_signing.py [--capabilities 4] [--output signing.json]
+"""
+
+import argparse
+import json
+
+from bench_utils import ALGORITHMS, generate_key_pair, measure, sample_payload
+
+import jwt
+
+
+def bench_algorithm(algorithm: str, payload: dict, min_time: float) -> dict:
+    """Measure sign and verify for one algorithm"""
+    private_pem, public_pem = generate_key_pair(algorithm)
+    jwt_algorithm = jwt.get_algorithm_by_name(algorithm)
+    signing_key = jwt_algorithm.prepare_key(private_pem)
+    verification_key = jwt_algorithm.prepare_key(public_pem)
+
+    token = jwt.encode(payload, signing_key, algorithm=algorithm)
+
+    sign = measure(lambda: jwt.encode(payload, signing_key, algorithm=algorithm), min_time)
+    verify = measure(
+        lambda: jwt.decode(
+            token, verification_key, algorithms=[algorithm], audience=payload["aud"]
+        ),
+        min_time,
+    )
+
+    return {
+        "sign": sign,
+        "verify": verify,
+        "token_bytes": len(token),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP signing algorithm benchmark")
+    parser.add_argument("--capabilities", type=int, default=4, help="Capabilities in payload")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds per round")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    payload = sample_payload(capability_count=args.capabilities)
+    results = {alg: bench_algorithm(alg, payload, args.min_time) for alg in ALGORITHMS}
+
+    print(f"{'algorithm':<10} {'sign ops/s':>12} {'verify ops/s':>14} {'token bytes':>12}")
+    for algorithm, result in results.items():
+        print(
+            f"{algorithm:<10} {result['sign']['ops_per_sec']:>12.0f} "
+            f"{result['verify']['ops_per_sec']:>14.0f} {result['token_bytes']:>12}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "signing", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Startup-time benchmark for the AAP Authorization Server
+
+Measures, in fresh interpreter processes:
+- import time of ``as.server`` (must not touch keys or policies)
+- warm-up time (policy compilation and key loading)
+- time-to-first-token (import + warm-up + first /token request)
+
+Results are compared against a startup budget; the script exits non-zero
+if the budget is exceeded.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 10] [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench_utils import REFERENCE_IMPL_DIR, write_key_pair
+
+
+# Startup budget in milliseconds (median over runs)
+BUDGET_MS = {
+    "import_ms": 400.0,
+    "time_to_first_token_ms": 800.0,
+}
+
+# Executed in a fresh interpreter; prints one JSON line with timings
+CHILD_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import importlib
+server = importlib.import_module("as.server")
+t1 = time.perf_counter()
+app = server.create_app()
+server.get_components(app).warm_up()
+t2 = time.perf_counter()
+response = app.test_client().post("/token", data={
+    "grant_type": "client_credentials",
+    "client_id": "agent-bench-01",
+    "client_secret": "secret",
+    "operator": "org:acme-corp",
+    "task_id": "task-bench",
+    "task_purpose": "benchmark",
+    "capabilities": "search.web",
+})
+t3 = time.perf_counter()
+assert response.status_code == 200, response.get_data(as_text=True)
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "warm_up_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "time_to_first_token_ms": (t3 - t0) * 1000,
+}))
+"""
+
+# Importing must succeed even when keys are missing
+IMPORT_ONLY_SCRIPT = """
+import importlib
+importlib.import_module("as.server")
+"""
+
+
+def run_child(script: str, env: dict) -> str:
+    """Run a script in a fresh interpreter from the reference-impl directory"""
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REFERENCE_IMPL_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{result.stderr}")
+    return result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP AS startup benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Number of fresh processes")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Import must not depend on keys being present
+        missing_keys_env = dict(os.environ)
+        missing_keys_env["AAP_PRIVATE_KEY_PATH"] = os.path.join(tmp, "missing.pem")
+        run_child(IMPORT_ONLY_SCRIPT, missing_keys_env)
+
+        private_path, public_path = write_key_pair(tmp)
+        env = dict(os.environ)
+        env["AAP_PRIVATE_KEY_PATH"] = private_path
+        env["AAP_PUBLIC_KEY_PATH"] = public_path
+        env["AAP_POLICY_PATH"] = os.path.join(REFERENCE_IMPL_DIR, "policies")
+
+        samples = [json.loads(run_child(CHILD_SCRIPT, env)) for _ in range(args.runs)]
+
+    results = {
+        metric: {
+            "median": statistics.median(s[metric] for s in samples),
+            "min": min(s[metric] for s in samples),
+            "max": max(s[metric] for s in samples),
+        }
+        for metric in samples[0]
+    }
+
+    over_budget = {
+        metric: results[metric]["median"]
+        for metric, budget in BUDGET_MS.items()
+        if results[metric]["median"] > budget
+    }
+
+    report = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "results_ms": results,
+        "budget_ms": BUDGET_MS,
+        "over_budget": over_budget,
+    }
+
+    for metric, values in results.items():
+        budget = BUDGET_MS.get(metric)
+        suffix = f" (budget {budget:.0f})" if budget else ""
+        print(f"{metric:<24} median {values['median']:8.1f} ms{suffix}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if over_budget:
+        print(f"Startup budget exceeded: {over_budget}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Token format benchmark: JWT (JSON) vs CWT (CBOR/COSE)
+
+For growing capability counts and delegation depths, compares:
+- encoded token size in bytes (what goes in the Authorization header)
+- encode (sign) time at the AS
+- full RS validation time (TokenValidator.validate: parse, verify, claim checks)
+
+Usage:
+    python benchmarks/bench_token_formats.py [--algorithm ES256] [--output formats.json]
+"""
+
+import argparse
+import json
+
+from bench_utils import generate_key_pair, measure, sample_payload
+
+import jwt
+
+from common import cwt
+from rs.validator import TokenValidator
+
+
+# (capability_count, delegation_depth) combinations
+SCENARIOS = [(1, 0), (4, 0), (16, 0), (4, 2), (16, 4), (64, 4)]
+
+
+def bench_scenario(
+    capability_count: int, delegation_depth: int, algorithm: str, keys: tuple, min_time: float
+) -> dict:
+    """Measure both formats for one payload shape"""
+    private_pem, public_pem = keys
+    jwt_algorithm = jwt.get_algorithm_by_name(algorithm)
+    signing_key = jwt_algorithm.prepare_key(private_pem)
+
+    payload = sample_payload(capability_count, delegation_depth)
+    validator = TokenValidator(
+        public_key=public_pem,
+        audience=payload["aud"],
+        trusted_issuers=[payload["iss"]],
+        algorithms=[algorithm],
+    )
+
+    encoders = {
+        "jwt": lambda: jwt.encode(payload, signing_key, algorithm=algorithm),
+        "cwt": lambda: cwt.encode_cwt(payload, signing_key, algorithm),
+    }
+
+    result = {}
+    for name, encode in encoders.items():
+        token = encode()
+        assert validator.validate(token) == payload, f"{name} round trip mismatch"
+        result[name] = {
+            "token_bytes": len(token),
+            "encode": measure(encode, min_time),
+            "validate": measure(lambda: validator.validate(token), min_time),
+        }
+
+    result["size_ratio"] = result["cwt"]["token_bytes"] / result["jwt"]["token_bytes"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AAP token format benchmark (JWT vs CWT)")
+    parser.add_argument("--algorithm", default="ES256", help="Signing algorithm")
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds per round")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    keys = generate_key_pair(args.algorithm)
+    results = {
+        f"caps={caps},depth={depth}": bench_scenario(caps, depth, args.algorithm, keys, args.min_time)
+        for caps, depth in SCENARIOS
+    }
+
+    print(
+        f"{'scenario':<18} {'jwt bytes':>10} {'cwt bytes':>10} {'ratio':>6} "
+        f"{'jwt validate us':>16} {'cwt validate us':>16}"
+    )
+    for scenario, result in results.items():
+        print(
+            f"{scenario:<18} {result['jwt']['token_bytes']:>10} {result['cwt']['token_bytes']:>10} "
+            f"{result['size_ratio']:>6.2f} {result['jwt']['validate']['median_us']:>16.1f} "
+            f"{result['cwt']['validate']['median_us']:>16.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"benchmark": "token_formats", "algorithm": args.algorithm, "results": results},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
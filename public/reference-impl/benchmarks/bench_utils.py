@@ -0,0 +1,158 @@
+"""
+Shared helpers for AAP reference implementation benchmarks
+"""
+
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+
+REFERENCE_IMPL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the as/rs/common packages importable when run as a script
+if REFERENCE_IMPL_DIR not in sys.path:
+    sys.path.insert(0, REFERENCE_IMPL_DIR)
+
+ALGORITHMS = ("ES256", "RS256", "EdDSA")
+
+
+def generate_key_pair(algorithm: str) -> Tuple[bytes, bytes]:
+    """
+    Generate a signing key pair for an algorithm
+
+    Returns:
+        Tuple of (private_key, public_key) in PEM format
+    """
+    if algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    elif algorithm == "RS256":
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f"Unsupported algorithm: {algorithm}")
+
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_pem, public_pem
+
+
+def write_key_pair(directory: str, algorithm: str = "ES256") -> Tuple[str, str]:
+    """
+    Generate a key pair and write it as as_private_key.pem / as_public_key.pem
+
+    Returns:
+        Tuple of (private_key_path, public_key_path)
+    """
+    private_pem, public_pem = generate_key_pair(algorithm)
+    private_path = os.path.join(directory, "as_private_key.pem")
+    public_path = os.path.join(directory, "as_public_key.pem")
+
+    with open(private_path, "wb") as f:
+        f.write(private_pem)
+    with open(public_path, "wb") as f:
+        f.write(public_pem)
+
+    return private_path, public_path
+
+
+def sample_payload(capability_count: int = 4, delegation_depth: int = 0) -> Dict[str, Any]:
+    """Realistic AAP token payload for encode/decode benchmarks"""
+    now = int(time.time())
+    chain = ["agent-researcher-01"] + [
+        f"https://tool-{i}.example.com" for i in range(delegation_depth)
+    ]
+    return {
+        "iss": "https://as.example.com",
+        "sub": "agent-researcher-01",
+        "aud": "https://api.example.com",
+        "exp": now + 3600,
+        "iat": now,
+        "jti": "7f3c9a2e-1b4d-4e8f-9a6c-2d5e8f1a3b7c",
+        "agent": {
+            "id": "agent-researcher-01",
+            "type": "llm-autonomous",
+            "operator": "org:acme-corp",
+            "model": "example-model-v1",
+        },
+        "task": {
+            "id": "task-123",
+            "purpose": "research_climate_data",
+            "created_at": now,
+        },
+        "capabilities": [
+            {
+                "action": f"search.web{i}",
+                "constraints": {
+                    "domains_allowed": ["example.org", "trusted.com"],
+                    "max_requests_per_hour": 100,
+                    "max_requests_per_minute": 10,
+                },
+            }
+            for i in range(capability_count)
+        ],
+        "delegation": {
+            "depth": delegation_depth,
+            "max_depth": max(2, delegation_depth),
+            "chain": chain,
+        },
+        "oversight": {
+            "requires_human_approval_for": ["cms.publish"],
+            "approval_reference": "https://approval.acme-corp.com/agent-actions",
+        },
+        "audit": {
+            "trace_id": "4b1e6f0a-8c2d-4f3e-9b7a-1c5d2e8f0a6b",
+            "log_level": "full",
+        },
+    }
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.5, repeat: int = 5) -> Dict[str, float]:
+    """
+    Time a callable
+
+    Calibrates the number of calls per round so each round takes at least
+    ``min_time`` seconds, then reports per-call statistics over ``repeat`` rounds.
+
+    Returns:
+        Dict with median/min per-call time in microseconds and ops/sec
+    """
+    func()  # warm up
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 5:
+            break
+        number *= 2
+
+    number = max(1, int(number * (min_time / max(elapsed, 1e-9))))
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+
+    median = statistics.median(rounds)
+    return {
+        "median_us": median * 1e6,
+        "min_us": min(rounds) * 1e6,
+        "ops_per_sec": 1.0 / median,
+        "calls_per_round": number,
+    }
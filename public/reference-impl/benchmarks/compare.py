@@ -0,0 +1,79 @@
+"""
+Compare two benchmark result files and flag regressions
+
+Works with the JSON written by any benchmark in this directory: every entry
+with a ``median_us`` timing is matched by its path in the two files.
+
+Usage:
+    python benchmarks/compare.py baseline.json current.json [--threshold 0.10]
+
+Exits with status 1 if any timing got slower by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+
+def timings(node: Any, path: str = "") -> Dict[str, float]:
+    """Flatten a results document into {path: median_us}"""
+    if isinstance(node, dict):
+        if "median_us" in node:
+            return {path: node["median_us"]}
+        found = {}
+        for key, value in node.items():
+            found.update(timings(value, f"{path}/{key}" if path else key))
+        return found
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare AAP benchmark results")
+    parser.add_argument("baseline", help="Baseline results (JSON)")
+    parser.add_argument("current", help="Current results (JSON)")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown reported as a regression (default: 0.10 = 10%%)",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    if baseline.get("benchmark") != current.get("benchmark"):
+        parser.error(
+            f"Different benchmarks: {baseline.get('benchmark')} vs {current.get('benchmark')}"
+        )
+
+    before = timings(baseline.get("results", {}))
+    after = timings(current.get("results", {}))
+
+    regressions = []
+    print(f"{'case':<56} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for path in sorted(before.keys() & after.keys()):
+        change = after[path] / before[path] - 1
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(path)
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{path:<56} {before[path]:>12.1f} {after[path]:>12.1f} {change:>+8.1%}{flag}")
+
+    for path in sorted(before.keys() - after.keys()):
+        print(f"{path:<56} missing from current results")
+    for path in sorted(after.keys() - before.keys()):
+        print(f"{path:<56} new (no baseline)")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
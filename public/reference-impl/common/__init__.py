@@ -0,0 +1,8 @@
+"""
+AAP Reference Implementation - Shared Components
+
+Code used by both the Authorization Server (``as``) and the Resource Server
+(``rs``), such as proof-of-possession verification.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,162 @@
+"""
+Action Name Matching
+
+Action names are dotted component paths (Section 5.5). A capability can
+grant a whole namespace with a trailing ``*`` component: ``cms.*`` covers
+``cms.publish`` and ``cms.drafts.create``, but not ``cms`` itself. When
+several capabilities cover an action, the most specific one wins: an exact
+match, else the wildcard with the longest namespace. Among equals the first
+listed wins, as with exact matching.
+
+``most_specific`` is the reference implementation (a scan of the list).
+``ActionTrie`` indexes a list by action component once, so each lookup costs
+one dict lookup per component of the requested action, however many
+capabilities the list holds.
+"""
+
+from typing import Any, Callable, Dict, Generic, Iterable, Optional, Set, TypeVar
+
+T = TypeVar("T")
+
+WILDCARD = "*"
+
+
+def valid_action_name(action: Any) -> bool:
+    """
+    Check an action name against the ABNF grammar (Section 5.5)
+
+    action-name = component *( "." component )
+    component   = ALPHA *( ALPHA / DIGIT / "-" / "_" )
+
+    optionally followed by ``.*`` to name a namespace.
+    """
+    if not action or not isinstance(action, str):
+        return False
+
+    components = action.split(".")
+    if len(components) > 1 and components[-1] == WILDCARD:
+        components.pop()
+
+    for component in components:
+        if not component:
+            # Empty component (e.g., "search..web")
+            return False
+
+        # First character must be alphabetic
+        if not component[0].isalpha():
+            return False
+
+        # Remaining characters must be alphanumeric, hyphen, or underscore
+        for char in component[1:]:
+            if not (char.isalnum() or char in "-_"):
+                return False
+
+    return True
+
+
+def namespace_prefix(action: Any) -> Optional[str]:
+    """``"cms."`` for the wildcard action ``"cms.*"``; None for any other action"""
+    if isinstance(action, str) and len(action) > 2 and action.endswith("." + WILDCARD):
+        return action[:-1]
+    return None
+
+
+def most_specific(items: Iterable[T], action: Any, key: Callable[[T], Any]) -> Optional[T]:
+    """
+    Item whose action (``key(item)``) best covers the requested action (reference scan)
+
+    Returns:
+        The first exact match, else the first wildcard with the longest
+        covering namespace, else None
+    """
+    best = None
+    best_length = -1
+    for item in items:
+        granted = key(item)
+        if granted == action:
+            return item
+        prefix = namespace_prefix(granted)
+        if (
+            prefix is not None
+            and len(prefix) > best_length
+            and isinstance(action, str)
+            and action.startswith(prefix)
+        ):
+            best, best_length = item, len(prefix)
+    return best
+
+
+def action_permitted(permitted: Set[str], action: Any) -> bool:
+    """True if ``action``, or a namespace wildcard covering it, is in ``permitted``"""
+    if action in permitted:
+        return True
+    if not isinstance(action, str):
+        return False
+    position = action.rfind(".")
+    while position > 0:
+        if action[: position + 1] + WILDCARD in permitted:
+            return True
+        position = action.rfind(".", 0, position)
+    return False
+
+
+class _Node:
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.exact = None
+        self.wildcard = None
+
+
+class ActionTrie(Generic[T]):
+    """
+    Items indexed by the components of their action
+
+    Answers ``most_specific`` for any requested action in O(action depth).
+    Items whose action is not a string are left out (they never match a
+    string action).
+    """
+
+    __slots__ = ("root", "size")
+
+    def __init__(self, items: Iterable[T], key: Callable[[T], Any]):
+        self.root = _Node()
+        self.size = 0
+        for item in items:
+            action = key(item)
+            if not isinstance(action, str):
+                continue
+            self.size += 1
+            node = self._node(action.split("."))
+            if node.exact is None:
+                node.exact = (item,)  # Wrapped: a None item is a valid match
+            prefix = namespace_prefix(action)
+            if prefix is not None:
+                node = self._node(prefix[:-1].split("."))
+                if node.wildcard is None:
+                    node.wildcard = (item,)
+
+    def _node(self, components) -> _Node:
+        node = self.root
+        for component in components:
+            child = node.children.get(component)
+            if child is None:
+                child = node.children[component] = _Node()
+            node = child
+        return node
+
+    def find(self, action: str) -> Optional[T]:
+        """Most specific item for ``action`` (same result as ``most_specific``)"""
+        node = self.root
+        best = None
+        for component in action.split("."):
+            if node.wildcard is not None:
+                best = node.wildcard
+            node = node.children.get(component)
+            if node is None:
+                break
+        else:
+            if node.exact is not None:
+                return node.exact[0]
+        return best[0] if best is not None else None
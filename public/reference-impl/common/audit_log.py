@@ -0,0 +1,254 @@
+"""
+Asynchronous Audit Event Pipeline
+
+Records what the AS issued/exchanged and what the RS allowed/denied as
+structured JSON events, without blocking the request path:
+
+- ``emit()`` only appends the event dict to a bounded in-memory queue.
+- A background writer thread serializes events in batches and appends them
+  to JSONL segment files (optionally gzip-compressed), rotating segments by
+  size or age. Segments are append-only and never rewritten.
+- When the queue is full, the overflow policy decides: ``drop_newest``
+  (default; the request path never waits), ``drop_oldest``, or ``block``
+  (wait up to ``block_timeout`` for space, then drop). Drops are counted.
+- A failed write (disk full, directory removed, ...) is logged and its batch
+  counted as dropped; the writer keeps running and retries with a new
+  segment on the next batch.
+- ``close()`` drains the queue and closes the current segment; it is
+  registered with ``atexit`` so events are flushed on interpreter shutdown.
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class AuditLog:
+    """Bounded, batched, rotating JSONL audit writer"""
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "audit",
+        max_queue: int = 10_000,
+        overflow: str = "drop_newest",
+        block_timeout: float = 0.05,
+        batch_size: int = 512,
+        flush_interval: float = 1.0,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_seconds: float = 3600,
+        compress: bool = False,
+        fsync: bool = False,
+    ):
+        """
+        Initialize audit log (the writer thread starts on first emit)
+
+        Args:
+            directory: Directory for segment files (created if missing)
+            prefix: Segment file name prefix (e.g. "as-audit", "rs-audit")
+            max_queue: Events buffered in memory before the overflow policy applies
+            overflow: drop_newest, drop_oldest, or block
+            block_timeout: Seconds ``emit`` may wait for space under the block policy
+            batch_size: Maximum events written per batch
+            flush_interval: Maximum seconds an event waits before being written
+            max_segment_bytes: Rotate when the segment reaches this size (uncompressed bytes)
+            max_segment_seconds: Rotate when the segment is this old
+            compress: Write gzip-compressed segments (.jsonl.gz)
+            fsync: fsync after every batch (durability over throughput)
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+
+        self.directory = directory
+        self.prefix = prefix
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+        self.compress = compress
+        self.fsync = fsync
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._segment = None
+        self._segment_path: Optional[str] = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._segment_seq = 0
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+
+    def emit(self, event_type: str, **fields: Any) -> bool:
+        """
+        Enqueue an audit event (never performs I/O)
+
+        Args:
+            event_type: Event name, e.g. "token.issued" or "request.denied"
+            **fields: Event fields (JSON-serializable)
+
+        Returns:
+            True if the event was queued, False if it was dropped
+        """
+        event = {"ts": time.time(), "event": event_type}
+        event.update(fields)
+
+        with self._cond:
+            if self._closed:
+                self.dropped += 1
+                return False
+
+            if self._thread is None:
+                self._start()
+
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.overflow == "block":
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.max_queue and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    if len(self._queue) >= self.max_queue or self._closed:
+                        self.dropped += 1
+                        return False
+                else:
+                    self.dropped += 1
+                    return False
+
+            self._queue.append(event)
+            self.enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring"""
+        with self._cond:
+            return {
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "queued": len(self._queue),
+            }
+
+    def close(self, timeout: float = 10.0):
+        """Flush queued events and close the current segment (idempotent)"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join(timeout)
+
+    def _start(self):
+        """Start the writer thread (caller holds the condition)"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"{self.prefix}-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        """Writer loop: wait for a batch or the flush interval, then write"""
+        while True:
+            with self._cond:
+                if not self._queue and not self._closed:
+                    self._cond.wait(self.flush_interval)
+                elif len(self._queue) < self.batch_size and not self._closed:
+                    self._cond.wait(self.flush_interval)
+
+                batch: List[Dict[str, Any]] = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                done = self._closed and not self._queue
+                self._cond.notify_all()  # Wake emitters blocked on a full queue
+
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError as e:
+                    # The thread must survive, or every later event is lost too
+                    logger.error("Audit write to %s failed: %s", self._segment_path, e)
+                    with self._cond:
+                        self.dropped += len(batch)
+                    self._close_segment()
+            elif self._segment is not None and self._segment_expired():
+                self._close_segment()
+
+            if done:
+                self._close_segment()
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        """Serialize and append one batch, rotating the segment if needed"""
+        data = "".join(
+            json.dumps(event, separators=(",", ":"), default=str) + "\n" for event in batch
+        ).encode("utf-8")
+
+        if self._segment is not None and (
+            self._segment_bytes >= self.max_segment_bytes or self._segment_expired()
+        ):
+            self._close_segment()
+        if self._segment is None:
+            self._open_segment()
+
+        self._segment.write(data)
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+
+        self._segment_bytes += len(data)
+        with self._cond:
+            self.written += len(batch)
+
+    def _segment_expired(self) -> bool:
+        return time.monotonic() - self._segment_opened >= self.max_segment_seconds
+
+    def _open_segment(self):
+        """Open a new append-only segment file"""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._segment_seq += 1
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        self._segment_path = os.path.join(
+            self.directory, f"{self.prefix}-{stamp}-{os.getpid()}-{self._segment_seq:04d}{suffix}"
+        )
+        self._segment = (
+            gzip.open(self._segment_path, "ab") if self.compress else open(self._segment_path, "ab")
+        )
+        self._segment_bytes = 0
+        self._segment_opened = time.monotonic()
+
+    def _close_segment(self):
+        if self._segment is not None:
+            segment, self._segment = self._segment, None
+            try:
+                segment.close()
+            except OSError as e:
+                logger.error("Closing audit segment %s failed: %s", self._segment_path, e)
+
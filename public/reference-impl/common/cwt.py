@@ -0,0 +1,334 @@
+"""
+Compact AAP Tokens: CWT (RFC 8392) signed with COSE_Sign1 (RFC 9052)
+
+An alternative to JSON JWTs for large AAP tokens. Claims are CBOR-encoded
+with integer keys: registered CWT claims use their IANA keys, AAP claims and
+frequent nested member names use private-use keys. The token is transported
+as base64url (no padding) of the tagged COSE_Sign1 structure, so it never
+contains a "." and is easy to tell apart from a JWT.
+
+Signatures reuse PyJWT's algorithm implementations, so ES256, RS256 and
+EdDSA produce the same raw signature bytes as in a JWS.
+
+Requires the optional ``cbor2`` package.
+"""
+
+import base64
+import uuid
+from typing import Dict, Any, Optional, Tuple
+
+import jwt
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - optional dependency
+    cbor2 = None
+
+
+# COSE algorithm identifiers (RFC 9053 / RFC 8812)
+COSE_ALGORITHMS = {"ES256": -7, "EdDSA": -8, "RS256": -257}
+COSE_ALGORITHM_NAMES = {value: name for name, value in COSE_ALGORITHMS.items()}
+
+# COSE header parameters
+HEADER_ALG = 1
+HEADER_KID = 4
+
+# CBOR tags
+TAG_COSE_SIGN1 = 18
+TAG_CWT = 61
+
+# Top-level claim keys: IANA CWT registry, then private use (< -65536) for AAP claims
+CLAIM_KEYS = {
+    "iss": 1,
+    "sub": 2,
+    "aud": 3,
+    "exp": 4,
+    "nbf": 5,
+    "iat": 6,
+    "cti": 7,
+    "cnf": 8,
+    "agent": -65537,
+    "task": -65538,
+    "capabilities": -65539,
+    "delegation": -65540,
+    "oversight": -65541,
+    "audit": -65542,
+}
+CLAIM_NAMES = {value: name for name, value in CLAIM_KEYS.items()}
+
+# Frequent member names inside AAP claims (positive keys, scoped to nested maps)
+MEMBER_KEYS = {
+    "id": 1,
+    "type": 2,
+    "operator": 3,
+    "purpose": 4,
+    "created_at": 5,
+    "action": 6,
+    "constraints": 7,
+    "description": 8,
+    "resources": 9,
+    "depth": 10,
+    "max_depth": 11,
+    "chain": 12,
+    "parent_jti": 13,
+    "root_jti": 14,
+    "privilege_reduction": 15,
+    "domains_allowed": 16,
+    "domains_blocked": 17,
+    "max_requests_per_hour": 18,
+    "max_requests_per_minute": 19,
+    "time_window": 20,
+    "allowed_methods": 21,
+    "max_request_size": 22,
+    "requires_human_approval_for": 23,
+    "approval_reference": 24,
+    "trace_id": 25,
+    "log_level": 26,
+    "retention_period": 27,
+    "compliance_framework": 28,
+    "capabilities_removed": 29,
+    "lifetime_reduced_by": 30,
+    "jkt": 31,
+    "name": 32,
+    "version": 33,
+    "model": 34,
+    "runtime": 35,
+    "category": 36,
+    "priority": 37,
+    "created_by": 38,
+    "level": 39,
+    "start": 40,
+    "end": 41,
+    "chain_digest": 42,
+}
+MEMBER_NAMES = {value: name for name, value in MEMBER_KEYS.items()}
+
+
+class CWTError(Exception):
+    """CWT could not be decoded or verified"""
+
+
+class CWTSignatureError(CWTError):
+    """CWT signature verification failed"""
+
+
+def _require_cbor():
+    if cbor2 is None:
+        raise RuntimeError("CWT support requires the 'cbor2' package (pip install cbor2)")
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _compress(value: Any) -> Any:
+    """Replace known member names with integer keys (recursively)"""
+    if isinstance(value, dict):
+        return {MEMBER_KEYS.get(k, k): _compress(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compress(item) for item in value]
+    return value
+
+
+def _expand(value: Any) -> Any:
+    """Restore member names from integer keys (recursively)"""
+    if isinstance(value, dict):
+        return {MEMBER_NAMES.get(k, k): _expand(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_expand(item) for item in value]
+    return value
+
+
+def _encode_jti(jti: str) -> bytes:
+    """jti -> cti byte string (16 bytes for UUIDs)"""
+    try:
+        return uuid.UUID(jti).bytes
+    except ValueError:
+        return jti.encode("utf-8")
+
+
+def _decode_cti(cti: bytes) -> str:
+    """cti byte string -> jti"""
+    if not isinstance(cti, bytes):
+        raise CWTError("CWT cti must be a byte string")
+    if len(cti) == 16:
+        return str(uuid.UUID(bytes=cti))
+    try:
+        return cti.decode("utf-8")
+    except UnicodeDecodeError:
+        raise CWTError("CWT cti is not a UUID or UTF-8 string")
+
+
+def claims_to_cbor_map(payload: Dict[str, Any]) -> Dict[Any, Any]:
+    """Convert a JWT-style payload to a CWT claims map with integer keys"""
+    claims: Dict[Any, Any] = {}
+    for name, value in payload.items():
+        if name == "jti":
+            claims[CLAIM_KEYS["cti"]] = _encode_jti(value)
+        elif name in CLAIM_KEYS:
+            claims[CLAIM_KEYS[name]] = _compress(value) if isinstance(value, (dict, list)) else value
+        else:
+            claims[name] = value
+    return claims
+
+
+def cbor_map_to_claims(claims: Dict[Any, Any]) -> Dict[str, Any]:
+    """Convert a CWT claims map back to a JWT-style payload"""
+    payload: Dict[str, Any] = {}
+    for key, value in claims.items():
+        if key == CLAIM_KEYS["cti"]:
+            payload["jti"] = _decode_cti(value)
+        elif key in CLAIM_NAMES:
+            payload[CLAIM_NAMES[key]] = _expand(value) if isinstance(value, (dict, list)) else value
+        else:
+            payload[key] = value
+    return payload
+
+
+def _sig_structure(protected: bytes, payload: bytes) -> bytes:
+    """COSE Sig_structure for COSE_Sign1 (RFC 9052 Section 4.4)"""
+    return cbor2.dumps(["Signature1", protected, b"", payload])
+
+
+def is_cwt(token: str) -> bool:
+    """True if the token looks like a base64url CWT rather than a JWT"""
+    return "." not in token
+
+
+def encode_cwt(
+    payload: Dict[str, Any], key: Any, algorithm: str, kid: Optional[str] = None
+) -> str:
+    """
+    Encode and sign a payload as a COSE_Sign1 CWT
+
+    Args:
+        payload: JWT-style claims
+        key: Signing key (PEM or parsed key object)
+        algorithm: ES256, RS256, or EdDSA
+        kid: Optional key identifier
+
+    Returns:
+        base64url-encoded CWT
+    """
+    _require_cbor()
+    if algorithm not in COSE_ALGORITHMS:
+        raise ValueError(f"Unsupported CWT algorithm: {algorithm}")
+
+    jwt_algorithm = jwt.get_algorithm_by_name(algorithm)
+    protected = cbor2.dumps({HEADER_ALG: COSE_ALGORITHMS[algorithm]})
+    unprotected = {HEADER_KID: kid.encode("utf-8")} if kid else {}
+    body = cbor2.dumps(claims_to_cbor_map(payload))
+
+    signature = jwt_algorithm.sign(
+        _sig_structure(protected, body), jwt_algorithm.prepare_key(key)
+    )
+
+    message = cbor2.CBORTag(
+        TAG_CWT, cbor2.CBORTag(TAG_COSE_SIGN1, [protected, unprotected, body, signature])
+    )
+    return _b64url_encode(cbor2.dumps(message))
+
+
+def _parse(token: str) -> Tuple[bytes, Dict[Any, Any], bytes, bytes, Dict[Any, Any]]:
+    """
+    Split a CWT into (protected, unprotected, payload, signature, protected_map)
+
+    Raises:
+        CWTError: Unless the token is a COSE_Sign1 array of [bstr protected
+            header, map unprotected header, bstr payload, bstr signature] with
+            a map-encoded protected header and byte-string kid
+    """
+    if cbor2 is None:
+        raise CWTError("CWT support requires the 'cbor2' package")
+    try:
+        message = cbor2.loads(_b64url_decode(token))
+        while isinstance(message, cbor2.CBORTag):
+            message = message.value
+        if not isinstance(message, list) or len(message) != 4:
+            raise CWTError("Malformed CWT: not a COSE_Sign1 array")
+        protected, unprotected, body, signature = message
+        if not isinstance(protected, bytes):
+            raise CWTError("Malformed CWT: protected header is not a byte string")
+        if not isinstance(unprotected, dict):
+            raise CWTError("Malformed CWT: unprotected header is not a map")
+        if not isinstance(body, bytes) or not isinstance(signature, bytes):
+            raise CWTError("Malformed CWT: payload and signature must be byte strings")
+        protected_map = cbor2.loads(protected) if protected else {}
+    except (ValueError, TypeError, cbor2.CBORDecodeError) as e:
+        raise CWTError(f"Malformed CWT: {e}")
+
+    if not isinstance(protected_map, dict):
+        raise CWTError("Malformed CWT: protected header is not a map")
+    if HEADER_ALG in protected_map and not isinstance(protected_map[HEADER_ALG], int):
+        raise CWTError("Malformed CWT: alg is not an integer")
+    for header in (protected_map, unprotected):
+        if HEADER_KID in header and not isinstance(header[HEADER_KID], bytes):
+            raise CWTError("Malformed CWT: kid is not a byte string")
+    return protected, unprotected, body, signature, protected_map
+
+
+def get_unverified_cwt_header(token: str) -> Dict[str, Any]:
+    """
+    Read the COSE header of a CWT without verifying it
+
+    Returns:
+        Dict with ``alg`` (JOSE algorithm name) and ``kid`` if present
+    """
+    _, unprotected, _, _, protected_map = _parse(token)
+    header: Dict[str, Any] = {"alg": COSE_ALGORITHM_NAMES.get(protected_map.get(HEADER_ALG))}
+    kid = unprotected.get(HEADER_KID) or protected_map.get(HEADER_KID)
+    if kid:
+        try:
+            header["kid"] = kid.decode("utf-8")
+        except UnicodeDecodeError:
+            raise CWTError("Malformed CWT: kid is not UTF-8")
+    return header
+
+
+def decode_cwt(
+    token: str,
+    key: Any = None,
+    algorithms: Optional[list] = None,
+    verify_signature: bool = True,
+) -> Dict[str, Any]:
+    """
+    Verify a CWT signature and return its claims as a JWT-style payload
+
+    Only the signature is checked here; callers validate exp/aud/iss.
+
+    Args:
+        token: base64url-encoded CWT
+        key: Verification key (PEM or parsed key object)
+        algorithms: Allowed algorithms
+        verify_signature: Set False to read claims without verification
+
+    Raises:
+        CWTSignatureError: If the signature is invalid
+        CWTError: If the token is malformed or the algorithm is not allowed
+    """
+    protected, _, body, signature, protected_map = _parse(token)
+
+    if verify_signature:
+        algorithm = COSE_ALGORITHM_NAMES.get(protected_map.get(HEADER_ALG))
+        if algorithm is None or algorithm not in (algorithms or []):
+            raise CWTError("The specified alg value is not allowed")
+
+        jwt_algorithm = jwt.get_algorithm_by_name(algorithm)
+        if not jwt_algorithm.verify(
+            _sig_structure(protected, body), jwt_algorithm.prepare_key(key), signature
+        ):
+            raise CWTSignatureError("Signature verification failed")
+
+    try:
+        claims = cbor2.loads(body)
+    except (ValueError, TypeError, cbor2.CBORDecodeError) as e:
+        raise CWTError(f"Malformed CWT payload: {e}")
+
+    if not isinstance(claims, dict):
+        raise CWTError("CWT payload is not a claims map")
+
+    return cbor_map_to_claims(claims)
@@ -0,0 +1,300 @@
+"""
+DPoP (RFC 9449) Proof Verification
+
+Verifies DPoP proof JWTs presented to the Authorization Server (token
+binding) and to Resource Servers (proof-of-possession of ``cnf.jkt``).
+
+Performance notes:
+- Proof jtis are kept in a replay cache that expires whole time buckets, so
+  memory is bounded by request rate x proof lifetime and purging is O(1) per bucket.
+- Parsed proof keys and their RFC 7638 thumbprints are cached by JWK, so a
+  client reusing its key does not pay for JWK parsing on every request.
+"""
+
+import base64
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import jwt
+
+from .metrics import CACHE_REQUESTS
+
+
+DEFAULT_ALGORITHMS = ["ES256", "RS256", "EdDSA"]
+
+# RFC 7638 Section 3.2: required members per key type
+THUMBPRINT_MEMBERS = {
+    "EC": ("crv", "kty", "x", "y"),
+    "RSA": ("e", "kty", "n"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+
+class DPoPError(Exception):
+    """DPoP proof is invalid"""
+
+    def __init__(self, description: str):
+        self.description = description
+        super().__init__(description)
+
+
+def b64url(data: bytes) -> str:
+    """Base64url encoding without padding"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def jwk_thumbprint(jwk: Dict[str, Any]) -> str:
+    """
+    Compute the RFC 7638 JWK thumbprint (SHA-256, base64url)
+
+    Raises:
+        DPoPError: If the key type is not supported
+    """
+    members = THUMBPRINT_MEMBERS.get(jwk.get("kty"))
+    if not members:
+        raise DPoPError("Unsupported DPoP key type")
+    canonical = json.dumps(
+        {name: jwk[name] for name in members}, separators=(",", ":"), sort_keys=True
+    )
+    return b64url(hashlib.sha256(canonical.encode("utf-8")).digest())
+
+
+def access_token_hash(access_token: str) -> str:
+    """Compute the ``ath`` claim for an access token (RFC 9449 Section 4.2)"""
+    return b64url(hashlib.sha256(access_token.encode("ascii")).digest())
+
+
+def normalize_htu(url: str) -> str:
+    """Strip query and fragment from an HTTP URI (RFC 9449 Section 4.3)"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, "", ""))
+
+
+def create_dpop_proof(
+    private_key: Any,
+    public_jwk: Dict[str, Any],
+    htm: str,
+    htu: str,
+    algorithm: str = "ES256",
+    access_token: Optional[str] = None,
+) -> str:
+    """
+    Create a DPoP proof JWT (client side; used by tools and benchmarks)
+
+    Args:
+        private_key: Client private key (PEM or key object)
+        public_jwk: Matching public key as a JWK dict
+        htm: HTTP method of the request
+        htu: HTTP URI of the request
+        algorithm: Signing algorithm
+        access_token: Access token to bind via ``ath`` (RS requests)
+
+    Returns:
+        Signed DPoP proof
+    """
+    claims = {
+        "jti": str(uuid.uuid4()),
+        "htm": htm,
+        "htu": htu,
+        "iat": int(time.time()),
+    }
+    if access_token:
+        claims["ath"] = access_token_hash(access_token)
+
+    return jwt.encode(
+        claims,
+        private_key,
+        algorithm=algorithm,
+        headers={"typ": "dpop+jwt", "jwk": public_jwk},
+    )
+
+
+class ReplayCache:
+    """Time-bucketed set of seen proof jtis"""
+
+    def __init__(self, window_seconds: int = 300, bucket_seconds: int = 10):
+        """
+        Initialize replay cache
+
+        Args:
+            window_seconds: How long a jti must be remembered (proof acceptance window)
+            bucket_seconds: Bucket granularity; whole buckets are dropped at once
+        """
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def check_and_add(self, jti: str, now: Optional[float] = None) -> bool:
+        """
+        Record a proof jti
+
+        Returns:
+            True if the jti is new, False if it is a replay
+        """
+        now = now if now is not None else time.time()
+        current = int(now) // self.bucket_seconds
+        oldest = current - (self.window_seconds // self.bucket_seconds) - 1
+
+        with self._lock:
+            for bucket in [b for b in self._buckets if b < oldest]:
+                del self._buckets[bucket]
+
+            for bucket in self._buckets.values():
+                if jti in bucket:
+                    return False
+
+            self._buckets.setdefault(current, set()).add(jti)
+            return True
+
+
+class DPoPVerifier:
+    """Verifies DPoP proofs"""
+
+    def __init__(
+        self,
+        algorithms: Optional[list] = None,
+        max_age: int = 60,
+        clock_skew: int = 5,
+        replay_cache: Optional[ReplayCache] = None,
+        key_cache_size: int = 1024,
+    ):
+        """
+        Initialize DPoP verifier
+
+        Args:
+            algorithms: Accepted proof algorithms (default: ES256, RS256, EdDSA)
+            max_age: Maximum proof age in seconds (``iat`` freshness)
+            clock_skew: Tolerated clock skew in seconds for future ``iat``
+            replay_cache: Replay cache (default: one sized to the acceptance window)
+            key_cache_size: Number of parsed proof keys to keep
+        """
+        self.algorithms = algorithms or list(DEFAULT_ALGORITHMS)
+        self.max_age = max_age
+        self.clock_skew = clock_skew
+        self.replay_cache = replay_cache or ReplayCache(window_seconds=max_age + clock_skew)
+        self.key_cache_size = key_cache_size
+        self._key_cache: "OrderedDict[str, Tuple[Any, str]]" = OrderedDict()
+        self._key_cache_lock = threading.Lock()
+
+    def verify(
+        self,
+        proof: str,
+        htm: str,
+        htu: str,
+        access_token: Optional[str] = None,
+        expected_jkt: Optional[str] = None,
+    ) -> str:
+        """
+        Verify a DPoP proof
+
+        Args:
+            proof: DPoP header value
+            htm: HTTP method of the current request
+            htu: HTTP URI of the current request
+            access_token: Access token presented with the proof (checks ``ath``)
+            expected_jkt: Thumbprint the proof key must match (``cnf.jkt``)
+
+        Returns:
+            JWK thumbprint of the proof key
+
+        Raises:
+            DPoPError: If the proof is invalid
+        """
+        try:
+            header = jwt.get_unverified_header(proof)
+        except jwt.InvalidTokenError:
+            raise DPoPError("Malformed DPoP proof")
+
+        if header.get("typ") != "dpop+jwt":
+            raise DPoPError("DPoP proof has wrong type")
+
+        algorithm = header.get("alg")
+        if algorithm not in self.algorithms:
+            raise DPoPError("DPoP proof algorithm is not supported")
+
+        jwk = header.get("jwk")
+        if not isinstance(jwk, dict) or "d" in jwk:
+            raise DPoPError("DPoP proof must carry a public JWK")
+
+        key, jkt = self._load_key(jwk, algorithm)
+
+        if expected_jkt is not None and jkt != expected_jkt:
+            raise DPoPError("DPoP proof key does not match token binding")
+
+        try:
+            claims = jwt.decode(
+                proof,
+                key,
+                algorithms=[algorithm],
+                # iat is checked below against clock_skew/max_age, not PyJWT's zero leeway
+                options={
+                    "verify_aud": False,
+                    "verify_iat": False,
+                    "require": ["jti", "htm", "htu", "iat"],
+                },
+            )
+        except jwt.InvalidSignatureError:
+            raise DPoPError("DPoP proof signature verification failed")
+        except jwt.InvalidTokenError as e:
+            raise DPoPError(f"Invalid DPoP proof: {e}")
+
+        if claims["htm"] != htm:
+            raise DPoPError("DPoP proof htm does not match request method")
+
+        if normalize_htu(claims["htu"]) != normalize_htu(htu):
+            raise DPoPError("DPoP proof htu does not match request URI")
+
+        iat = claims["iat"]
+        if not isinstance(iat, (int, float)) or isinstance(iat, bool):
+            raise DPoPError("DPoP proof iat must be a number")
+
+        now = time.time()
+        if iat > now + self.clock_skew:
+            raise DPoPError("DPoP proof iat is in the future")
+        if iat < now - self.max_age:
+            raise DPoPError("DPoP proof is not fresh")
+
+        if access_token is not None and claims.get("ath") != access_token_hash(access_token):
+            raise DPoPError("DPoP proof ath does not match access token")
+
+        if not self.replay_cache.check_and_add(claims["jti"], now):
+            raise DPoPError("DPoP proof has already been used")
+
+        return jkt
+
+    def _load_key(self, jwk: Dict[str, Any], algorithm: str) -> Tuple[Any, str]:
+        """Parse a proof JWK (cached by canonical JWK and algorithm)"""
+        cache_key = algorithm + json.dumps(jwk, separators=(",", ":"), sort_keys=True)
+
+        with self._key_cache_lock:
+            cached = self._key_cache.get(cache_key)
+            if cached is not None:
+                self._key_cache.move_to_end(cache_key)
+                CACHE_REQUESTS.inc("dpop_key", "hit")
+                return cached
+
+        CACHE_REQUESTS.inc("dpop_key", "miss")
+
+        try:
+            key = jwt.PyJWK(jwk, algorithm).key
+        except (jwt.PyJWKError, jwt.InvalidKeyError, KeyError, ValueError):
+            raise DPoPError("DPoP proof JWK is invalid")
+
+        entry = (key, jwk_thumbprint(jwk))
+
+        with self._key_cache_lock:
+            self._key_cache[cache_key] = entry
+            if len(self._key_cache) > self.key_cache_size:
+                self._key_cache.popitem(last=False)
+
+        return entry
@@ -0,0 +1,150 @@
+"""
+JSON Codec for Token Payloads
+
+JWT payloads are serialized and parsed through a ``JSONCodec`` instead of the
+stdlib ``json`` module, so the AS and RS use a faster JSON library when one
+is installed: orjson, else ujson, else the stdlib (``AAP_JSON_CODEC`` picks
+one explicitly: ``auto``, ``orjson``, ``ujson`` or ``json``).
+
+Every backend serializes deterministically: keys sorted, compact separators,
+UTF-8 without ``\\uXXXX`` escapes, so the same claims always give the same
+token bytes. (Backends may spell floats differently, e.g. ``1e20`` and
+``1e+20``; the values are the same.) Values a fast backend cannot handle
+(e.g. integers beyond 64 bits, non-string keys) and documents it rejects on
+parsing are handed to the stdlib, so results and errors are those of
+``json``. ujson accepts some invalid numbers (``-``, ``1.``), so it is only
+used to serialize; documents are parsed by the stdlib.
+
+``JWT`` is a PyJWT instance whose payloads go through the codec; headers are
+left to PyJWT.
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+import jwt
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # Optional: faster JSON
+    ujson = None
+
+
+CODECS = ("auto", "orjson", "ujson", "json")
+
+# orjson parses integers beyond 64 bits as floats: documents with a run of 19
+# or more digits anywhere are left to the stdlib. Digits are found by mapping
+# every byte to "9" (digit) or " " and searching for a run, which is much
+# cheaper than a regular expression scan.
+_DIGIT_MASK = bytes(0x39 if 0x30 <= byte <= 0x39 else 0x20 for byte in range(256))
+_LONG_DIGITS = b"9" * 19
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _orjson_loads(data: Any) -> Any:
+    raw = data if isinstance(data, (bytes, bytearray)) else data.encode("utf-8", "surrogatepass")
+    if _LONG_DIGITS in raw.translate(_DIGIT_MASK):
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+class JSONCodec:
+    """Deterministic compact JSON serializer and parser backed by one library"""
+
+    def __init__(self, name: str, dumps: Callable[[Any], bytes], loads: Callable[[Any], Any]):
+        self.name = name
+        self._dumps = dumps
+        self._loads = loads
+
+    def __repr__(self) -> str:
+        return f"JSONCodec({self.name!r})"
+
+    def dumps(self, value: Any) -> bytes:
+        """Serialize to UTF-8 JSON (sorted keys, compact separators)"""
+        try:
+            return self._dumps(value)
+        except (TypeError, OverflowError):
+            return _json_dumps(value)  # Same output, or the stdlib's error
+
+    def loads(self, data: Any) -> Any:
+        """
+        Parse JSON (str or bytes)
+
+        Raises:
+            ValueError: If the document is not valid JSON (as json.loads)
+        """
+        try:
+            return self._loads(data)
+        except ValueError:
+            return json.loads(data)  # Same result, or the stdlib's error
+
+
+def get_codec(name: str = "auto") -> JSONCodec:
+    """
+    Codec for a JSON library
+
+    Args:
+        name: orjson, ujson, json, or auto (the fastest installed)
+
+    Raises:
+        ValueError: If the name is unknown or the library is not installed
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON codec: {name} (expected one of {', '.join(CODECS)})")
+    if name == "auto":
+        name = "orjson" if orjson is not None else "ujson" if ujson is not None else "json"
+
+    if name == "orjson":
+        if orjson is None:
+            raise ValueError("The orjson codec requires the 'orjson' package (pip install orjson)")
+        return JSONCodec("orjson", lambda value: orjson.dumps(value, option=orjson.OPT_SORT_KEYS), _orjson_loads)
+
+    if name == "ujson":
+        if ujson is None:
+            raise ValueError("The ujson codec requires the 'ujson' package (pip install ujson)")
+        return JSONCodec(
+            "ujson",
+            lambda value: ujson.dumps(
+                value, sort_keys=True, ensure_ascii=False, escape_forward_slashes=False
+            ).encode("utf-8"),
+            json.loads,  # ujson.loads is more lenient than JSON
+        )
+
+    return JSONCodec("json", _json_dumps, json.loads)
+
+
+class CodecJWT(jwt.PyJWT):
+    """PyJWT with payloads serialized and parsed by a JSONCodec"""
+
+    def __init__(self, codec: JSONCodec, options: Optional[Dict[str, Any]] = None):
+        super().__init__(options)
+        self.codec = codec
+
+    def _encode_payload(self, payload, headers=None, json_encoder=None) -> bytes:
+        if json_encoder is not None:
+            return super()._encode_payload(payload, headers, json_encoder)
+        return self.codec.dumps(payload)
+
+    def _decode_payload(self, decoded: Dict[str, Any]) -> Any:
+        # Same errors as PyJWT's own
+        try:
+            payload = self.codec.loads(decoded["payload"])
+        except ValueError as e:
+            raise jwt.DecodeError(f"Invalid payload string: {e}")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload string: must be a json object")
+        return payload
+
+
+CODEC = get_codec(os.getenv("AAP_JSON_CODEC", "auto"))
+
+JWT = CodecJWT(CODEC)
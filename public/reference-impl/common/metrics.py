@@ -0,0 +1,303 @@
+"""
+Low-Overhead Metrics Registry (Prometheus text format)
+
+Counters and histograms are sharded per thread: each thread increments its
+own plain dict, so the hot path takes no lock and never contends with other
+request threads. Shards are summed only when ``/metrics`` is scraped. Shards
+of threads that have exited are folded into a retired total, so servers that
+spawn a thread per request do not accumulate shards.
+
+Gauges are callbacks evaluated at scrape time (cache sizes, enforcer state
+cardinality), so they cost nothing between scrapes.
+
+Metrics are process-wide: modules declare them on the shared ``REGISTRY``
+(declaring the same name twice returns the existing metric).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple, Union
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers in-memory lookups (~10us) up to slow introspection calls
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+# Fold exited threads' shards once this many shards exist, even without a scrape
+MAX_SHARDS = 256
+
+LabelValues = Tuple[str, ...]
+GaugeValue = Union[float, Dict[LabelValues, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """Base for metrics whose state is kept in per-thread dicts"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict[LabelValues, Any]]] = []
+        self._retired: Dict[LabelValues, Any] = {}
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        """This thread's shard (created and registered on first use)"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self._fold_exited()
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _merge(self, into: Dict[LabelValues, Any], shard: Dict[LabelValues, Any]):
+        raise NotImplementedError
+
+    def _fold_exited(self):
+        """Move shards of exited threads into the retired total (caller holds the lock)"""
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                self._merge(self._retired, values)
+        self._shards = live
+
+    def collect(self) -> Dict[LabelValues, Any]:
+        """Sum of all shards, by label values"""
+        with self._lock:
+            self._fold_exited()
+            total: Dict[LabelValues, Any] = {}
+            self._merge(total, self._retired)
+            for _, values in self._shards:
+                # dict() copies atomically under the GIL while the owner keeps writing
+                self._merge(total, dict(values))
+        return total
+
+
+class Counter(_ShardedMetric):
+    """Monotonic counter"""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self.collect().get(labelvalues, 0)
+
+    def _merge(self, into: Dict[LabelValues, Any], shard: Dict[LabelValues, Any]):
+        for labelvalues, value in shard.items():
+            into[labelvalues] = into.get(labelvalues, 0) + value
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+            for labelvalues, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(_ShardedMetric):
+    """Fixed-bucket histogram"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str):
+        shard = self._shard()
+        state = shard.get(labelvalues)
+        if state is None:
+            # Per-bucket counts, overflow (+Inf) count, sum
+            state = shard[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def _merge(self, into: Dict[LabelValues, Any], shard: Dict[LabelValues, Any]):
+        for labelvalues, state in shard.items():
+            merged = into.get(labelvalues)
+            if merged is None:
+                into[labelvalues] = list(state)
+            else:
+                for i, value in enumerate(state):
+                    merged[i] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for labelvalues, state in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is computed by a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], GaugeValue],
+        labelnames: Sequence[str] = (),
+    ):
+        """
+        Args:
+            callback: Returns a number, or a dict of label values -> number
+                when ``labelnames`` is set
+        """
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        value = self.callback()
+        samples = value if isinstance(value, dict) else {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(sample)}"
+            for labelvalues, sample in sorted(samples.items())
+        ]
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Any] = {}
+
+    def _declare(self, cls: type, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already declared with a different type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Declare (or return the existing) counter"""
+        return self._declare(Counter, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Declare (or return the existing) histogram"""
+        return self._declare(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], GaugeValue],
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        """Register a callback gauge (replaces an earlier callback of the same name)"""
+        gauge = Gauge(name, documentation, callback, labelnames)
+        with self._lock:
+            existing = self._metrics.get(name)
+            if existing is not None and not isinstance(existing, Gauge):
+                raise ValueError(f"Metric {name} already declared with a different type")
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self, extra: Sequence[Gauge] = ()) -> str:
+        """
+        All metrics in Prometheus text exposition format
+
+        Args:
+            extra: Gauges rendered alongside the registry (e.g. per-application state)
+        """
+        with self._lock:
+            metrics = sorted(list(self._metrics.values()) + list(extra), key=lambda m: m.name)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Shared by every cache in the AS and RS; result is "hit", "miss" or "coalesced"
+CACHE_REQUESTS = REGISTRY.counter(
+    "aap_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+)
+
+
+def _cache_hit_ratios() -> Dict[LabelValues, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), count in CACHE_REQUESTS.collect().items():
+        hits_and_total = totals.setdefault(cache, [0, 0])
+        if result == "hit":
+            hits_and_total[0] += count
+        hits_and_total[1] += count
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+REGISTRY.gauge(
+    "aap_cache_hit_ratio", "Fraction of cache lookups served from cache", _cache_hit_ratios, ("cache",)
+)
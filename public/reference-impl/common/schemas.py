@@ -0,0 +1,109 @@
+"""
+AAP JSON Schema Validation
+
+Validators for the AAP JSON Schemas in public/schemas (``AAP_SCHEMA_DIR``
+overrides the location): operator policies (aap-policy.schema.json) and
+token payloads (aap-token.schema.json).
+
+The AAP schemas reference each other by file name. Each validator is built
+once, with every schema of the directory preloaded into a ``referencing``
+registry (the store jsonschema resolves ``$ref`` against), so no reference
+is ever fetched or re-read. Nothing is loaded at import: a validator is
+built on first use and cached. Formats (``uri``, ``hostname``,
+``date-time``) are annotations only, as the 2020-12 draft specifies by
+default.
+"""
+
+import glob
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from jsonschema import Draft202012Validator
+from jsonschema.exceptions import SchemaError, best_match
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
+from referencing import Registry, Resource
+from referencing.jsonschema import DRAFT202012
+
+
+SCHEMA_DIR = os.getenv(
+    "AAP_SCHEMA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "schemas"),
+)
+
+POLICY_SCHEMA = "aap-policy.schema.json"
+TOKEN_SCHEMA = "aap-token.schema.json"
+
+_lock = threading.Lock()
+_validators: Dict[str, Validator] = {}
+
+
+def _load_schemas(schema_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Schema files of a directory by $id (or file name)"""
+    schemas = {}
+    for path in sorted(glob.glob(os.path.join(schema_dir, "*.schema.json"))):
+        with open(path, "r") as f:
+            schema = json.load(f)
+        schemas[schema.get("$id", os.path.basename(path))] = schema
+    return schemas
+
+
+def _build_validator(name: str, schema_dir: str) -> Validator:
+    """Validator for one schema, resolving $ref against the preloaded schema directory"""
+    with open(os.path.join(schema_dir, name), "r") as f:
+        schema = json.load(f)
+    cls = validator_for(schema, default=Draft202012Validator)
+    cls.check_schema(schema)
+    registry = Registry().with_resources(
+        (uri, Resource.from_contents(contents, default_specification=DRAFT202012))
+        for uri, contents in _load_schemas(schema_dir).items()
+    )
+    return cls(schema, registry=registry)
+
+
+def get_validator(name: str, schema_dir: Optional[str] = None) -> Validator:
+    """
+    Validator for an AAP schema, built once and cached
+
+    Args:
+        name: Schema file name (e.g., "aap-token.schema.json")
+        schema_dir: Directory of the AAP schemas (default: SCHEMA_DIR)
+
+    Raises:
+        ValueError: If the schema is missing or invalid
+    """
+    schema_dir = schema_dir or SCHEMA_DIR
+    key = os.path.join(schema_dir, name)
+    validator = _validators.get(key)
+    if validator is not None:
+        return validator
+
+    with _lock:
+        validator = _validators.get(key)
+        if validator is None:
+            try:
+                validator = _build_validator(name, schema_dir)
+            except SchemaError as e:
+                raise ValueError(f"Invalid AAP schema {name}: {e.message}")
+            except (OSError, ValueError) as e:
+                raise ValueError(f"Cannot load AAP schema {name} from {schema_dir}: {e}")
+            _validators[key] = validator
+    return validator
+
+
+def schema_error(validator: Validator, instance: Any) -> Optional[str]:
+    """
+    Most relevant validation error of a document, or None if it is valid
+
+    Returns:
+        Error message prefixed with the location in the document
+        (e.g., "capabilities/0/action: 'cms..x' does not match ...")
+    """
+    error = best_match(validator.iter_errors(instance))
+    if error is None:
+        return None
+    location = "/".join(str(part) for part in error.absolute_path)
+    return f"{location or '(root)'}: {error.message}"
+
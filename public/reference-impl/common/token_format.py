@@ -0,0 +1,23 @@
+"""
+AAP Token Formats
+
+The AS can issue three token formats, told apart by shape alone so that the
+RS never has to try-and-fail decoding:
+
+- ``jwt``: JWS compact serialization (contains ".")
+- ``cwt``: base64url COSE_Sign1 CWT (no ".", see common/cwt.py)
+- ``reference``: opaque handle starting with ``aapr_``, resolved by introspection
+"""
+
+TOKEN_FORMATS = ("jwt", "cwt", "reference")
+
+REFERENCE_TOKEN_PREFIX = "aapr_"
+
+
+def detect_token_format(token: str) -> str:
+    """Return the format of a token string (jwt, cwt, or reference)"""
+    if token.startswith(REFERENCE_TOKEN_PREFIX):
+        return "reference"
+    if "." in token:
+        return "jwt"
+    return "cwt"
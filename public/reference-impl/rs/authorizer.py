@@ -0,0 +1,101 @@
+"""
+Request Authorizer for AAP Resource Server
+
+The decision steps that follow token validation: capability matching and
+resource scope (Section 7.5), constraint enforcement (Section 7.5) and
+oversight (Section 7.6). The server and scripts/replay_trace.py both use it,
+so a replayed trace takes the same path as live traffic.
+"""
+
+from typing import Any, Dict, Optional
+
+from .capability_matcher import CapabilityMatcher
+from .constraint_enforcer import CONSTRAINT_VIOLATIONS, ConstraintEnforcer, ConstraintViolationError
+from .resource_matcher import ResourceMatcher, request_resource
+from .timing import StageTimer
+from .validator import ValidationError
+
+
+class RequestAuthorizer:
+    """Authorizes an action for a validated token"""
+
+    def __init__(
+        self,
+        capability_matcher: CapabilityMatcher,
+        resource_matcher: ResourceMatcher,
+        constraint_enforcer: ConstraintEnforcer,
+    ):
+        self.capability_matcher = capability_matcher
+        self.resource_matcher = resource_matcher
+        self.constraint_enforcer = constraint_enforcer
+
+    def authorize(
+        self,
+        payload: Dict[str, Any],
+        action: str,
+        request_context: Dict[str, Any],
+        resource_url: str,
+        timer: Optional[StageTimer] = None,
+    ) -> Dict[str, Any]:
+        """
+        Authorize an action for a validated token
+
+        Args:
+            payload: Validated token payload
+            action: Requested action (e.g., "search.web")
+            request_context: Request context (method, content_length, target_url)
+            resource_url: URL of the requested resource (checked against the
+                capability's ``resources``, if it has any)
+            timer: Optional stage timer (match, enforce, oversight)
+
+        Returns:
+            The matching capability
+
+        Raises:
+            ValidationError or ConstraintViolationError if not authorized
+        """
+        # Find matching capability (Section 7.5)
+        capabilities = payload.get("capabilities", [])
+        matching_capability = self.capability_matcher.find_matching_capability(capabilities, action)
+
+        if timer is not None:
+            timer.lap("match")
+
+        if not matching_capability:
+            raise ValidationError(
+                "aap_invalid_capability",
+                "No matching capability for requested action",
+            )
+
+        # Enforce resource scope (capability "resources")
+        resources = matching_capability.get("resources")
+        if resources is not None:
+            if not self.resource_matcher.matches(resources, request_resource(resource_url)):
+                CONSTRAINT_VIOLATIONS.inc("aap_resource_not_allowed")
+                raise ConstraintViolationError(
+                    "aap_resource_not_allowed",
+                    "The requested resource is not covered by this capability",
+                )
+
+        # Enforce constraints (Section 7.5)
+        constraints = matching_capability.get("constraints", {})
+        rate_limit_key = self.constraint_enforcer.rate_limit_key(payload)
+        self.constraint_enforcer.enforce_constraints(
+            constraints, request_context, payload.get("jti"), shared_key=rate_limit_key
+        )
+        if timer is not None:
+            timer.lap("enforce")
+
+        # Check oversight requirements (Section 7.6)
+        oversight = payload.get("oversight", {})
+        requires_approval = oversight.get("requires_human_approval_for", [])
+        if action in requires_approval:
+            approval_ref = oversight.get("approval_reference", "")
+            raise ValidationError(
+                "aap_approval_required",
+                f"This action requires human approval. Reference: {approval_ref}",
+            )
+        if timer is not None:
+            timer.lap("oversight")
+
+        return matching_capability
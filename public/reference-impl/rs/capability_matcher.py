@@ -2,9 +2,23 @@
 Capability Matcher for AAP Resource Server
 
 Matches requested actions against token capabilities.
+
+``CapabilityMatcher`` is the reference implementation: it scans the token's
+capability list. ``CompiledCapabilityMatcher`` (opt-in) finds the same
+capability through an action trie built once per token;
+scripts/differential_check.py checks the two agree.
 """
 
-from typing import Dict, List, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+from common.actions import ActionTrie, most_specific, valid_action_name
+from common.metrics import CACHE_REQUESTS
+
+
+def _action(capability: Dict[str, Any]) -> Any:
+    return capability.get("action")
 
 
 class CapabilityMatcher:
@@ -24,14 +38,12 @@ class CapabilityMatcher:
         Returns:
             Matching capability dict, or None if no match
 
-        Section 5.5: Action names use exact string matching (case-sensitive)
+        Section 5.5: Action names use exact string matching (case-sensitive).
+        A capability for a namespace (``cms.*``) covers every action below it;
+        an exact match wins over a namespace, and a longer namespace over a
+        shorter one.
         """
-        for capability in capabilities:
-            action = capability.get("action")
-            if action == requested_action:
-                return capability
-
-        return None
+        return most_specific(capabilities, requested_action, _action)
 
     @staticmethod
     def validate_action_format(action: str) -> bool:
@@ -41,31 +53,80 @@ class CapabilityMatcher:
         Section 5.5: action-name = component *( "." component )
                      component = ALPHA *( ALPHA / DIGIT / "-" / "_" )
 
+        A capability may also name a namespace: an action name followed by
+        ``.*`` (e.g. ``cms.*``).
+
         Args:
             action: Action name to validate
 
         Returns:
             True if valid, False otherwise
         """
-        if not action:
-            return False
+        return valid_action_name(action)
 
-        components = action.split(".")
-        if not components:
-            return False
 
-        for component in components:
-            if not component:
-                # Empty component (e.g., "search..web")
-                return False
+class CompiledCapabilityMatcher(CapabilityMatcher):
+    """
+    Capability matcher with per-token action tries
 
-            # First character must be alphabetic
-            if not component[0].isalpha():
-                return False
+    Finds exactly what CapabilityMatcher finds. The trie for a capability
+    list is built on first use and kept, keyed by the list object, in an LRU:
+    CachingTokenValidator hands out the same payload for every request with
+    a token, so a lookup costs one dict lookup per action component however
+    many capabilities the token has. Capability lists must not be modified
+    once matched (cached payloads are read-only already).
+    """
 
-            # Remaining characters must be alphanumeric, hyphen, or underscore
-            for char in component[1:]:
-                if not (char.isalnum() or char in "-_"):
-                    return False
+    def __init__(self, cache_size: int = 10_000):
+        """
+        Initialize capability matcher
 
-        return True
+        Args:
+            cache_size: Maximum capability lists (tokens) with a cached trie
+        """
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        # id(list) -> (list, trie); holding the list keeps its id from being reused
+        self._cache: "OrderedDict[int, Tuple[List[Dict[str, Any]], ActionTrie]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def find_matching_capability(
+        self, capabilities: List[Dict[str, Any]], requested_action: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find capability that matches requested action
+
+        Same result as CapabilityMatcher.find_matching_capability.
+        """
+        if not isinstance(requested_action, str):
+            return super().find_matching_capability(capabilities, requested_action)
+        trie = self._trie(capabilities)
+        if trie is None:
+            return super().find_matching_capability(capabilities, requested_action)
+        return trie.find(requested_action)
+
+    def _trie(self, capabilities: List[Dict[str, Any]]) -> Optional[ActionTrie]:
+        """Action trie for a capability list (None if the list is malformed)"""
+        key = id(capabilities)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] is capabilities:
+                self._cache.move_to_end(key)
+                CACHE_REQUESTS.inc("capability_trie", "hit")
+                return cached[1]
+
+        CACHE_REQUESTS.inc("capability_trie", "miss")
+        if not isinstance(capabilities, list) or not all(
+            isinstance(capability, dict) for capability in capabilities
+        ):
+            return None  # The reference scan decides (and fails) the same way
+        trie = ActionTrie(capabilities, _action)
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = (capabilities, trie)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return trie
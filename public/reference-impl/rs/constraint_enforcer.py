@@ -2,13 +2,21 @@
 Constraint Enforcer for AAP Resource Server
 
 Enforces capability constraints (rate limits, domain restrictions, time windows, etc.).
+
+``ConstraintEnforcer`` is the reference implementation. ``CompiledConstraintEnforcer``
+(opt-in) makes the same decisions with cached domain sets and a deque-based
+per-minute window; scripts/differential_check.py checks the two agree.
 """
 
 import time
-from typing import Dict, Any, Optional
+from bisect import insort
+from functools import lru_cache
+from typing import Callable, Dict, Any, FrozenSet, Optional, Tuple
 from datetime import datetime
 from urllib.parse import urlparse
-from collections import defaultdict
+from collections import defaultdict, deque
+
+from common.metrics import REGISTRY
 
 
 class ConstraintViolationError(Exception):
@@ -21,21 +29,81 @@ class ConstraintViolationError(Exception):
         super().__init__(description)
 
 
+RATE_LIMIT_SCOPES = ("token", "tree", "task")
+
+CONSTRAINT_VIOLATIONS = REGISTRY.counter(
+    "aap_constraint_violations_total",
+    "Requests refused by capability constraints, by constraint type",
+    ("constraint",),
+)
+
+
 class ConstraintEnforcer:
     """Enforces AAP capability constraints"""
 
-    def __init__(self):
-        """Initialize constraint enforcer"""
+    def __init__(self, rate_limit_scope: str = "token", clock: Callable[[], float] = time.time):
+        """
+        Initialize constraint enforcer
+
+        Args:
+            rate_limit_scope: What rate-limit counters are shared by:
+                "token" - each token has its own counters
+                "tree"  - all tokens of a delegation tree also draw from the root
+                          token's counters, checked against the root's limit
+                "task"  - all tokens of a task (per operator) also draw from a
+                          shared counter, checked against the task's largest limit
+                Every token is always held to its own limit as well. "token" is
+                the default: delegated tokens then each get their own full limit,
+                so fan-out through Token Exchange multiplies the quota.
+            clock: Time source for rate-limit and time windows (seconds since the epoch)
+        """
+        if rate_limit_scope not in RATE_LIMIT_SCOPES:
+            raise ValueError(f"Unsupported rate limit scope: {rate_limit_scope}")
+        self.rate_limit_scope = rate_limit_scope
+        self.clock = clock
+
         # In-memory rate limiting state (production should use Redis or similar)
         self.hourly_counters: Dict[str, Dict[int, int]] = defaultdict(dict)
         self.minute_counters: Dict[str, Dict[int, int]] = defaultdict(dict)
         self.request_timestamps: Dict[str, list] = defaultdict(list)
+        # Shared key -> largest limit seen per constraint. Attenuation keeps derived
+        # limits at or below the root's, so in tree scope this is the root's limit
+        # once the root has been presented (until then, a tighter bound).
+        self.shared_limits: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+    def rate_limit_key(self, payload: Dict[str, Any]) -> str:
+        """
+        Key for rate-limit counters of a validated token
+
+        O(1): reads ``delegation.root_jti`` (set by the AS on Token Exchange)
+        or the task id; the delegation chain is never walked.
+
+        Args:
+            payload: Validated token payload
+
+        Returns:
+            Shared counter key according to the configured scope (the token's
+            jti when counters are not shared)
+        """
+        jti = payload.get("jti")
+
+        if self.rate_limit_scope == "tree":
+            return (payload.get("delegation") or {}).get("root_jti") or jti
+
+        if self.rate_limit_scope == "task":
+            task_id = (payload.get("task") or {}).get("id")
+            operator = (payload.get("agent") or {}).get("operator", "")
+            if task_id:
+                return f"task:{operator}/{task_id}"
+
+        return jti
 
     def enforce_constraints(
         self,
         constraints: Dict[str, Any],
         request: Dict[str, Any],
         token_jti: str,
+        shared_key: Optional[str] = None,
     ):
         """
         Enforce all constraints in capability
@@ -43,72 +111,110 @@ class ConstraintEnforcer:
         Args:
             constraints: Constraints dict from capability
             request: Request context (action, target, etc.)
-            token_jti: Token JTI for rate limiting tracking
+            token_jti: Rate-limit counter key of the token, checked against its own limits
+            shared_key: Optional rate_limit_key(payload); when it differs from
+                token_jti, the request also counts against that shared counter,
+                checked against the largest limit seen for it
 
         Raises:
             ConstraintViolationError: If any constraint is violated
 
         Section 5.6: Multiple constraints within capability use AND semantics
         """
-        # Rate limiting constraints (Section 5.6.1)
-        self._enforce_rate_limits(constraints, token_jti)
-
-        # Domain and network constraints (Section 5.6.2)
-        if "target_url" in request:
-            self._enforce_domain_constraints(constraints, request["target_url"])
-
-        # Time-based constraints (Section 5.6.3)
-        self._enforce_time_window(constraints)
-
-        # Data and security constraints (Section 5.6.5)
-        self._enforce_data_constraints(constraints, request)
-
-    def _enforce_rate_limits(self, constraints: Dict[str, Any], token_jti: str):
+        try:
+            # Rate limiting constraints (Section 5.6.1)
+            self._enforce_rate_limits(constraints, token_jti, shared_key)
+
+            # Domain and network constraints (Section 5.6.2)
+            if "target_url" in request:
+                self._enforce_domain_constraints(constraints, request["target_url"])
+
+            # Time-based constraints (Section 5.6.3)
+            self._enforce_time_window(constraints)
+
+            # Data and security constraints (Section 5.6.5)
+            self._enforce_data_constraints(constraints, request)
+        except ConstraintViolationError as e:
+            CONSTRAINT_VIOLATIONS.inc(e.constraint_type)
+            raise
+
+    def state_cardinality(self) -> Dict[str, int]:
+        """Number of keys held in each piece of in-memory rate-limit state"""
+        return {
+            "hourly_counters": len(self.hourly_counters),
+            "request_timestamps": len(self.request_timestamps),
+            "shared_limits": len(self.shared_limits),
+        }
+
+    def _enforce_rate_limits(
+        self, constraints: Dict[str, Any], token_jti: str, shared_key: Optional[str] = None
+    ):
         """
         Enforce rate limiting constraints
 
         Section 5.6.1: Rate Limiting Constraints
+
+        A request is counted only if every applicable counter (the token's own
+        and the shared one) is below its limit.
         """
-        now = int(time.time())
+        now = int(self.clock())
 
         # max_requests_per_hour: Fixed hourly window, resets at minute 0
         if "max_requests_per_hour" in constraints:
-            max_per_hour = constraints["max_requests_per_hour"]
-            current_hour = now // 3600  # Hour bucket
-
-            # Get current count for this hour
-            hour_key = token_jti
-            if hour_key not in self.hourly_counters:
-                self.hourly_counters[hour_key] = {}
+            limits = self._rate_limits(constraints, "max_requests_per_hour", token_jti, shared_key)
+            self._enforce_hourly_limit(limits, now)
 
-            count = self.hourly_counters[hour_key].get(current_hour, 0)
+        # max_requests_per_minute: Sliding 60-second window
+        if "max_requests_per_minute" in constraints:
+            limits = self._rate_limits(constraints, "max_requests_per_minute", token_jti, shared_key)
+            self._enforce_minute_limit(limits, now)
+
+    def _rate_limits(
+        self, constraints: Dict[str, Any], name: str, token_jti: str, shared_key: Optional[str]
+    ) -> Dict[str, int]:
+        """Counter key -> limit for one rate-limit constraint"""
+        limit = constraints[name]
+        limits = {token_jti: limit}
+        if shared_key is not None:
+            # The root token itself (shared_key == token_jti) records its limit too
+            seen = self.shared_limits[shared_key]
+            if limit > seen.get(name, -1):
+                seen[name] = limit
+            if shared_key != token_jti:
+                limits[shared_key] = seen[name]
+        return limits
+
+    def _enforce_hourly_limit(self, limits: Dict[str, int], now: int):
+        """Fixed hourly window (max_requests_per_hour)"""
+        current_hour = now // 3600  # Hour bucket
+
+        for hour_key, max_per_hour in limits.items():
+            # Clean up old hour buckets (keep only current and previous hour)
+            counters = self.hourly_counters[hour_key]
+            for hour_bucket in list(counters.keys()):
+                if hour_bucket < current_hour - 1:
+                    del counters[hour_bucket]
 
-            if count >= max_per_hour:
+            if counters.get(current_hour, 0) >= max_per_hour:
                 raise ConstraintViolationError(
                     "max_requests_per_hour",
                     "Rate limit exceeded for this capability",
                     http_status=429,
                 )
 
-            # Increment counter
-            self.hourly_counters[hour_key][current_hour] = count + 1
-
-            # Clean up old hour buckets (keep only current and previous hour)
-            for hour_bucket in list(self.hourly_counters[hour_key].keys()):
-                if hour_bucket < current_hour - 1:
-                    del self.hourly_counters[hour_key][hour_bucket]
-
-        # max_requests_per_minute: Sliding 60-second window
-        if "max_requests_per_minute" in constraints:
-            max_per_minute = constraints["max_requests_per_minute"]
+        # Increment counters
+        for hour_key in limits:
+            counters = self.hourly_counters[hour_key]
+            counters[current_hour] = counters.get(current_hour, 0) + 1
 
-            # Get request timestamps for this token
-            timestamps = self.request_timestamps[token_jti]
+    def _enforce_minute_limit(self, limits: Dict[str, int], now: int):
+        """Sliding 60-second window (max_requests_per_minute)"""
+        cutoff = now - 60
 
+        for key, max_per_minute in limits.items():
             # Remove timestamps older than 60 seconds
-            cutoff = now - 60
-            timestamps = [ts for ts in timestamps if ts > cutoff]
-            self.request_timestamps[token_jti] = timestamps
+            timestamps = [ts for ts in self.request_timestamps[key] if ts > cutoff]
+            self.request_timestamps[key] = timestamps
 
             if len(timestamps) >= max_per_minute:
                 raise ConstraintViolationError(
@@ -117,8 +223,9 @@ class ConstraintEnforcer:
                     http_status=429,
                 )
 
-            # Add current timestamp
-            timestamps.append(now)
+        # Add current timestamp
+        for key in limits:
+            self.request_timestamps[key].append(now)
 
     def _enforce_domain_constraints(self, constraints: Dict[str, Any], target_url: str):
         """
@@ -184,7 +291,7 @@ class ConstraintEnforcer:
         start = time_window.get("start")
         end = time_window.get("end")
 
-        now = datetime.utcnow()
+        now = datetime.utcfromtimestamp(self.clock())
 
         # Parse ISO 8601 timestamps
         if start:
@@ -232,3 +339,73 @@ class ConstraintEnforcer:
 
         # data_classification_max
         # (requires resource metadata; not enforced in reference implementation)
+
+
+@lru_cache(maxsize=1024)
+def _compile_domain_list(domains: Tuple[Any, ...]) -> Optional[FrozenSet[str]]:
+    """Domain list as a set, or None if it holds non-string entries"""
+    if not all(isinstance(domain, str) for domain in domains):
+        return None
+    return frozenset(domains)
+
+
+class CompiledConstraintEnforcer(ConstraintEnforcer):
+    """
+    Constraint enforcer with compiled domain lists and O(1) minute windows
+
+    Makes the same decisions as ConstraintEnforcer:
+
+    - Domain lists are compiled to sets (cached by content), and a domain is
+      matched by looking up itself and each suffix following a dot, so the
+      cost depends on the number of labels, not the length of the list.
+    - Per-minute timestamps are kept in a deque and expired from the left
+      instead of rebuilding the list on every request (the deque stays
+      sorted even if the clock goes backwards).
+    """
+
+    def __init__(self, rate_limit_scope: str = "token", clock: Callable[[], float] = time.time):
+        super().__init__(rate_limit_scope, clock)
+        self.request_timestamps: Dict[str, deque] = defaultdict(deque)
+
+    def _enforce_minute_limit(self, limits: Dict[str, int], now: int):
+        # Timestamps are kept sorted, so expired ones are all at the left
+        cutoff = now - 60
+
+        for key, max_per_minute in limits.items():
+            timestamps = self.request_timestamps[key]
+            while timestamps and timestamps[0] <= cutoff:
+                timestamps.popleft()
+
+            if len(timestamps) >= max_per_minute:
+                raise ConstraintViolationError(
+                    "max_requests_per_minute",
+                    "Rate limit exceeded for this capability",
+                    http_status=429,
+                )
+
+        for key in limits:
+            timestamps = self.request_timestamps[key]
+            if timestamps and timestamps[-1] > now:
+                insort(timestamps, now)  # Clock went backwards
+            else:
+                timestamps.append(now)
+
+    @staticmethod
+    def _domain_matches_list(domain: str, domain_list: list) -> bool:
+        try:
+            domains = _compile_domain_list(tuple(domain_list))
+        except TypeError:
+            domains = None  # Unhashable entries
+        if domains is None:
+            return ConstraintEnforcer._domain_matches_list(domain, domain_list)
+
+        # "a.b.example.org" matches entries "a.b.example.org", "b.example.org",
+        # "example.org" and "org" (exact match, or suffix after a dot)
+        if domain in domains:
+            return True
+        dot = domain.find(".")
+        while dot != -1:
+            if domain[dot + 1 :] in domains:
+                return True
+            dot = domain.find(".", dot + 1)
+        return False
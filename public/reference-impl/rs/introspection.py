@@ -0,0 +1,188 @@
+"""
+Token Introspection Client for AAP Resource Server
+
+Resolves reference tokens (and any other token) through the AS introspection
+endpoint (RFC 7662).
+
+Performance notes:
+- Requests go through one ``requests.Session`` with a pooled keep-alive
+  adapter, so steady-state introspection does not pay for TCP/TLS setup.
+- Concurrent lookups of the same token are coalesced into a single request.
+- Results are cached with a TTL that never extends past the token's ``exp``;
+  inactive results are cached briefly so a bad token cannot flood the AS.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.metrics import CACHE_REQUESTS
+
+
+class IntrospectionError(Exception):
+    """Introspection endpoint could not be reached or returned an error"""
+
+
+class _PendingCall:
+    """In-flight introspection request shared by concurrent callers"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Exception] = None
+
+
+class IntrospectionClient:
+    """Cached, coalescing RFC 7662 introspection client"""
+
+    def __init__(
+        self,
+        url: str,
+        auth_token: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        cache_ttl: float = 60,
+        negative_cache_ttl: float = 5,
+        max_entries: int = 10_000,
+        pool_size: int = 10,
+        timeout: float = 5,
+    ):
+        """
+        Initialize introspection client
+
+        Args:
+            url: AS introspection endpoint (e.g. https://as.example.com/introspect)
+            auth_token: Bearer credential for the endpoint (AAP_INTROSPECTION_TOKEN on the AS)
+            session: HTTP session to use (default: pooled keep-alive session)
+            cache_ttl: Maximum seconds an active result is cached (capped at token exp)
+            negative_cache_ttl: Seconds an inactive result is cached
+            max_entries: Maximum cached tokens (least recently used evicted first)
+            pool_size: Keep-alive connections kept per host
+            timeout: Request timeout in seconds
+        """
+        self.url = url
+        self.auth_token = auth_token
+        self.cache_ttl = cache_ttl
+        self.negative_cache_ttl = negative_cache_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._pending: Dict[str, _PendingCall] = {}
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def introspect(self, token: str) -> Dict[str, Any]:
+        """
+        Introspect a token
+
+        Returns:
+            Introspection response (``{"active": False}`` for invalid tokens)
+
+        Raises:
+            IntrospectionError: If the AS could not be reached or returned an error
+        """
+        now = time.time()
+
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                if cached[0] > now:
+                    self._cache.move_to_end(token)
+                    CACHE_REQUESTS.inc("introspection", "hit")
+                    return cached[1]
+                del self._cache[token]
+
+            call = self._pending.get(token)
+            leader = call is None
+            if leader:
+                call = self._pending[token] = _PendingCall()
+
+        CACHE_REQUESTS.inc("introspection", "miss" if leader else "coalesced")
+
+        if not leader:
+            call.done.wait(self.timeout)
+            if call.error is not None:
+                raise call.error
+            if call.result is None:
+                raise IntrospectionError("Timed out waiting for introspection")
+            return call.result
+
+        try:
+            call.result = self._request(token)
+            self._store(token, call.result)
+            return call.result
+        except IntrospectionError as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(token, None)
+            call.done.set()
+
+    def invalidate(self, token: Optional[str] = None):
+        """Drop one cached token, or the whole cache"""
+        with self._lock:
+            if token is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(token, None)
+
+    def _request(self, token: str) -> Dict[str, Any]:
+        """POST the token to the introspection endpoint"""
+        headers = {"Accept": "application/json"}
+        if self.auth_token:
+            headers["Authorization"] = f"Bearer {self.auth_token}"
+
+        try:
+            response = self.session.post(
+                self.url, data={"token": token}, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise IntrospectionError(f"Introspection request failed: {e}")
+
+        if response.status_code != 200:
+            raise IntrospectionError(f"Introspection endpoint returned {response.status_code}")
+
+        try:
+            result = response.json()
+        except ValueError:
+            raise IntrospectionError("Introspection endpoint returned invalid JSON")
+
+        if not isinstance(result, dict) or not isinstance(result.get("active"), bool):
+            raise IntrospectionError("Introspection response is missing 'active'")
+
+        return result
+
+    def _store(self, token: str, result: Dict[str, Any]):
+        """Cache a result until min(now + ttl, exp)"""
+        now = time.time()
+        if result["active"]:
+            expires_at = now + self.cache_ttl
+            if isinstance(result.get("exp"), (int, float)):
+                expires_at = min(expires_at, result["exp"])
+        else:
+            expires_at = now + self.negative_cache_ttl
+
+        if expires_at <= now:
+            return
+
+        with self._lock:
+            self._cache[token] = (expires_at, result)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
@@ -0,0 +1,239 @@
+"""
+Resource Matcher for AAP Resource Server
+
+Matches the resource of a request against the ``resources`` of a capability.
+
+Pattern syntax (case-sensitive, matched against the whole resource):
+
+- ``https://api.example.com/v2/articles/42`` - exact resource
+- ``https://api.example.com/v2/articles/*`` - prefix: a trailing ``*`` matches
+  any remainder, including further path segments
+- ``*`` elsewhere matches within one path segment (never ``/``); ``**``
+  matches across segments
+- ``{name}`` (URI template variable) matches one non-empty path segment;
+  ``{+name}`` matches any remainder, including ``/``
+
+``resource_matches`` is the reference implementation: it tries each pattern
+in turn. ``CompiledResourcePatterns`` answers the same question from an index
+built once per pattern list - a set of exact resources and a character trie
+of literal prefixes, with globs and templates combined into one regular
+expression per trie node - so a lookup costs one walk of the resource rather
+than one test per pattern. scripts/differential_check.py checks the two agree.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from common.metrics import CACHE_REQUESTS
+
+
+# Wildcards and URI template expressions; everything else is literal
+_WILDCARD = re.compile(r"\{\+?[A-Za-z0-9_.%]+\}|\*+")
+
+# Trie node keys (never a single character): end of a prefix pattern, and the
+# combined expression for globs continuing from the node
+_END = "$end"
+_GLOBS = "$globs"
+
+
+def _translate(pattern: str) -> str:
+    """Regular expression (for fullmatch) equivalent to a resource pattern"""
+    parts = []
+    position = 0
+    for wildcard in _WILDCARD.finditer(pattern):
+        parts.append(re.escape(pattern[position : wildcard.start()]))
+        token = wildcard.group()
+        if token.startswith("{+") or token.startswith("**"):
+            parts.append(".*")  # {+name} and **
+        elif token.startswith("{"):
+            parts.append("[^/]+")
+        elif wildcard.end() == len(pattern):
+            parts.append(".*")  # Trailing *
+        else:
+            parts.append("[^/]*")
+        position = wildcard.end()
+    parts.append(re.escape(pattern[position:]))
+    return "".join(parts)
+
+
+def _prefix(pattern: str) -> Optional[str]:
+    """The literal prefix of a pattern whose only wildcard is a trailing run of ``*``"""
+    literal = pattern.rstrip("*")
+    if literal == pattern or _WILDCARD.search(literal):
+        return None
+    return literal
+
+
+def _is_pattern_list(patterns: Any) -> bool:
+    return isinstance(patterns, list) and all(isinstance(p, str) for p in patterns)
+
+
+def resource_matches(patterns: List[str], resource: str) -> bool:
+    """
+    Check a resource against a capability's resource patterns (reference implementation)
+
+    Args:
+        patterns: Capability ``resources``
+        resource: Resource of the request (see ``request_resource``)
+
+    Returns:
+        True if any pattern matches; False if none does or the list is malformed
+    """
+    if not _is_pattern_list(patterns):
+        return False
+    for pattern in patterns:
+        if re.fullmatch(_translate(pattern), resource, re.DOTALL):
+            return True
+    return False
+
+
+class CompiledResourcePatterns:
+    """
+    Index of one capability's resource patterns
+
+    Exact patterns go in a set. Every other pattern is stored in a character
+    trie under its literal prefix (the text before its first wildcard): a
+    node either ends a prefix pattern or holds one combined regular
+    expression for the rest of the globs and templates sharing that prefix.
+    A lookup walks the resource once through the trie, so it only tries the
+    globs whose literal prefix the resource starts with.
+    """
+
+    __slots__ = ("exact", "trie")
+
+    def __init__(self, patterns: List[str]):
+        self.exact = frozenset(p for p in patterns if not _WILDCARD.search(p))
+        self.trie: Dict[str, Any] = {}
+        globs: Dict[int, Tuple[Dict[str, Any], List[str]]] = {}
+        for pattern in patterns:
+            if pattern in self.exact:
+                continue
+            prefix = _prefix(pattern)
+            literal = prefix if prefix is not None else pattern[: _WILDCARD.search(pattern).start()]
+            node = self.trie
+            for char in literal:
+                node = node.setdefault(char, {})
+            if prefix is not None:
+                node[_END] = True
+            else:
+                globs.setdefault(id(node), (node, []))[1].append(
+                    f"(?:{_translate(pattern[len(literal):])})"
+                )
+        for node, sources in globs.values():
+            node[_GLOBS] = re.compile("|".join(sources), re.DOTALL)
+
+    def matches(self, resource: str) -> bool:
+        """True if any of the patterns matches the resource"""
+        if resource in self.exact:
+            return True
+
+        node = self.trie
+        position = 0
+        while True:
+            if _END in node:
+                return True
+            globs = node.get(_GLOBS)
+            if globs is not None and globs.fullmatch(resource, position):
+                return True
+            if position == len(resource):
+                return False
+            node = node.get(resource[position])
+            if node is None:
+                return False
+            position += 1
+
+
+class ResourceMatcher:
+    """Matches resources against capability patterns, compiling each pattern list once"""
+
+    def __init__(self, cache_size: int = 1024):
+        """
+        Initialize resource matcher
+
+        Args:
+            cache_size: Maximum compiled pattern lists kept (0 compiles on every call)
+        """
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, ...], CompiledResourcePatterns]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def compile(self, patterns: List[str]) -> CompiledResourcePatterns:
+        """
+        Compiled index for a pattern list (cached by the patterns)
+
+        Raises:
+            TypeError: If the list is malformed
+        """
+        key = tuple(patterns)
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+        if compiled is not None:
+            CACHE_REQUESTS.inc("resource_patterns", "hit")
+            return compiled
+
+        CACHE_REQUESTS.inc("resource_patterns", "miss")
+        if not _is_pattern_list(patterns):
+            raise TypeError("resources must be a list of strings")
+        compiled = CompiledResourcePatterns(patterns)
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = compiled
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return compiled
+
+    def matches(self, patterns: List[str], resource: str) -> bool:
+        """
+        Check a resource against a capability's resource patterns
+
+        Same result as ``resource_matches``. Pattern lists are type-checked when
+        compiled, so a cache hit costs one hash of the list, not a scan.
+        """
+        if not isinstance(patterns, list):
+            return False
+        try:
+            return self.compile(patterns).matches(resource)
+        except TypeError:
+            return False  # Malformed (or unhashable) patterns
+
+
+def _remove_dot_segments(path: str) -> str:
+    """RFC 3986 Section 5.2.4 (percent-encoded dots count as dots)"""
+    output: List[str] = []
+    segments = path.split("/")
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        dots = segment.replace("%2e", ".").replace("%2E", ".")
+        if dots == ".":
+            if last:
+                output.append("")
+        elif dots == "..":
+            if len(output) > 1:
+                output.pop()
+            if last:
+                output.append("")
+        else:
+            output.append(segment)
+    return "/".join(output)
+
+
+def request_resource(url: str) -> str:
+    """
+    Resource identifier of a request URL
+
+    The query and fragment are dropped and dot segments resolved, so
+    ``/v2/articles/../admin`` cannot pass as a resource under ``/v2/articles/``.
+    Non-hierarchical URIs (e.g. ``urn:...``) are returned unchanged.
+    """
+    parts = urlsplit(url)
+    if not parts.netloc:
+        return url
+    return urlunsplit((parts.scheme, parts.netloc, _remove_dot_segments(parts.path), "", ""))
@@ -0,0 +1,185 @@
+"""
+Revocation List for AAP Resource Server
+
+Keeps a local copy of the Authorization Server's revocation set so that the
+revocation check on the request path is an in-memory O(1) lookup. The list is
+kept current by pulling versioned snapshots and deltas from the AS
+``/revocations`` endpoint.
+
+Entries expire: a jti at its token's ``exp``, a task or agent revocation
+``subject_ttl`` seconds (published by the AS: the longest token lifetime)
+after its revocation time. ``purge_expired`` (run after every poll) drops
+them once the validator's clock skew tolerance has also passed, so the list
+stays bounded between full snapshots.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """Local revocation set applied from AS snapshots and deltas"""
+
+    def __init__(self, grace: int = 300):
+        """
+        Initialize an empty revocation list (version 0)
+
+        Args:
+            grace: Seconds entries are kept past their expiry (the validator's
+                clock skew tolerance, during which an expired token still validates)
+        """
+        self.grace = grace
+        self.epoch: Optional[str] = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._jtis: Dict[str, int] = {}  # jti -> token exp
+        self._tasks: Dict[str, int] = {}  # task id -> revoked_at
+        self._agents: Dict[str, int] = {}  # agent id -> revoked_at
+        self.subject_ttl: Optional[int] = None  # from the AS (None: task/agent entries kept)
+
+    def apply(self, update: Dict[str, Any]):
+        """
+        Apply a snapshot or delta published by the AS
+
+        Args:
+            update: Snapshot/delta document from the AS revocation endpoint
+
+        Raises:
+            ValueError: If a delta does not follow the current epoch and version
+        """
+        jtis = dict(zip(update.get("jtis", []), update.get("exp", [])))
+
+        with self._lock:
+            if update.get("type") == "snapshot":
+                self._jtis = jtis
+                self._tasks = dict(update.get("tasks", {}))
+                self._agents = dict(update.get("agents", {}))
+            else:
+                if (
+                    update.get("epoch") != self.epoch
+                    or update.get("from_version") != self.version
+                ):
+                    raise ValueError(
+                        f"Revocation delta from version {update.get('from_version')} "
+                        f"does not apply to local version {self.version}"
+                    )
+                self._jtis.update(jtis)
+                self._tasks.update(update.get("tasks", {}))
+                self._agents.update(update.get("agents", {}))
+
+            self.epoch = update.get("epoch")
+            self.version = update.get("version", self.version)
+            if isinstance(update.get("subject_ttl"), int):
+                self.subject_ttl = update["subject_ttl"]
+
+    def __len__(self) -> int:
+        """Revoked jtis, tasks and agents currently held"""
+        return len(self._jtis) + len(self._tasks) + len(self._agents)
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """
+        Check whether a validated token payload has been revoked
+
+        O(1): one set lookup for the jti and one dict lookup each for task and agent.
+        """
+        if payload.get("jti") in self._jtis:
+            return True
+
+        iat = payload.get("iat", 0)
+
+        task_revoked_at = self._tasks.get((payload.get("task") or {}).get("id"))
+        if task_revoked_at is not None and iat <= task_revoked_at:
+            return True
+
+        agent_revoked_at = self._agents.get((payload.get("agent") or {}).get("id"))
+        if agent_revoked_at is not None and iat <= agent_revoked_at:
+            return True
+
+        return False
+
+    def purge_expired(self, now: Optional[int] = None):
+        """Drop entries that can no longer match a live token"""
+        now = (now if now is not None else int(time.time())) - self.grace
+        with self._lock:
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+            if self.subject_ttl is not None:
+                cutoff = now - self.subject_ttl
+                self._tasks = {k: ts for k, ts in self._tasks.items() if ts > cutoff}
+                self._agents = {k: ts for k, ts in self._agents.items() if ts > cutoff}
+
+
+class RevocationSync:
+    """Background poller that keeps a RevocationList in sync with the AS"""
+
+    def __init__(
+        self,
+        revocation_list: RevocationList,
+        url: str,
+        interval: float = 60.0,
+        session: Optional[requests.Session] = None,
+        timeout: float = 5.0,
+    ):
+        """
+        Initialize revocation sync
+
+        Args:
+            revocation_list: List to update
+            url: AS revocation distribution endpoint (e.g. https://as.example.com/revocations)
+            interval: Seconds between polls
+            session: Optional HTTP session (keep-alive connection reuse)
+            timeout: HTTP timeout in seconds
+        """
+        self.revocation_list = revocation_list
+        self.url = url
+        self.interval = interval
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll_once(self):
+        """Fetch changes since the local version and apply them"""
+        # Without a known epoch only a snapshot can be applied
+        params = {}
+        if self.revocation_list.epoch is not None:
+            params["since"] = self.revocation_list.version
+
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        try:
+            self.revocation_list.apply(response.json())
+        except ValueError:
+            # Out of sync (e.g. AS restarted); fall back to a full snapshot
+            response = self.session.get(self.url, timeout=self.timeout)
+            response.raise_for_status()
+            self.revocation_list.apply(response.json())
+
+        self.revocation_list.purge_expired()
+
+    def start(self):
+        """Start polling in a daemon thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="aap-revocation-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop polling"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                # Keep serving with the last known list; retry on next interval
+                logger.warning("Revocation sync failed: %s", e)
+            self._stop.wait(self.interval)
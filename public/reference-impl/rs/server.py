@@ -5,12 +5,25 @@ Example Resource Server that validates AAP tokens and enforces constraints.
 """
 
 import os
-from flask import Flask, request, jsonify
-from typing import Dict, Any
-
-from .validator import TokenValidator, ValidationError
-from .capability_matcher import CapabilityMatcher
-from .constraint_enforcer import ConstraintEnforcer, ConstraintViolationError
+import time
+from flask import Flask, Response, g, request, jsonify
+from typing import Dict, Any, Optional
+
+from .validator import CachingTokenValidator, TokenValidator, ValidationError
+from .authorizer import RequestAuthorizer
+from .capability_matcher import CapabilityMatcher, CompiledCapabilityMatcher
+from .constraint_enforcer import (
+    CompiledConstraintEnforcer,
+    ConstraintEnforcer,
+    ConstraintViolationError,
+)
+from .resource_matcher import ResourceMatcher
+from .revocation import RevocationList, RevocationSync
+from .introspection import IntrospectionClient
+from .timing import StageTimer, DecisionSampler, configure_decision_log, parse_sample_rates
+from .trace import TraceRecorder
+from common.audit_log import AuditLog
+from common.metrics import REGISTRY, CONTENT_TYPE
 
 
 app = Flask(__name__)
@@ -19,6 +32,35 @@ app = Flask(__name__)
 RS_AUDIENCE = os.getenv("AAP_RS_AUDIENCE", "https://api.example.com")
 TRUSTED_ISSUERS = os.getenv("AAP_TRUSTED_ISSUERS", "https://as.example.com").split(",")
 PUBLIC_KEY_PATH = os.getenv("AAP_PUBLIC_KEY_PATH", "../keys/as_public_key.pem")
+REQUIRE_POP = os.getenv("AAP_RS_REQUIRE_POP", "false").lower() == "true"
+STRICT_SCHEMA = os.getenv("AAP_RS_STRICT_SCHEMA", "false").lower() == "true"
+RATE_LIMIT_SCOPE = os.getenv("AAP_RATE_LIMIT_SCOPE", "token")  # token, tree, or task
+# "reference", or "compiled": verified-token cache, action tries and compiled constraint checks
+# (same decisions)
+RS_ENGINE = os.getenv("AAP_RS_ENGINE", "reference")
+TOKEN_CACHE_SIZE = int(os.getenv("AAP_RS_TOKEN_CACHE_SIZE", "10000"))
+REVOCATION_URL = os.getenv("AAP_REVOCATION_URL", "")  # e.g. https://as.example.com/revocations
+REVOCATION_POLL_INTERVAL = float(os.getenv("AAP_REVOCATION_POLL_INTERVAL", "60"))
+INTROSPECTION_URL = os.getenv("AAP_INTROSPECTION_URL", "")  # e.g. https://as.example.com/introspect
+INTROSPECTION_TOKEN = os.getenv("AAP_INTROSPECTION_TOKEN", "")
+# Capped at the revocation poll interval: a cached active result must not outlive
+# the revocation delay the RS already accepts
+INTROSPECTION_CACHE_TTL = min(
+    float(os.getenv("AAP_INTROSPECTION_CACHE_TTL", "60")), REVOCATION_POLL_INTERVAL
+)
+AUDIT_LOG_DIR = os.getenv("AAP_AUDIT_LOG_DIR", "")  # unset: no audit log
+AUDIT_QUEUE_SIZE = int(os.getenv("AAP_AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_OVERFLOW = os.getenv("AAP_AUDIT_OVERFLOW", "drop_newest")  # or drop_oldest, block
+AUDIT_MAX_SEGMENT_MB = float(os.getenv("AAP_AUDIT_MAX_SEGMENT_MB", "64"))
+AUDIT_ROTATE_SECONDS = float(os.getenv("AAP_AUDIT_ROTATE_SECONDS", "3600"))
+AUDIT_COMPRESS = os.getenv("AAP_AUDIT_COMPRESS", "false").lower() == "true"
+SERVER_TIMING = os.getenv("AAP_SERVER_TIMING", "false").lower() == "true"
+DECISION_LOG_SAMPLE_RATE = float(os.getenv("AAP_DECISION_LOG_SAMPLE_RATE", "0"))
+# Per-endpoint overrides, e.g. "search=0.01,publish=1"
+DECISION_LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("AAP_DECISION_LOG_SAMPLE_RATES", ""))
+DECISION_LOG_PATH = os.getenv("AAP_DECISION_LOG_PATH", "")  # unset: stderr
+TRACE_DIR = os.getenv("AAP_RS_TRACE_DIR", "")  # unset: no request trace
+TRACE_KEY = os.getenv("AAP_RS_TRACE_KEY", "")  # pseudonymization key (unset: random per process)
 
 # Load AS public key
 if not os.path.exists(PUBLIC_KEY_PATH):
@@ -31,30 +73,122 @@ with open(PUBLIC_KEY_PATH, "rb") as f:
     public_key = f.read()
 
 # Initialize components
-validator = TokenValidator(
+revocation_list = RevocationList() if REVOCATION_URL else None
+revocation_sync = (
+    RevocationSync(revocation_list, REVOCATION_URL, interval=REVOCATION_POLL_INTERVAL)
+    if revocation_list
+    else None
+)
+introspection_client = (
+    IntrospectionClient(
+        INTROSPECTION_URL,
+        auth_token=INTROSPECTION_TOKEN or None,
+        cache_ttl=INTROSPECTION_CACHE_TTL,
+    )
+    if INTROSPECTION_URL
+    else None
+)
+
+validator_options = dict(
     public_key=public_key,
     audience=RS_AUDIENCE,
     trusted_issuers=TRUSTED_ISSUERS,
+    revocation_list=revocation_list,
+    require_pop=REQUIRE_POP,
+    introspection_client=introspection_client,
+    strict_schema=STRICT_SCHEMA,
+)
+if RS_ENGINE == "compiled":
+    validator = CachingTokenValidator(cache_size=TOKEN_CACHE_SIZE, **validator_options)
+    capability_matcher = CompiledCapabilityMatcher(cache_size=TOKEN_CACHE_SIZE)
+    constraint_enforcer = CompiledConstraintEnforcer(rate_limit_scope=RATE_LIMIT_SCOPE)
+else:
+    validator = TokenValidator(**validator_options)
+    capability_matcher = CapabilityMatcher()
+    constraint_enforcer = ConstraintEnforcer(rate_limit_scope=RATE_LIMIT_SCOPE)
+audit_log = (
+    AuditLog(
+        AUDIT_LOG_DIR,
+        prefix="rs-audit",
+        max_queue=AUDIT_QUEUE_SIZE,
+        overflow=AUDIT_OVERFLOW,
+        max_segment_bytes=int(AUDIT_MAX_SEGMENT_MB * 1024 * 1024),
+        max_segment_seconds=AUDIT_ROTATE_SECONDS,
+        compress=AUDIT_COMPRESS,
+    )
+    if AUDIT_LOG_DIR
+    else None
+)
+decision_sampler = DecisionSampler(DECISION_LOG_SAMPLE_RATE, DECISION_LOG_SAMPLE_RATES)
+if decision_sampler.enabled:
+    configure_decision_log(DECISION_LOG_PATH)
+resource_matcher = ResourceMatcher()
+request_authorizer = RequestAuthorizer(capability_matcher, resource_matcher, constraint_enforcer)
+trace_recorder = (
+    TraceRecorder(
+        TRACE_DIR,
+        key=TRACE_KEY.encode("utf-8") or None,
+        max_queue=AUDIT_QUEUE_SIZE,
+        max_segment_bytes=int(AUDIT_MAX_SEGMENT_MB * 1024 * 1024),
+        max_segment_seconds=AUDIT_ROTATE_SECONDS,
+    )
+    if TRACE_DIR
+    else None
 )
-capability_matcher = CapabilityMatcher()
-constraint_enforcer = ConstraintEnforcer()
+
+# Metrics
+AUTHORIZATION_DECISIONS = REGISTRY.counter(
+    "aap_authorization_decisions_total",
+    "Authorization decisions by endpoint and outcome (allowed, or the error/constraint code)",
+    ("endpoint", "outcome"),
+)
+
+
+def _rs_state_entries() -> Dict[tuple, int]:
+    entries = {
+        ("dpop_replay_cache",): len(validator.dpop_verifier.replay_cache),
+        ("resource_pattern_cache",): len(resource_matcher),
+    }
+    if revocation_list is not None:
+        entries[("revocations",)] = len(revocation_list)
+    if introspection_client is not None:
+        entries[("introspection_cache",)] = len(introspection_client)
+    if isinstance(validator, CachingTokenValidator):
+        entries[("verified_token_cache",)] = len(validator)
+    if isinstance(capability_matcher, CompiledCapabilityMatcher):
+        entries[("capability_trie_cache",)] = len(capability_matcher)
+    return entries
+
+
+REGISTRY.gauge(
+    "aap_constraint_enforcer_keys",
+    "Keys held in ConstraintEnforcer rate-limit state",
+    lambda: {(state,): n for state, n in constraint_enforcer.state_cardinality().items()},
+    ("state",),
+)
+REGISTRY.gauge("aap_rs_state_entries", "Entries held in RS in-memory state", _rs_state_entries, ("state",))
 
 
 def extract_bearer_token() -> str:
-    """Extract bearer token from Authorization header"""
+    """Extract access token from Authorization header (Bearer or DPoP scheme)"""
     auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        raise ValidationError(
-            "invalid_token",
-            "Missing or invalid Authorization header",
-            http_status=401,
-        )
-    return auth_header[7:]  # Remove "Bearer " prefix
+    if auth_header.startswith("Bearer "):
+        return auth_header[7:]  # Remove "Bearer " prefix
+    if auth_header.startswith("DPoP "):
+        return auth_header[5:]  # Remove "DPoP " prefix (RFC 9449 Section 7.1)
+    raise ValidationError(
+        "invalid_token",
+        "Missing or invalid Authorization header",
+        http_status=401,
+    )
 
 
 def authorize_request(action: str, target_url: str = None) -> Dict[str, Any]:
     """
-    Authorize a request using AAP token
+    Authorize a request using AAP token, recording the decision
+
+    The decision goes to the audit log and request trace (if enabled) and,
+    for sampled requests, to the decision log together with per-stage timings.
 
     Args:
         action: Requested action (e.g., "search.web")
@@ -63,6 +197,135 @@ def authorize_request(action: str, target_url: str = None) -> Dict[str, Any]:
     Returns:
         Token payload if authorized
 
+    Raises:
+        ValidationError or ConstraintViolationError if not authorized
+    """
+    sampled = decision_sampler.sample(request.endpoint)
+    timer = StageTimer() if SERVER_TIMING or sampled else None
+    g.aap_timer = timer
+    started = time.perf_counter_ns() if trace_recorder is not None else 0
+
+    try:
+        payload = _authorize_request(action, target_url, timer)
+    except ValidationError as e:
+        record_trace(action, target_url, e.error_code, started)
+        record_decision("request.denied", action, target_url, sampled, e.error_code, e.description)
+        raise
+    except ConstraintViolationError as e:
+        record_trace(action, target_url, e.constraint_type, started)
+        record_decision(
+            "request.denied", action, target_url, sampled, e.constraint_type, e.description
+        )
+        raise
+
+    record_trace(action, target_url, "allowed", started)
+    record_decision("request.allowed", action, target_url, sampled)
+    return payload
+
+
+def record_trace(action: str, target_url: Optional[str], outcome: str, started: int):
+    """Write the request to the request trace (AAP_RS_TRACE_DIR)"""
+    if trace_recorder is None:
+        return
+    elapsed_ns = time.perf_counter_ns() - started
+
+    try:
+        token = extract_bearer_token()
+    except ValidationError:
+        token = None
+
+    trace_recorder.record(
+        endpoint=request.endpoint,
+        action=action,
+        method=request.method,
+        content_length=request.content_length or 0,
+        url=target_url or resource_url(),
+        is_target=bool(target_url),
+        token=token,
+        payload=g.get("aap_payload"),
+        outcome=outcome,
+        elapsed_ns=elapsed_ns,
+    )
+
+
+def resource_url() -> str:
+    """URL of this endpoint under the RS audience (the resource of requests without a target URL)"""
+    return RS_AUDIENCE.rstrip("/") + request.path
+
+
+def record_decision(
+    event_type: str,
+    action: str,
+    target_url: Optional[str],
+    sampled: bool,
+    error: Optional[str] = None,
+    reason: Optional[str] = None,
+):
+    """Count an authorization decision and write it to the audit and (if sampled) decision logs"""
+    AUTHORIZATION_DECISIONS.inc(request.endpoint, error or "allowed")
+
+    timer = g.aap_timer
+    if timer is not None and error is not None:
+        timer.lap("rejected")  # Time spent in the stage that refused the request
+
+    if audit_log is None and not sampled:
+        return
+
+    # Token fields are absent if the token itself failed validation
+    payload = g.get("aap_payload") or {}
+    fields = {
+        "action": action,
+        "method": request.method,
+        "path": request.path,
+        "target_url": target_url,
+        "jti": payload.get("jti"),
+        "sub": payload.get("sub"),
+        "operator": (payload.get("agent") or {}).get("operator"),
+        "task_id": (payload.get("task") or {}).get("id"),
+        "delegation_depth": (payload.get("delegation") or {}).get("depth"),
+        "trace_id": (payload.get("audit") or {}).get("trace_id"),
+        "error": error,
+        "reason": reason,
+    }
+
+    if audit_log is not None:
+        audit_log.emit(event_type, **fields)
+
+    if sampled:
+        decision_sampler.log(
+            {
+                "event": event_type,
+                "endpoint": request.endpoint,
+                **fields,
+                "timing_ms": timer.as_dict(),
+            }
+        )
+
+
+@app.after_request
+def add_server_timing(response):
+    """Expose authorize_request stage durations (AAP_SERVER_TIMING)"""
+    timer = g.get("aap_timer")
+    if SERVER_TIMING and timer is not None:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+
+def _authorize_request(
+    action: str, target_url: str = None, timer: Optional[StageTimer] = None
+) -> Dict[str, Any]:
+    """
+    Authorize a request using AAP token
+
+    Args:
+        action: Requested action (e.g., "search.web")
+        target_url: Target URL for domain and resource validation (if not given,
+            the resource is this endpoint's URL under the RS audience)
+        timer: Optional stage timer (extract, validation steps, match, enforce, oversight)
+
+    Returns:
+        Token payload if authorized
+
     Raises:
         ValidationError or ConstraintViolationError if not authorized
     """
@@ -74,39 +337,21 @@ def authorize_request(action: str, target_url: str = None) -> Dict[str, Any]:
         "action": action,
         "method": request.method,
         "content_length": request.content_length or 0,
+        "url": request.base_url,
     }
+    if request.headers.get("DPoP"):
+        request_context["dpop_proof"] = request.headers["DPoP"]
     if target_url:
         request_context["target_url"] = target_url
+    if timer is not None:
+        timer.lap("extract")
 
     # Validate token (Section 7.1-7.4, 7.7)
-    payload = validator.validate(token, request_context)
-
-    # Find matching capability (Section 7.5)
-    capabilities = payload.get("capabilities", [])
-    matching_capability = capability_matcher.find_matching_capability(
-        capabilities, action
-    )
-
-    if not matching_capability:
-        raise ValidationError(
-            "aap_invalid_capability",
-            "No matching capability for requested action",
-        )
+    payload = validator.validate(token, request_context, timer)
+    g.aap_payload = payload  # Lets the record of a later denial name the token
 
-    # Enforce constraints (Section 7.5)
-    constraints = matching_capability.get("constraints", {})
-    token_jti = payload.get("jti")
-    constraint_enforcer.enforce_constraints(constraints, request_context, token_jti)
-
-    # Check oversight requirements (Section 7.6)
-    oversight = payload.get("oversight", {})
-    requires_approval = oversight.get("requires_human_approval_for", [])
-    if action in requires_approval:
-        approval_ref = oversight.get("approval_reference", "")
-        raise ValidationError(
-            "aap_approval_required",
-            f"This action requires human approval. Reference: {approval_ref}",
-        )
+    # Capability, resource scope, constraints and oversight (Section 7.5-7.6)
+    request_authorizer.authorize(payload, action, request_context, target_url or resource_url(), timer)
 
     return payload
 
@@ -124,6 +369,12 @@ def index():
     )
 
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus metrics"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
 @app.route("/api/search", methods=["GET"])
 def search():
     """Example protected endpoint: web search"""
@@ -268,6 +519,9 @@ def run_server():
     print(f"Audience: {RS_AUDIENCE}")
     print(f"Trusted Issuers: {TRUSTED_ISSUERS}")
     print(f"Listening on {host}:{port}")
+    if revocation_sync:
+        print(f"Revocation list: {REVOCATION_URL} (every {REVOCATION_POLL_INTERVAL:.0f}s)")
+        revocation_sync.start()
     app.run(host=host, port=port, debug=True)
 
 
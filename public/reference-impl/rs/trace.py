@@ -0,0 +1,226 @@
+"""
+Request Trace Capture for AAP Resource Server
+
+Opt-in (``AAP_RS_TRACE_DIR``): every authorization decision is written as one
+compact JSONL record, so production traffic patterns (token reuse, action
+mix, target domains, burstiness) can be replayed offline against the
+validator, rate limiters and caches with scripts/replay_trace.py.
+
+Records go through the audit pipeline (``common.audit_log.AuditLog``): the
+request path only appends to a bounded queue, a background thread writes
+rotating, gzip-compressed segments, and records are dropped rather than
+delaying requests when the queue is full.
+
+Records are redacted:
+
+- Tokens are never written. Each token is named by a keyed pseudonym (HMAC-
+  SHA256), and its claims are written once, with the first record that uses it.
+- Claims keep only what the RS decision depends on: capabilities, oversight
+  actions, delegation depth, times. Identifiers (sub, jti, agent id and
+  operator, task id, delegation hops and root) are pseudonymized with the same
+  key, so rate-limit keys are preserved; the task purpose, approval reference,
+  ``cnf`` and any other claim are dropped.
+- URLs lose their query, fragment and userinfo.
+
+Record fields: ``ts`` (request time), ``ep`` (endpoint), ``a`` (action),
+``m`` (method), ``len`` (content length), ``url`` (resource URL), ``tgt``
+(true if the URL is a target URL, checked against domain constraints),
+``tok`` (token pseudonym; absent without an Authorization header), ``fmt``
+and ``claims`` (first use of a token only), ``out`` (``allowed`` or the
+error / constraint code) and ``us`` (authorization time, microseconds).
+"""
+
+import base64
+import glob
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from common.audit_log import AuditLog
+from common.token_format import detect_token_format
+from .resource_matcher import request_resource
+
+
+REDACTED = "redacted"
+
+
+def redact_url(url: str, pseudonym: Callable[[str], str]) -> str:
+    """Resource of a URL (see ``request_resource``) with any userinfo pseudonymized"""
+    resource = request_resource(url)
+    parts = urlsplit(resource)
+    if "@" not in parts.netloc:
+        return resource
+    userinfo, host = parts.netloc.rsplit("@", 1)
+    return urlunsplit((parts.scheme, f"{pseudonym(userinfo)}@{host}", parts.path, "", ""))
+
+
+def redact_claims(payload: Dict[str, Any], pseudonym: Callable[[str], str]) -> Dict[str, Any]:
+    """
+    Claims of a validated token that the RS decision depends on
+
+    Identifiers are pseudonymized (empty values are kept as they are, so
+    presence checks give the same result); free text is dropped.
+    """
+
+    def alias(value: Any) -> Any:
+        return pseudonym(value if isinstance(value, str) else json.dumps(value, sort_keys=True)) if value else value
+
+    agent = payload.get("agent") or {}
+    task = payload.get("task") or {}
+    claims: Dict[str, Any] = {
+        "sub": alias(payload.get("sub")),
+        "exp": payload.get("exp"),
+        "iat": payload.get("iat"),
+        "agent": {"id": alias(agent.get("id")), "type": agent.get("type"), "operator": alias(agent.get("operator"))},
+        "task": {"id": alias(task.get("id")), "purpose": REDACTED if task.get("purpose") else task.get("purpose")},
+        "capabilities": payload.get("capabilities"),
+    }
+    for claim in ("nbf", "jti"):
+        if claim in payload:
+            claims[claim] = payload[claim] if claim == "nbf" else alias(payload[claim])
+
+    delegation = payload.get("delegation")
+    if delegation:
+        redacted = {name: delegation[name] for name in ("depth", "max_depth", "chain_digest") if name in delegation}
+        redacted["chain"] = [alias(hop) for hop in delegation.get("chain", [])]
+        if "root_jti" in delegation:
+            redacted["root_jti"] = alias(delegation["root_jti"])
+        claims["delegation"] = redacted
+
+    oversight = payload.get("oversight")
+    if oversight:
+        claims["oversight"] = {"requires_human_approval_for": oversight.get("requires_human_approval_for", [])}
+
+    return claims
+
+
+class TraceRecorder:
+    """Writes redacted authorization decisions as streaming JSONL trace segments"""
+
+    def __init__(
+        self,
+        directory: str,
+        key: Optional[bytes] = None,
+        known_tokens: int = 10_000,
+        compress: bool = True,
+        **log_options: Any,
+    ):
+        """
+        Initialize trace recorder (the writer thread starts on the first record)
+
+        Args:
+            directory: Directory for trace segments (created if missing)
+            key: Pseudonymization key (default: random, so pseudonyms only
+                correlate within one process; set it to correlate across
+                workers and restarts)
+            known_tokens: Tokens remembered as already written (a token
+                forgotten here has its claims written again)
+            compress: Write gzip-compressed segments
+            **log_options: Other AuditLog options (queue size, rotation)
+        """
+        self.log = AuditLog(directory, prefix="rs-trace", overflow="drop_newest", compress=compress, **log_options)
+        self.known_tokens = known_tokens
+        self._key = key or os.urandom(32)
+        self._lock = threading.Lock()
+        self._tokens: "OrderedDict[str, str]" = OrderedDict()  # token -> pseudonym, claims written
+
+    def pseudonym(self, value: str) -> str:
+        """Keyed, truncated digest of a value (22 characters)"""
+        digest = hmac.new(self._key, value.encode("utf-8"), hashlib.sha256).digest()[:16]
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def record(
+        self,
+        endpoint: Optional[str],
+        action: str,
+        method: str,
+        content_length: int,
+        url: str,
+        is_target: bool,
+        token: Optional[str],
+        payload: Optional[Dict[str, Any]],
+        outcome: str,
+        elapsed_ns: int,
+    ) -> bool:
+        """
+        Queue one trace record (never performs I/O)
+
+        Args:
+            endpoint: Flask endpoint name
+            action: Requested action
+            method: HTTP method
+            content_length: Request body size
+            url: Resource URL (the target URL, if the request names one)
+            is_target: True if ``url`` is a target URL
+            token: Access token (None if the request carried none)
+            payload: Validated token payload (None if validation failed)
+            outcome: "allowed", or the error / constraint code
+            elapsed_ns: Time spent authorizing the request
+
+        Returns:
+            True if the record was queued, False if it was dropped
+        """
+        fields: Dict[str, Any] = {
+            "ep": endpoint,
+            "a": action,
+            "m": method,
+            "len": content_length,
+            "url": redact_url(url, self.pseudonym),
+        }
+        if is_target:
+            fields["tgt"] = True
+
+        first_use = False
+        if token is not None:
+            with self._lock:
+                alias = self._tokens.get(token)
+                if alias is not None:
+                    self._tokens.move_to_end(token)
+            if alias is None:
+                alias = self.pseudonym(token)
+                fields["fmt"] = detect_token_format(token)
+                if payload is not None:
+                    fields["claims"] = redact_claims(payload, self.pseudonym)
+                    first_use = True
+            fields["tok"] = alias
+
+        fields["out"] = outcome
+        fields["us"] = elapsed_ns // 1000
+        queued = self.log.emit("trace", **fields)
+
+        # Only a token whose claims reached the queue counts as written
+        if queued and first_use and self.known_tokens > 0:
+            with self._lock:
+                self._tokens[token] = fields["tok"]
+                while len(self._tokens) > self.known_tokens:
+                    self._tokens.popitem(last=False)
+        return queued
+
+    def close(self):
+        self.log.close()
+
+
+def trace_files(paths: List[str]) -> List[str]:
+    """Trace segment files named by ``paths`` (directories expand to their segments, in order)"""
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "rs-trace-*.jsonl*"))))
+        else:
+            files.append(path)
+    return files
+
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream the records of one trace segment (plain or gzip-compressed JSONL)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -2,13 +2,40 @@
 Token Validator for AAP Resource Server
 
 Validates AAP tokens according to specification Section 7 (Resource Server Validation Rules).
+
+``TokenValidator`` is the reference implementation. ``CachingTokenValidator``
+(opt-in) caches signature and claim verification per token and gives the same
+results; scripts/differential_check.py checks the two agree.
+
+In strict mode (opt-in) token payloads must also match the AAP token schema
+(public/schemas/aap-token.schema.json), checked with a validator built once.
 """
 
 import jwt
+import threading
 import time
-from typing import Dict, Any, Optional
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from common import cwt
+from common.jsoncodec import JWT
+from common.dpop import DPoPVerifier, DPoPError
+from common.metrics import CACHE_REQUESTS, REGISTRY
+from common.schemas import TOKEN_SCHEMA, get_validator, schema_error
+from common.token_format import detect_token_format
+from .introspection import IntrospectionClient, IntrospectionError
+from .revocation import RevocationList
+from .timing import StageTimer
+
+
+# Base64url SHA-256 digest (delegation.chain_digest)
+CHAIN_DIGEST_LENGTH = 43
+
+VERIFICATION_SECONDS = REGISTRY.histogram(
+    "aap_token_verification_seconds", "Time to verify a token", ("format",)
+)
+
 
 class ValidationError(Exception):
     """Token validation failed"""
@@ -21,7 +48,9 @@ class ValidationError(Exception):
 
 
 class TokenValidator:
-    """Validates AAP access tokens"""
+    """Validates AAP access tokens (JWT, CWT, or reference tokens via introspection)"""
+
+    REQUIRED_CLAIMS = ["iss", "sub", "aud", "exp", "iat", "agent", "task", "capabilities"]
 
     def __init__(
         self,
@@ -30,6 +59,12 @@ class TokenValidator:
         trusted_issuers: list,
         algorithms: Optional[list] = None,
         clock_skew_tolerance: int = 300,  # 5 minutes
+        revocation_list: Optional[RevocationList] = None,
+        require_pop: bool = False,
+        dpop_verifier: Optional[DPoPVerifier] = None,
+        introspection_client: Optional[IntrospectionClient] = None,
+        clock: Callable[[], float] = time.time,
+        strict_schema: bool = False,
     ):
         """
         Initialize token validator
@@ -38,22 +73,44 @@ class TokenValidator:
             public_key: AS public key for signature verification (PEM format)
             audience: Expected audience (this Resource Server's identifier)
             trusted_issuers: List of trusted Authorization Server issuers
-            algorithms: Allowed signing algorithms (default: ES256, RS256)
+            algorithms: Allowed signing algorithms (default: ES256, RS256, EdDSA)
             clock_skew_tolerance: Clock skew tolerance in seconds (default: 300)
+            revocation_list: Optional local revocation list (checked after signature validation)
+            require_pop: Reject tokens that are not DPoP-bound (``cnf.jkt``)
+            dpop_verifier: DPoP proof verifier (default: one with a bucketed replay cache)
+            introspection_client: Resolves reference tokens (required to accept them)
+            clock: Time source for exp/nbf checks (seconds since the epoch)
+            strict_schema: Reject tokens whose payload does not match the AAP
+                token schema
         """
         self.public_key = public_key
         self.audience = audience
         self.trusted_issuers = trusted_issuers
-        self.algorithms = algorithms or ["ES256", "RS256"]
+        self.algorithms = algorithms or ["ES256", "RS256", "EdDSA"]
+        self._verification_keys: Dict[str, Any] = {}  # algorithm -> parsed public key
         self.clock_skew_tolerance = clock_skew_tolerance
-
-    def validate(self, token: str, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        self.revocation_list = revocation_list
+        self.require_pop = require_pop
+        self.dpop_verifier = dpop_verifier or DPoPVerifier()
+        self.introspection_client = introspection_client
+        self.clock = clock
+        self.strict_schema = strict_schema
+        self._token_schema = get_validator(TOKEN_SCHEMA) if strict_schema else None
+
+    def validate(
+        self,
+        token: str,
+        request: Optional[Dict[str, Any]] = None,
+        timer: Optional[StageTimer] = None,
+    ) -> Dict[str, Any]:
         """
         Validate AAP token and return payload
 
         Args:
-            token: JWT token string
-            request: Optional request context (action, target URL, etc.)
+            token: JWT, CWT (base64url), or reference token string
+            request: Optional request context (action, target URL, etc.);
+                DPoP-bound tokens need ``dpop_proof``, ``method`` and ``url``
+            timer: Optional stage timer (one lap per validation step)
 
         Returns:
             Decoded token payload if valid
@@ -61,12 +118,33 @@ class TokenValidator:
         Raises:
             ValidationError: If validation fails
         """
-        # Step 1: Standard OAuth validation
-        payload = self._validate_jwt(token)
+        # Step 1: Standard OAuth validation (format is detected by shape)
+        token_format = detect_token_format(token)
+        with VERIFICATION_SECONDS.time(token_format):
+            if token_format == "jwt":
+                payload = self._validate_jwt(token)
+            elif token_format == "cwt":
+                payload = self._validate_cwt(token)
+            else:
+                payload = self._validate_reference(token)
+        if timer is not None:
+            timer.lap(f"validate_{token_format}")
+
+        # Step 1b: Revocation check (in-memory lookup)
+        if self.revocation_list and self.revocation_list.is_revoked(payload):
+            raise ValidationError(
+                "invalid_token",
+                "Token has been revoked",
+                http_status=401,
+            )
+        if timer is not None:
+            timer.lap("revocation")
 
         # Step 2: Proof-of-possession (if required)
-        # TODO: Implement DPoP and mTLS validation
-        # For reference implementation, PoP validation is not required
+        # mTLS-bound tokens (cnf.x5t#S256) are not supported in the reference implementation
+        self._validate_proof_of_possession(payload, token, request or {})
+        if timer is not None:
+            timer.lap("pop")
 
         # Step 3: Agent identity validation
         self._validate_agent_identity(payload)
@@ -74,9 +152,13 @@ class TokenValidator:
         # Step 4: Task binding validation
         if request:
             self._validate_task_binding(payload, request)
+        if timer is not None:
+            timer.lap("agent_task")
 
         # Step 5: Delegation validation
         self._validate_delegation(payload)
+        if timer is not None:
+            timer.lap("delegation")
 
         return payload
 
@@ -87,16 +169,32 @@ class TokenValidator:
         Section 7.1: Standard Token Validation
         """
         try:
-            payload = jwt.decode(
+            algorithm = jwt.get_unverified_header(token).get("alg")
+        except jwt.InvalidTokenError as e:
+            raise ValidationError(
+                "invalid_token",
+                f"Token validation failed: {e}",
+                http_status=401,
+            )
+
+        key = self._verification_key(algorithm)
+
+        # PyJWT checks nbf, exp (then aud) against the wall clock; with any
+        # other clock those checks are made below, in the same order
+        wall_clock = self.clock is time.time
+
+        try:
+            payload = JWT.decode(
                 token,
-                self.public_key,
-                algorithms=self.algorithms,
+                key,
+                algorithms=[algorithm],
                 audience=self.audience,
                 options={
                     "verify_signature": True,
-                    "verify_exp": True,
-                    "verify_aud": True,
-                    "require": ["iss", "sub", "aud", "exp", "iat", "agent", "task", "capabilities"],
+                    "verify_exp": wall_clock,
+                    "verify_nbf": wall_clock,
+                    "verify_aud": wall_clock,
+                    "require": self.REQUIRED_CLAIMS,
                 },
                 leeway=self.clock_skew_tolerance,
             )
@@ -131,7 +229,155 @@ class TokenValidator:
                 http_status=401,
             )
 
-        # Verify issuer is trusted
+        if not wall_clock:
+            self._validate_jwt_times(payload)
+            self._validate_audience(payload)
+
+        self._validate_issuer(payload)
+        self._validate_schema(payload)
+
+        return payload
+
+    def _validate_cwt(self, token: str) -> Dict[str, Any]:
+        """
+        Validate CWT signature, expiration, audience, and issuer
+
+        Same checks and error messages as _validate_jwt, for COSE_Sign1 tokens.
+        """
+        try:
+            algorithm = cwt.get_unverified_cwt_header(token).get("alg")
+        except cwt.CWTError as e:
+            raise ValidationError(
+                "invalid_token",
+                f"Token validation failed: {e}",
+                http_status=401,
+            )
+
+        key = self._verification_key(algorithm)
+
+        try:
+            payload = cwt.decode_cwt(token, key, algorithms=[algorithm])
+        except cwt.CWTSignatureError:
+            raise ValidationError(
+                "invalid_token",
+                "Token signature verification failed",
+                http_status=401,
+            )
+        except cwt.CWTError as e:
+            raise ValidationError(
+                "invalid_token",
+                f"Token validation failed: {e}",
+                http_status=401,
+            )
+
+        self._validate_claims(payload)
+        self._validate_schema(payload)
+
+        return payload
+
+    def _validate_reference(self, token: str) -> Dict[str, Any]:
+        """
+        Resolve a reference token by introspection (RFC 7662) and validate its claims
+
+        Introspection results are cached by the client, bounded by token exp.
+        """
+        if self.introspection_client is None:
+            raise ValidationError(
+                "invalid_token",
+                "Reference tokens are not accepted by this resource server",
+                http_status=401,
+            )
+
+        try:
+            result = self.introspection_client.introspect(token)
+        except IntrospectionError as e:
+            raise ValidationError(
+                "temporarily_unavailable",
+                f"Token introspection failed: {e}",
+                http_status=503,
+            )
+
+        if not result.get("active"):
+            raise ValidationError(
+                "invalid_token",
+                "Token is not active",
+                http_status=401,
+            )
+
+        payload = {k: v for k, v in result.items() if k not in ("active", "token_type")}
+        self._validate_claims(payload)
+        self._validate_schema(payload)
+
+        return payload
+
+    def _validate_claims(self, payload: Dict[str, Any]):
+        """
+        Required claims, expiration, not-before, audience, and issuer checks
+
+        Used for tokens not decoded by PyJWT (CWT and introspection results),
+        with the same error messages as _validate_jwt.
+        """
+        for claim in self.REQUIRED_CLAIMS:
+            if claim not in payload:
+                raise ValidationError(
+                    "invalid_token",
+                    f"Token missing required claim: Token is missing the \"{claim}\" claim",
+                    http_status=401,
+                )
+
+        now = self.clock()
+        if payload["exp"] <= now - self.clock_skew_tolerance:
+            raise ValidationError(
+                "invalid_token",
+                "Token has expired",
+                http_status=401,
+            )
+
+        if "nbf" in payload and payload["nbf"] > now + self.clock_skew_tolerance:
+            raise ValidationError(
+                "invalid_token",
+                "Token validation failed: The token is not yet valid (nbf)",
+                http_status=401,
+            )
+
+        self._validate_audience(payload)
+        self._validate_issuer(payload)
+
+    def _validate_jwt_times(self, payload: Dict[str, Any]):
+        """PyJWT's nbf and exp checks (whole seconds), against ``self.clock``"""
+        now = self.clock()
+        try:
+            if "nbf" in payload and int(payload["nbf"]) > now + self.clock_skew_tolerance:
+                raise ValidationError(
+                    "invalid_token",
+                    "Token validation failed: The token is not yet valid (nbf)",
+                    http_status=401,
+                )
+            if int(payload["exp"]) <= now - self.clock_skew_tolerance:
+                raise ValidationError(
+                    "invalid_token",
+                    "Token has expired",
+                    http_status=401,
+                )
+        except (TypeError, ValueError):
+            raise ValidationError(
+                "invalid_token",
+                "Token validation failed: nbf and exp must be integers",
+                http_status=401,
+            )
+
+    def _validate_audience(self, payload: Dict[str, Any]):
+        """Verify this resource server is an audience of the token"""
+        audience = payload["aud"]
+        if self.audience not in (audience if isinstance(audience, list) else [audience]):
+            raise ValidationError(
+                "invalid_token",
+                "Token audience does not match this resource server",
+                http_status=401,
+            )
+
+    def _validate_issuer(self, payload: Dict[str, Any]):
+        """Verify issuer is trusted"""
         if payload.get("iss") not in self.trusted_issuers:
             raise ValidationError(
                 "invalid_token",
@@ -139,7 +385,84 @@ class TokenValidator:
                 http_status=401,
             )
 
-        return payload
+    def _validate_schema(self, payload: Dict[str, Any]):
+        """Strict mode: verify the payload matches the AAP token schema"""
+        if self._token_schema is None:
+            return
+
+        error = schema_error(self._token_schema, payload)
+        if error is not None:
+            raise ValidationError(
+                "invalid_token",
+                f"Token payload does not match the AAP token schema: {error}",
+                http_status=401,
+            )
+
+    def _verification_key(self, algorithm: Optional[str]) -> Any:
+        """
+        Parsed AS public key for the token's signing algorithm
+
+        The PEM key is parsed once per algorithm instead of on every decode.
+        """
+        if algorithm not in self.algorithms:
+            raise ValidationError(
+                "invalid_token",
+                "Token signing algorithm is not allowed",
+                http_status=401,
+            )
+
+        key = self._verification_keys.get(algorithm)
+        if key is None:
+            try:
+                key = jwt.get_algorithm_by_name(algorithm).prepare_key(self.public_key)
+            except (jwt.InvalidKeyError, ValueError):
+                # AS key type does not match the token's algorithm
+                raise ValidationError(
+                    "invalid_token",
+                    "Token signature verification failed",
+                    http_status=401,
+                )
+            self._verification_keys[algorithm] = key
+
+        return key
+
+    def _validate_proof_of_possession(
+        self, payload: Dict[str, Any], token: str, request: Dict[str, Any]
+    ):
+        """
+        Validate DPoP proof for sender-constrained tokens
+
+        Section 7.2: Proof-of-Possession Validation (RFC 9449)
+        """
+        jkt = (payload.get("cnf") or {}).get("jkt")
+
+        if not jkt:
+            if self.require_pop:
+                raise ValidationError(
+                    "invalid_token",
+                    "Token is not sender-constrained",
+                    http_status=401,
+                )
+            return
+
+        proof = request.get("dpop_proof")
+        if not proof:
+            raise ValidationError(
+                "invalid_dpop_proof",
+                "DPoP proof is required for this token",
+                http_status=401,
+            )
+
+        try:
+            self.dpop_verifier.verify(
+                proof,
+                htm=request.get("method", "GET"),
+                htu=request.get("url", ""),
+                access_token=token,
+                expected_jkt=jkt,
+            )
+        except DPoPError as e:
+            raise ValidationError("invalid_dpop_proof", e.description, http_status=401)
 
     def _validate_agent_identity(self, payload: Dict[str, Any]):
         """
@@ -241,9 +564,92 @@ class TokenValidator:
                 "Delegation depth exceeds maximum allowed depth",
             )
 
+        # Compact chain: only the last hops are carried, with a rolling digest
+        # of the full chain that the AS can check against its lineage records
+        if "chain_digest" in delegation:
+            digest = delegation["chain_digest"]
+            if not isinstance(digest, str) or len(digest) != CHAIN_DIGEST_LENGTH:
+                raise ValidationError(
+                    "aap_invalid_delegation_chain",
+                    "Delegation chain digest is malformed",
+                )
+            if not 1 <= len(chain) <= depth + 1:
+                raise ValidationError(
+                    "aap_invalid_delegation_chain",
+                    f"Delegation chain tail length ({len(chain)}) must be between 1 and depth+1 ({depth+1})",
+                )
+            return
+
         # Validate chain length matches depth
         if len(chain) != depth + 1:
             raise ValidationError(
                 "aap_invalid_delegation_chain",
                 f"Delegation chain length ({len(chain)}) does not match depth+1 ({depth+1})",
             )
+
+
+class CachingTokenValidator(TokenValidator):
+    """
+    Token validator that verifies each JWT/CWT once
+
+    The result of step 1 (signature, expiration, audience and issuer checks,
+    and the schema check in strict mode) is cached per token string until the token expires (exp plus the clock
+    skew tolerance, when the reference check would start to fail). Only
+    successful verifications are cached. Revocation, proof-of-possession,
+    agent, task and delegation checks still run on every request, so
+    results are the same as TokenValidator's.
+
+    Cached payloads are shared between requests and must not be modified.
+    Reference tokens are not cached here (the introspection client caches them).
+    """
+
+    def __init__(self, *args, cache_size: int = 10_000, **kwargs):
+        """
+        Initialize token validator
+
+        Args:
+            cache_size: Maximum cached verified tokens
+            Other arguments as for TokenValidator
+        """
+        super().__init__(*args, **kwargs)
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _validate_jwt(self, token: str) -> Dict[str, Any]:
+        # PyJWT compares whole seconds (exp is truncated to an integer)
+        return self._verified(token, super()._validate_jwt, int)
+
+    def _validate_cwt(self, token: str) -> Dict[str, Any]:
+        return self._verified(token, super()._validate_cwt, float)
+
+    def _verified(
+        self,
+        token: str,
+        verify: Callable[[str], Dict[str, Any]],
+        exp_type: Callable[[Any], float],
+    ) -> Dict[str, Any]:
+        now = self.clock()
+        with self._lock:
+            cached = self._cache.get(token)
+            if cached is not None:
+                if now < cached[0]:
+                    self._cache.move_to_end(token)
+                    CACHE_REQUESTS.inc("verified_token", "hit")
+                    return cached[1]
+                del self._cache[token]
+
+        CACHE_REQUESTS.inc("verified_token", "miss")
+        payload = verify(token)
+
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)) and self.cache_size > 0:
+            with self._lock:
+                self._cache[token] = (exp_type(exp) + self.clock_skew_tolerance, payload)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return payload
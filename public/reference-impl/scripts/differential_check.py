@@ -0,0 +1,520 @@
+"""
+Differential check of optimized code paths against the reference implementation
+
+Generates random (seeded) policies, capability requests, domain lists,
+constraint sets, request contexts and tokens (including delegation claims),
+runs each through the reference code and its optimized counterpart, and
+reports every input on which the two disagree:
+
+- policy:      PolicyEngine vs CompiledPolicyEngine (granted capabilities,
+               including namespace grants and after callers mutate
+               returned constraints)
+- actions:     CapabilityMatcher vs CompiledCapabilityMatcher (which token
+               capability an action matches, with namespace wildcards)
+- domains:     ConstraintEnforcer vs CompiledConstraintEnforcer domain matching
+- resources:   resource_matches vs ResourceMatcher (exact, prefix, glob and
+               URI template patterns)
+- constraints: enforce_constraints decisions and error codes over a request
+               sequence on a virtual clock (rate limits, domains, methods,
+               sizes, time windows)
+- validate:    TokenValidator vs CachingTokenValidator (payload or exact
+               error code, description and status; tokens are validated
+               repeatedly and revoked mid-run, and the optimized side may
+               run on a virtual clock, which checks exp/nbf without PyJWT;
+               both sides may run in strict schema mode)
+
+Exits with status 1 on any mismatch. A failing run is reproduced with the
+same --seed.
+
+Usage:
+    python scripts/differential_check.py
+    python scripts/differential_check.py --seed 7 --cases 20000 --only domains,constraints
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+# Make the as/rs/common packages importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import cwt
+from rs.capability_matcher import CapabilityMatcher, CompiledCapabilityMatcher
+from rs.constraint_enforcer import (
+    CompiledConstraintEnforcer,
+    ConstraintEnforcer,
+    ConstraintViolationError,
+)
+from rs.resource_matcher import ResourceMatcher, resource_matches
+from rs.revocation import RevocationList
+from rs.validator import CachingTokenValidator, TokenValidator, ValidationError
+
+policy_engine = importlib.import_module("as.policy_engine")
+
+# A mismatch: (case description, reference outcome, optimized outcome)
+Mismatch = Tuple[Any, Any, Any]
+
+ACTIONS = ["search.web", "cms.create_draft", "cms.publish", "data.analyze", "data.delete", "mail.send"]
+NAMESPACES = ["cms.*", "data.*", "cms.drafts.*", "search.web.*", "*", ".*"]
+PURPOSES = [None, "research", "publishing", "cleanup"]
+CATEGORIES = [None, "research", "content-creation"]
+LABELS = ["example", "org", "com", "trusted", "a", "b", "EXAMPLE", "xn--bcher-kva", ""]
+AUDIENCE = "https://api.example.com"
+ISSUER = "https://as.example.com"
+
+
+def outcome(func: Callable[[], Any]) -> Tuple[Any, ...]:
+    """Result of a call, or the error it raised, in comparable form"""
+    try:
+        return ("ok", func())
+    except ValidationError as e:
+        return ("ValidationError", e.error_code, e.description, e.http_status)
+    except ConstraintViolationError as e:
+        return ("ConstraintViolationError", e.constraint_type, e.description, e.http_status)
+    except Exception as e:
+        return (type(e).__name__, str(e))
+
+
+# --- policy -----------------------------------------------------------------
+
+
+def random_constraints(rng: random.Random) -> Dict[str, Any]:
+    constraints = {}
+    if rng.random() < 0.5:
+        constraints["max_requests_per_hour"] = rng.choice([1, 10, 100])
+    if rng.random() < 0.3:
+        constraints["max_requests_per_minute"] = rng.choice([1, 5, 10])
+    if rng.random() < 0.4:
+        constraints["domains_allowed"] = rng.sample(["example.org", "trusted.com", "a.b"], rng.randint(0, 3))
+    if rng.random() < 0.2:
+        constraints["token_lifetime"] = rng.choice([60, 3600])
+    return constraints
+
+
+def random_policy(rng: random.Random, operator: str) -> Dict[str, Any]:
+    capabilities = []
+    for _ in range(rng.randint(0, 8)):
+        capability = {"action": rng.choice(ACTIONS + NAMESPACES + [None])}  # duplicates are likely
+        if rng.random() < 0.7:
+            capability["default_constraints"] = random_constraints(rng)
+        if rng.random() < 0.5:
+            capability["description"] = f"desc-{rng.randint(0, 9)}"
+        if rng.random() < 0.3:
+            capability["resources"] = random_patterns(rng)
+        capabilities.append(capability)
+    policy = {
+        "policy_id": f"policy-{operator}",
+        "applies_to": {"operator": operator},
+        "allowed_capabilities": capabilities,
+    }
+    if rng.random() < 0.8:
+        policy["global_constraints"] = random_constraints(rng)
+    if rng.random() < 0.5:
+        policy["purpose_rules"] = random_purpose_rules(rng)
+    return policy
+
+
+def random_purpose_rules(rng: random.Random) -> Dict[str, Any]:
+    def actions() -> List[str]:
+        return rng.sample(ACTIONS + NAMESPACES, rng.randint(0, len(ACTIONS)))
+
+    rules = {}
+    for name, keys in (("purposes", PURPOSES), ("categories", CATEGORIES)):
+        if rng.random() < 0.7:
+            rules[name] = {key: actions() for key in keys if key and rng.random() < 0.5}
+    if rng.random() < 0.3:
+        rules["default"] = actions()
+    return rules
+
+
+def check_policy(rng: random.Random, cases: int) -> Iterator[Mismatch]:
+    operators = [f"org:op{i}" for i in range(4)]
+    per_set = 200
+    for first in range(0, cases, per_set):
+        with tempfile.TemporaryDirectory() as policy_dir:
+            policies = {}
+            for i, operator in enumerate(operators[: rng.randint(1, len(operators))]):
+                policies[operator] = random_policy(rng, operator)
+                with open(os.path.join(policy_dir, f"{i}.json"), "w") as f:
+                    json.dump(policies[operator], f)
+            # Malformed policies are loaded too (no schema check): both engines must agree on them
+            reference = policy_engine.PolicyEngine(policy_dir, validate_schema=False)
+            optimized = policy_engine.CompiledPolicyEngine(
+                policy_dir, cache_size=rng.choice([0, 4, 1000]), validate_schema=False
+            )
+
+        for _ in range(min(per_set, cases - first)):
+            operator = rng.choice(operators + ["org:unknown"])
+            requested = [
+                rng.choice(ACTIONS + ["unknown.action", "cms.drafts.create", "cms.*"])
+                for _ in range(rng.randint(0, 6))
+            ]
+            purpose = rng.choice(PURPOSES)
+            category = rng.choice(CATEGORIES)
+            case = {
+                "policy": policies.get(operator),
+                "requested": requested,
+                "purpose": purpose,
+                "category": category,
+            }
+
+            for attempt in ("first", "repeat"):
+                expected = reference.evaluate_capabilities(operator, requested, purpose, category)
+                actual = optimized.evaluate_capabilities(operator, requested, purpose, category)
+                grants = [c.to_dict() for c in expected], [c.to_dict() for c in actual]
+                if grants[0] != grants[1]:
+                    yield {**case, "attempt": attempt}, grants[0], grants[1]
+                    break
+                # Callers own the returned objects: mutations must not leak into later results
+                for capability in expected + actual:
+                    capability.constraints["mutated"] = True
+                    capability.action = "mutated"
+                    if isinstance(capability.resources, list):
+                        capability.resources.append("mutated")
+
+
+# --- actions ----------------------------------------------------------------
+
+COMPONENTS = ["cms", "drafts", "publish", "data", "a", "", "*"]
+
+
+def random_action(rng: random.Random) -> str:
+    return ".".join(rng.choice(COMPONENTS) for _ in range(rng.randint(1, 4)))
+
+
+def check_actions(rng: random.Random, cases: int) -> Iterator[Mismatch]:
+    matcher = CompiledCapabilityMatcher(cache_size=rng.choice([0, 4, 1000]))
+    tokens: List[List[Dict[str, Any]]] = []
+    for _ in range(cases):
+        if tokens and rng.random() < 0.5:
+            capabilities = rng.choice(tokens)  # A cached payload, matched again
+        else:
+            capabilities = [
+                {"action": rng.choice([random_action(rng), random_action(rng) + ".*", None, 7])}
+                for _ in range(rng.randint(0, 12))
+            ]
+            if rng.random() < 0.01:
+                capabilities.append("not-a-capability")
+            tokens = (tokens + [capabilities])[-16:]
+        requested = random_action(rng) if rng.random() < 0.95 else rng.choice([None, 7])
+        granted = [c["action"] for c in capabilities if isinstance(c, dict) and isinstance(c["action"], str)]
+        if granted and rng.random() < 0.7:
+            # An action at or below one the token grants (often under nested namespaces)
+            requested = rng.choice(granted).rstrip("*").rstrip(".")
+            for _ in range(rng.randint(0, 2)):
+                requested += "." + rng.choice(COMPONENTS)
+
+        def position(find):
+            found = find(capabilities, requested)
+            return next((i for i, c in enumerate(capabilities) if c is found), found)
+
+        expected = outcome(lambda: position(CapabilityMatcher.find_matching_capability))
+        actual = outcome(lambda: position(matcher.find_matching_capability))
+        if expected != actual:
+            yield {"capabilities": capabilities, "requested": requested}, expected, actual
+
+
+# --- domains ----------------------------------------------------------------
+
+
+def random_domain(rng: random.Random) -> str:
+    domain = ".".join(rng.choice(LABELS) for _ in range(rng.randint(1, 4)))
+    if rng.random() < 0.05:
+        domain += "."
+    return domain
+
+
+def random_domain_list(rng: random.Random, domain: str) -> List[str]:
+    entries = [random_domain(rng) for _ in range(rng.randint(0, 6))]
+    if rng.random() < 0.5 and "." in domain:
+        entries.append(domain.split(".", rng.randint(1, domain.count(".")))[-1])  # a suffix
+    if rng.random() < 0.2:
+        entries.append(domain)
+    if rng.random() < 0.1:
+        entries.append(rng.choice(["", ".", ".org", "org."]))
+    rng.shuffle(entries)
+    return entries
+
+
+def check_domains(rng: random.Random, cases: int) -> Iterator[Mismatch]:
+    for _ in range(cases):
+        domain = random_domain(rng)
+        domain_list = random_domain_list(rng, domain)
+        expected = outcome(lambda: ConstraintEnforcer._domain_matches_list(domain, domain_list))
+        actual = outcome(lambda: CompiledConstraintEnforcer._domain_matches_list(domain, domain_list))
+        if expected != actual:
+            yield {"domain": domain, "list": domain_list}, expected, actual
+
+
+# --- resources --------------------------------------------------------------
+
+SEGMENTS = ["v2", "articles", "42", "a.b", "drafts", "", "*", "**", "{id}", "{+path}", "{", "x}"]
+
+
+def random_resource(rng: random.Random) -> str:
+    root = rng.choice(["https://api.example.com/", "urn:resource:cms:", "", "/"])
+    separator = "/" if root != "urn:resource:cms:" else rng.choice([":", "/"])
+    segments = [rng.choice(SEGMENTS[:6]) for _ in range(rng.randint(0, 4))]
+    return root + separator.join(segments) + ("\n" if rng.random() < 0.02 else "")
+
+
+def random_patterns(rng: random.Random, resource: str = "") -> List[str]:
+    patterns = []
+    for _ in range(rng.randint(0, 8)):
+        pattern = random_resource(rng)
+        if resource and rng.random() < 0.4:
+            pattern = resource[: rng.randint(0, len(resource))]  # a prefix of the resource
+        if rng.random() < 0.7:
+            position = rng.randint(0, len(pattern))
+            pattern = pattern[:position] + rng.choice(SEGMENTS[6:]) + pattern[position:]
+        if rng.random() < 0.3:
+            pattern += rng.choice(["*", "**", "/*", "{+rest}"])
+        patterns.append(pattern)
+    if resource and rng.random() < 0.1:
+        patterns.append(resource)
+    rng.shuffle(patterns)
+    return patterns
+
+
+def check_resources(rng: random.Random, cases: int) -> Iterator[Mismatch]:
+    matcher = ResourceMatcher(cache_size=rng.choice([0, 16, 1024]))
+    history: List[List[str]] = []
+    for _ in range(cases):
+        resource = random_resource(rng)
+        if history and rng.random() < 0.3:
+            patterns = rng.choice(history)  # Exercise the compiled-pattern cache
+        else:
+            patterns = random_patterns(rng, resource)
+            history = (history + [patterns])[-32:]
+        if rng.random() < 0.01:
+            patterns = rng.choice([None, "https://api.example.com/*", [1, "a"]])
+        expected = outcome(lambda: resource_matches(patterns, resource))
+        actual = outcome(lambda: matcher.matches(patterns, resource))
+        if expected != actual:
+            yield {"resource": resource, "patterns": patterns}, expected, actual
+
+
+# --- constraints ------------------------------------------------------------
+
+
+class VirtualClock:
+    """Time source shared by both enforcers"""
+
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def random_constraint_set(rng: random.Random) -> Dict[str, Any]:
+    constraints = {}
+    if rng.random() < 0.5:
+        constraints["max_requests_per_hour"] = rng.randint(1, 6)
+    if rng.random() < 0.5:
+        constraints["max_requests_per_minute"] = rng.randint(1, 4)
+    if rng.random() < 0.5:
+        constraints["domains_allowed"] = random_domain_list(rng, "example.org")
+    if rng.random() < 0.3:
+        constraints["domains_blocked"] = random_domain_list(rng, "trusted.com")
+    if rng.random() < 0.3:
+        constraints["allowed_methods"] = rng.sample(["GET", "POST", "PUT"], rng.randint(0, 3))
+    if rng.random() < 0.2:
+        constraints["max_request_size"] = rng.choice([0, 100, 10_000])
+    if rng.random() < 0.1:
+        constraints["time_window"] = rng.choice(
+            [{"start": "2000-01-01T00:00:00"}, {"end": "2000-01-01T00:00:00"}, {"end": "2999-01-01T00:00:00"}]
+        )
+    return constraints
+
+
+def check_constraints(rng: random.Random, cases: int) -> Iterator[Mismatch]:
+    clock = VirtualClock(1_700_000_000.0)
+    scope = rng.choice(["token", "tree", "task"])
+    reference = ConstraintEnforcer(scope, clock=clock)
+    optimized = CompiledConstraintEnforcer(scope, clock=clock)
+    constraint_sets = [random_constraint_set(rng) for _ in range(8)]
+    keys = [f"jti-{i}" for i in range(4)]
+
+    for step in range(cases):
+        # Mostly small steps (windows fill up), sometimes large, rarely backwards
+        clock.now += rng.choice([0, 0, 0.5, 1, 7, 30, 61, 3600]) if rng.random() > 0.01 else -rng.randint(1, 120)
+        constraints = rng.choice(constraint_sets)
+        request = {"method": rng.choice(["GET", "POST", "DELETE"]), "content_length": rng.choice([0, 50, 5000])}
+        if rng.random() < 0.8:
+            request["target_url"] = rng.choice(["https://", "mailto:x", "https://{}/path"]).replace(
+                "{}", random_domain(rng)
+            )
+        key = rng.choice(keys)
+        shared_key = rng.choice(keys + ["root", "root", None])
+
+        expected = outcome(lambda: reference.enforce_constraints(constraints, request, key, shared_key))
+        actual = outcome(lambda: optimized.enforce_constraints(constraints, request, key, shared_key))
+        if expected != actual:
+            case = {"step": step, "now": clock.now, "constraints": constraints, "request": request, "key": key}
+            yield dict(case, shared_key=shared_key), expected, actual
+
+
+# --- validate ---------------------------------------------------------------
+
+
+def generate_keys() -> Tuple[bytes, bytes]:
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem, public_pem
+
+
+def random_payload(rng: random.Random, index: int) -> Dict[str, Any]:
+    now = int(time.time())
+    depth = rng.randint(0, 3)
+    payload = {
+        "iss": ISSUER if rng.random() > 0.05 else "https://evil.example.com",
+        "sub": "agent-01",
+        "aud": rng.choice([AUDIENCE] * 8 + [[AUDIENCE, "https://other.example.com"], "https://other.example.com"]),
+        "exp": now + 3600 if rng.random() > 0.05 else now - 3600,
+        "iat": now if rng.random() > 0.05 else now + 3600,
+        "jti": f"jti-{index}",
+        "agent": {"id": "agent-01", "type": "llm-autonomous", "operator": "org:acme"},
+        "task": {"id": f"task-{rng.choice([index, 'shared'])}", "purpose": "research"},
+        "capabilities": [{"action": rng.choice(ACTIONS)}],
+        "delegation": {
+            "depth": depth,
+            "max_depth": rng.choice([depth, depth + 1, max(0, depth - 1)]),
+            "chain": [f"hop-{i}" for i in range(rng.choice([depth + 1, depth + 1, depth, depth + 2]))],
+        },
+    }
+    if rng.random() < 0.1:
+        payload["delegation"]["chain_digest"] = "".join(rng.choice(string.ascii_letters) for _ in range(rng.choice([43, 10])))
+    if rng.random() < 0.05:
+        payload["nbf"] = now + 3600
+    for claim in ("agent", "task", "delegation"):
+        if rng.random() < 0.05:
+            del payload[claim]
+    for field in ("id", "type", "operator"):
+        if rng.random() < 0.03 and "agent" in payload:
+            payload["agent"][field] = ""
+    for field in ("id", "purpose"):
+        if rng.random() < 0.03 and "task" in payload:
+            del payload["task"][field]
+    if rng.random() < 0.05:
+        del payload[rng.choice(["sub", "exp", "capabilities"])]
+    if rng.random() < 0.05:
+        payload["unregistered"] = True  # Rejected in strict mode only
+    return payload
+
+
+def check_validate(rng: random.Random, cases: int) -> Iterator[Mismatch]:
+    private_pem, public_pem = generate_keys()
+    other_private_pem, _ = generate_keys()
+    revocations = RevocationList()
+    options = dict(
+        public_key=public_pem,
+        audience=AUDIENCE,
+        trusted_issuers=[ISSUER],
+        revocation_list=revocations,
+        strict_schema=rng.random() < 0.5,
+    )
+    reference = TokenValidator(**options)
+    # A virtual clock kept at the wall clock's time must give PyJWT's results
+    clock = VirtualClock(time.time()) if rng.random() < 0.5 else time.time
+    optimized = CachingTokenValidator(cache_size=rng.choice([4, 1000]), clock=clock, **options)
+
+    tokens = []
+    version = 0
+    for index in range(cases):
+        if tokens and rng.random() < 0.5:
+            token, payload = rng.choice(tokens)  # Reuse: exercises the cache
+        else:
+            payload = random_payload(rng, index)
+            key = private_pem if rng.random() > 0.05 else other_private_pem
+            if rng.random() < 0.3:
+                token = cwt.encode_cwt(payload, key, "ES256")
+            else:
+                token = jwt.encode(payload, key, algorithm="ES256")
+            if rng.random() < 0.03:
+                token = token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB")
+            tokens.append((token, payload))
+
+        if rng.random() < 0.01:
+            # Revoke a token (or a task) that may already be cached
+            version += 1
+            update = {"type": "delta", "epoch": None, "from_version": version - 1, "version": version}
+            if rng.random() < 0.8:
+                update.update(jtis=[payload.get("jti")], exp=[payload.get("exp")])
+            else:
+                update["tasks"] = {(payload.get("task") or {}).get("id"): int(time.time()) + 10}
+            revocations.apply(update)
+
+        request = rng.choice([None, {"action": "search.web"}])
+        if clock is not time.time:
+            clock.now = time.time()
+        expected = outcome(lambda: reference.validate(token, request))
+        actual = outcome(lambda: optimized.validate(token, request))
+        if expected != actual:
+            yield {"case": index, "payload": payload, "request": request}, expected, actual
+
+
+CHECKS: Dict[str, Callable[[random.Random, int], Iterator[Mismatch]]] = {
+    "policy": check_policy,
+    "actions": check_actions,
+    "domains": check_domains,
+    "resources": check_resources,
+    "constraints": check_constraints,
+    "validate": check_validate,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare optimized AAP code paths with the reference")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--cases", type=int, default=2000, help="Cases per check")
+    parser.add_argument("--only", help=f"Comma-separated checks (default: all of {','.join(CHECKS)})")
+    parser.add_argument("--max-failures", type=int, default=5, help="Mismatches shown per check")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        parser.error(f"Unknown checks: {', '.join(unknown)}")
+
+    failed = False
+    for name in names:
+        # One generator per check, so a check reproduces independently of --only
+        rng = random.Random(f"{args.seed}:{name}")
+        started = time.perf_counter()
+        mismatches = 0
+        for case, expected, actual in CHECKS[name](rng, args.cases):
+            mismatches += 1
+            if mismatches <= args.max_failures:
+                print(f"[{name}] MISMATCH")
+                print(f"  input:     {json.dumps(case, default=str)}")
+                print(f"  reference: {expected!r}")
+                print(f"  optimized: {actual!r}")
+        elapsed = time.perf_counter() - started
+        status = "ok" if not mismatches else f"{mismatches} mismatch(es)"
+        print(f"{name:<12} {args.cases:>8} cases  {elapsed:6.2f}s  {status}")
+        failed = failed or bool(mismatches)
+
+    if failed:
+        print(f"\nMismatches found (reproduce with --seed {args.seed})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
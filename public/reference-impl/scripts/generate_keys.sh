@@ -1,15 +1,38 @@
 #!/bin/bash
 # Generate keys for AAP Authorization Server
+#
+# Usage: ./generate_keys.sh [ES256|RS256|EdDSA]   (default: ES256)
+# Set AAP_SIGNING_ALGORITHM to the same value when starting the AS.
 
+ALGORITHM="${1:-ES256}"
 KEYS_DIR="../keys"
 mkdir -p "$KEYS_DIR"
 
-echo "Generating ES256 (ECDSA P-256) key pair for AS..."
-openssl ecparam -genkey -name prime256v1 -noout -out "$KEYS_DIR/as_private_key.pem"
-openssl ec -in "$KEYS_DIR/as_private_key.pem" -pubout -out "$KEYS_DIR/as_public_key.pem"
+case "$ALGORITHM" in
+  ES256)
+    echo "Generating ES256 (ECDSA P-256) key pair for AS..."
+    openssl ecparam -genkey -name prime256v1 -noout -out "$KEYS_DIR/as_private_key.pem"
+    openssl ec -in "$KEYS_DIR/as_private_key.pem" -pubout -out "$KEYS_DIR/as_public_key.pem"
+    ;;
+  RS256)
+    echo "Generating RS256 (RSA 2048) key pair for AS..."
+    openssl genpkey -algorithm RSA -pkeyopt rsa_keygen_bits:2048 -out "$KEYS_DIR/as_private_key.pem"
+    openssl pkey -in "$KEYS_DIR/as_private_key.pem" -pubout -out "$KEYS_DIR/as_public_key.pem"
+    ;;
+  EdDSA)
+    echo "Generating EdDSA (Ed25519) key pair for AS..."
+    openssl genpkey -algorithm ed25519 -out "$KEYS_DIR/as_private_key.pem"
+    openssl pkey -in "$KEYS_DIR/as_private_key.pem" -pubout -out "$KEYS_DIR/as_public_key.pem"
+    ;;
+  *)
+    echo "Unsupported algorithm: $ALGORITHM (expected ES256, RS256, or EdDSA)"
+    exit 1
+    ;;
+esac
 
 echo ""
 echo "Keys generated successfully:"
+echo "  Algorithm:   $ALGORITHM"
 echo "  Private key: $KEYS_DIR/as_private_key.pem"
 echo "  Public key:  $KEYS_DIR/as_public_key.pem"
 echo ""
@@ -0,0 +1,223 @@
+"""
+End-to-end check of token introspection against a local Authorization Server
+
+Starts the AS in-process on an ephemeral port (fresh signing keys, the
+bundled policies, reference tokens) and drives it through the RS
+IntrospectionClient and TokenValidator over HTTP:
+
+- credential: /introspect refuses missing and wrong Bearer credentials, and
+              refuses every call when no credential is configured (unless
+              AAP_INTROSPECTION_OPEN)
+- active:     a reference token resolves to its AAP claims and validates,
+              and repeated lookups are served from the cache
+- revoked:    after /revoke the AS reports the token inactive, and a fresh
+              client (past its cache TTL) rejects it
+- unknown:    an unknown handle is inactive and is rejected by the validator
+- full:       when the reference token store is full the AS answers 503 with
+              Retry-After, and the live handles stay active
+
+Exits with status 1 on any failed check.
+
+Usage:
+    python scripts/introspection_check.py
+"""
+
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Tuple
+
+import requests
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from werkzeug.serving import make_server
+
+# Make the as/rs/common packages importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rs.introspection import IntrospectionClient, IntrospectionError
+from rs.validator import TokenValidator, ValidationError
+
+as_config = importlib.import_module("as.config")
+as_server = importlib.import_module("as.server")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIENCE = "https://api.example.com"
+ISSUER = "https://as.example.com"
+CREDENTIAL = "introspection-check-credential"
+CLIENT = {"client_id": "agent-researcher-01", "client_secret": "secret"}
+
+
+def write_keys(directory: str) -> Tuple[str, str, bytes]:
+    """Generate an ES256 key pair; returns (private path, public path, public PEM)"""
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    paths = []
+    for name, pem in (("private.pem", private_pem), ("public.pem", public_pem)):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(pem)
+        paths.append(path)
+    return paths[0], paths[1], public_pem
+
+
+def start_server(
+    key_dir: str, introspection_token: str, max_entries: int = 1_000_000
+) -> Tuple[str, bytes, Callable[[], None]]:
+    """Run an AS issuing reference tokens; returns (base URL, public PEM, shutdown)"""
+    private_path, public_path, public_pem = write_keys(key_dir)
+
+    cfg = as_config.ASConfig()
+    cfg.issuer = ISSUER
+    cfg.private_key_path = private_path
+    cfg.public_key_path = public_path
+    cfg.policy_path = os.path.join(ROOT, "policies")
+    cfg.token_format = "reference"
+    cfg.reference_token_max_entries = max_entries
+    cfg.client_registry_path = ""
+    cfg.introspection_token = introspection_token
+    cfg.introspection_open = False
+
+    app = as_server.create_app(cfg, warm_up=True)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", public_pem, server.shutdown
+
+
+def request_token(base: str, task_id: str = "introspection-check") -> requests.Response:
+    return requests.post(
+        f"{base}/token",
+        data=dict(
+            CLIENT,
+            grant_type="client_credentials",
+            operator="org:acme-corp",
+            task_purpose="research_climate_data",
+            capabilities="search.web",
+            task_id=task_id,
+        ),
+        timeout=5,
+    )
+
+
+def issue(base: str) -> str:
+    response = request_token(base)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def rejected(validator: TokenValidator, token: str) -> str:
+    """Error code the validator rejects a token with ('' if it validates)"""
+    try:
+        validator.validate(token)
+    except ValidationError as e:
+        return e.error_code
+    return ""
+
+
+def run_checks(base: str, public_pem: bytes) -> List[Tuple[str, bool, str]]:
+    results: List[Tuple[str, bool, str]] = []
+
+    def check(name: str, passed: bool, detail: str = ""):
+        results.append((name, passed, detail))
+
+    def make_validator(client: IntrospectionClient) -> TokenValidator:
+        return TokenValidator(public_pem, AUDIENCE, [ISSUER], introspection_client=client)
+
+    token = issue(base)
+
+    # credential
+    for label, auth_token in (("missing", None), ("wrong", "not-the-credential")):
+        try:
+            IntrospectionClient(f"{base}/introspect", auth_token=auth_token).introspect(token)
+            check(f"credential ({label})", False, "introspection succeeded")
+        except IntrospectionError as e:
+            check(f"credential ({label})", "401" in str(e), str(e))
+
+    # active
+    client = IntrospectionClient(f"{base}/introspect", auth_token=CREDENTIAL)
+    result = client.introspect(token)
+    check(
+        "active",
+        result.get("active") is True and result.get("agent", {}).get("id") == CLIENT["client_id"],
+        f"active={result.get('active')}",
+    )
+    check("active (validator)", rejected(make_validator(client), token) == "")
+    check("active (cached)", client.introspect(token) is result)
+
+    # revoked
+    requests.post(f"{base}/revoke", data=dict(CLIENT, token=token), timeout=5).raise_for_status()
+    fresh = IntrospectionClient(f"{base}/introspect", auth_token=CREDENTIAL, cache_ttl=0)
+    check("revoked", fresh.introspect(token).get("active") is False)
+    check("revoked (validator)", rejected(make_validator(fresh), token) == "invalid_token")
+
+    # unknown
+    unknown = "aapr_" + "A" * 43
+    check("unknown", fresh.introspect(unknown).get("active") is False)
+    check("unknown (validator)", rejected(make_validator(fresh), unknown) == "invalid_token")
+
+    return results
+
+
+def check_closed_by_default(key_dir: str) -> Tuple[str, bool, str]:
+    """Without a configured credential the endpoint must refuse every call"""
+    base, _, shutdown = start_server(key_dir, introspection_token="")
+    try:
+        response = requests.post(f"{base}/introspect", data={"token": issue(base)}, timeout=5)
+        return ("credential (unconfigured)", response.status_code == 401, f"HTTP {response.status_code}")
+    finally:
+        shutdown()
+
+
+def check_store_full(key_dir: str) -> List[Tuple[str, bool, str]]:
+    """A full store must refuse new tokens instead of evicting live ones"""
+    base, _, shutdown = start_server(key_dir, CREDENTIAL, max_entries=1)
+    try:
+        token = issue(base)
+        response = request_token(base, task_id="introspection-check-full")
+        client = IntrospectionClient(f"{base}/introspect", auth_token=CREDENTIAL, cache_ttl=0)
+        return [
+            (
+                "full (refused)",
+                response.status_code == 503 and "Retry-After" in response.headers,
+                f"HTTP {response.status_code}",
+            ),
+            ("full (live kept)", client.introspect(token).get("active") is True, ""),
+        ]
+    finally:
+        shutdown()
+
+
+def main():
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No per-request access log
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as key_dir:
+        base, public_pem, shutdown = start_server(key_dir, CREDENTIAL)
+        try:
+            results = run_checks(base, public_pem)
+        finally:
+            shutdown()
+        results.append(check_closed_by_default(key_dir))
+        results.extend(check_store_full(key_dir))
+
+    failed = False
+    for name, passed, detail in results:
+        suffix = f"  ({detail})" if detail and not passed else ""
+        print(f"{name:<28} {'ok' if passed else 'FAILED'}{suffix}")
+        failed = failed or not passed
+    print(f"{len(results)} checks  {time.perf_counter() - started:.2f}s")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
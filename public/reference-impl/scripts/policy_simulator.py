@@ -0,0 +1,312 @@
+"""
+Offline policy simulator: diff the grants of two policy versions
+
+Replays capability requests through the policy engine with an old and a new
+policy directory and reports every request whose grants differ. Input is
+JSONL, one request per line (``-`` reads stdin; ``.gz`` files are read
+transparently):
+
+    {"operator": "org:acme-corp", "agent_type": "llm-autonomous",
+     "capabilities": ["search.web", "cms.publish"],
+     "purpose": "research_climate_data", "category": "research"}
+
+``capabilities`` may also be a comma-separated string, as in /token requests;
+``purpose`` and ``category`` are optional. ``agent_type`` is carried into the
+output (policies are selected by operator, as on the AS).
+
+Output is JSONL with one record per request whose grants differ (or that
+could not be read), keyed by input line number:
+
+    {"line": 42, "operator": "org:acme-corp", "agent_type": "llm-autonomous",
+     "purpose": "...", "category": null, "requested": ["search.web", "cms.publish"],
+     "added": [], "removed": ["cms.publish"],
+     "changed": {"search.web": {"old": {...}, "new": {...}}}}
+
+A summary (requests unchanged / changed / invalid, newly denied and newly
+granted requests, per-operator and per-action counts) is printed and, with
+--summary, written as JSON.
+
+Input is read lazily and evaluated in batches by a process pool. Each worker
+loads both policy versions once into CompiledPolicyEngine and memoizes the
+diff of every distinct request, so repeated requests cost one dict lookup.
+Only a few batches per worker are in flight at a time, so memory stays flat
+however long the input is.
+
+Usage:
+    python scripts/policy_simulator.py policies/ policies-new/ requests.jsonl.gz --output diffs.jsonl
+    python scripts/policy_simulator.py old/ new/ - --workers 8 --summary summary.json < requests.jsonl
+"""
+
+import argparse
+import contextlib
+import gzip
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Make the as/common packages importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+policy_engine = importlib.import_module("as.policy_engine")
+
+# (first line number, raw lines)
+Batch = Tuple[int, List[str]]
+
+# (differences or None, the differences as a JSON object body, granted
+# anything before, grants anything now)
+Diff = Tuple[Optional[Dict[str, Any]], str, bool, bool]
+
+_COMPACT = (",", ":")
+
+# Per-worker state, set up by init_worker
+_engines: Tuple[Any, Any] = (None, None)
+_memo: "OrderedDict[Tuple[Any, ...], Diff]" = OrderedDict()
+_memo_size = 0
+
+
+def open_text(path: str, mode: str):
+    """Open a text stream: ``-`` for stdin/stdout (left open), gzip for ``.gz``"""
+    if path == "-":
+        return contextlib.nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def init_worker(old_dir: str, new_dir: str, engine: str, cache_size: int):
+    """Load both policy versions (once per worker process)"""
+    global _engines, _memo_size
+    if engine == "compiled":
+        _engines = (
+            policy_engine.CompiledPolicyEngine(old_dir, cache_size=cache_size),
+            policy_engine.CompiledPolicyEngine(new_dir, cache_size=cache_size),
+        )
+    else:
+        _engines = (policy_engine.PolicyEngine(old_dir), policy_engine.PolicyEngine(new_dir))
+    _memo.clear()
+    _memo_size = cache_size
+
+
+def parse_request(line: str) -> Tuple[str, Any, List[str], Optional[str], Optional[str]]:
+    """
+    Read one request row
+
+    Raises:
+        ValueError: If the row is malformed
+    """
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+
+    operator = row.get("operator")
+    if not isinstance(operator, str):
+        raise ValueError("operator must be a string")
+
+    requested = row.get("capabilities", [])
+    if isinstance(requested, str):
+        requested = [action for action in requested.split(",") if action]
+    if not isinstance(requested, list) or not all(isinstance(a, str) for a in requested):
+        raise ValueError("capabilities must be a list of action names")
+
+    purpose, category = row.get("purpose"), row.get("category")
+    for name, value in (("purpose", purpose), ("category", category)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{name} must be a string")
+
+    return operator, row.get("agent_type"), requested, purpose, category
+
+
+def diff_grants(operator: str, requested: List[str], purpose: Optional[str], category: Optional[str]) -> Diff:
+    """
+    Evaluate a request against both policy versions
+
+    Returns:
+        (differences or None, the differences serialized without their
+        enclosing braces, granted anything before, grants anything now)
+    """
+    key = (operator, tuple(requested), purpose, category)
+    cached = _memo.get(key)
+    if cached is not None:
+        return cached
+
+    old, new = _engines
+    before = {c.action: c.to_dict() for c in old.evaluate_capabilities(operator, requested, purpose, category)}
+    after = {c.action: c.to_dict() for c in new.evaluate_capabilities(operator, requested, purpose, category)}
+
+    differences = None
+    serialized = ""
+    if before != after:
+        differences = {
+            "added": sorted(after.keys() - before.keys()),
+            "removed": sorted(before.keys() - after.keys()),
+            "changed": {
+                action: {"old": before[action], "new": after[action]}
+                for action in sorted(before.keys() & after.keys())
+                if before[action] != after[action]
+            },
+        }
+        # Serialized once per distinct request, not once per row
+        serialized = json.dumps(differences, separators=_COMPACT)[1:-1]
+    result = (differences, serialized, bool(before), bool(after))
+
+    if _memo_size > 0:
+        _memo[key] = result
+        if len(_memo) > _memo_size:
+            _memo.popitem(last=False)  # First in, first out
+    return result
+
+
+def simulate_batch(batch: Batch) -> Tuple[List[str], Counter]:
+    """Diff a batch of rows; returns (output records as JSON lines, summary counts)"""
+    first, lines = batch
+    records: List[str] = []
+    counts: Counter = Counter()
+
+    for number, line in enumerate(lines, first):
+        if not line.strip():
+            continue
+        counts["requests"] += 1
+        try:
+            operator, agent_type, requested, purpose, category = parse_request(line)
+        except ValueError as e:  # json.JSONDecodeError is a ValueError
+            counts["invalid"] += 1
+            records.append(json.dumps({"line": number, "error": str(e)}, separators=_COMPACT))
+            continue
+
+        differences, serialized, granted_before, granted_after = diff_grants(operator, requested, purpose, category)
+        counts["operator", operator, "requests"] += 1
+        if differences is None:
+            counts["unchanged"] += 1
+            continue
+
+        counts["changed"] += 1
+        counts["operator", operator, "changed"] += 1
+        if granted_before and not granted_after:
+            counts["newly_denied"] += 1
+        elif granted_after and not granted_before:
+            counts["newly_granted"] += 1
+        for kind in ("added", "removed", "changed"):
+            for action in differences[kind]:
+                counts["action", action, kind] += 1
+
+        record = {
+            "line": number,
+            "operator": operator,
+            "agent_type": agent_type,
+            "purpose": purpose,
+            "category": category,
+            "requested": requested,
+        }
+        records.append(json.dumps(record, separators=_COMPACT)[:-1] + "," + serialized + "}")
+
+    return records, counts
+
+
+def read_batches(stream: Iterable[str], batch_size: int) -> Iterator[Batch]:
+    batch: List[str] = []
+    first = 1
+    for number, line in enumerate(stream, 1):
+        if not batch:
+            first = number
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield first, batch
+            batch = []
+    if batch:
+        yield first, batch
+
+
+def summarize(counts: Counter) -> Dict[str, Any]:
+    """Nested summary document from the flat counters"""
+    summary: Dict[str, Any] = {
+        name: counts[name]
+        for name in ("requests", "unchanged", "changed", "invalid", "newly_denied", "newly_granted")
+    }
+    summary["operators"] = {}
+    summary["actions"] = {}
+    for key, value in sorted((k, v) for k, v in counts.items() if isinstance(k, tuple)):
+        group, name, field = key
+        summary[group + "s"].setdefault(name, {})[field] = value
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff AAP policy grants between two policy versions")
+    parser.add_argument("old", help="Current policy directory")
+    parser.add_argument("new", help="Proposed policy directory")
+    parser.add_argument("input", help="Requests (JSONL, .gz, or - for stdin)")
+    parser.add_argument("--output", default="-", help="Differences (JSONL, .gz, or - for stdout; default: -)")
+    parser.add_argument("--summary", help="Write the summary as JSON to this file")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (0: evaluate in this process)"
+    )
+    parser.add_argument("--batch-size", type=int, default=2000, help="Rows per task sent to a worker")
+    parser.add_argument("--engine", choices=("compiled", "reference"), default="compiled")
+    parser.add_argument(
+        "--cache-size", type=int, default=100_000, help="Distinct requests memoized per worker (0 disables)"
+    )
+    parser.add_argument("--fail-on-change", action="store_true", help="Exit with status 1 if any grant changed")
+    args = parser.parse_args()
+
+    for path in (args.old, args.new):
+        if not os.path.isdir(path):
+            parser.error(f"Not a policy directory: {path}")
+
+    worker_args = (args.old, args.new, args.engine, args.cache_size)
+    started = time.perf_counter()
+    counts: Counter = Counter()
+
+    with open_text(args.input, "r") as source, open_text(args.output, "w") as output:
+        batches = read_batches(source, args.batch_size)
+
+        if args.workers == 0:
+            init_worker(*worker_args)
+            for records, partial in map(simulate_batch, batches):
+                output.writelines(record + "\n" for record in records)
+                counts.update(partial)
+        else:
+            # Pool.imap reads its input eagerly: hold the reader back to a few
+            # batches per worker so memory does not grow with the input
+            in_flight = threading.Semaphore(args.workers * 4)
+
+            def throttled() -> Iterator[Batch]:
+                for batch in batches:
+                    in_flight.acquire()
+                    yield batch
+
+            with multiprocessing.Pool(args.workers, init_worker, worker_args) as pool:
+                for records, partial in pool.imap(simulate_batch, throttled()):
+                    in_flight.release()
+                    output.writelines(record + "\n" for record in records)
+                    counts.update(partial)
+
+    elapsed = time.perf_counter() - started
+    summary = summarize(counts)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    print(
+        f"{summary['requests']} requests in {elapsed:.1f}s "
+        f"({summary['requests'] / max(elapsed, 1e-9):,.0f}/s): "
+        f"{summary['unchanged']} unchanged, {summary['changed']} changed "
+        f"({summary['newly_denied']} newly denied, {summary['newly_granted']} newly granted), "
+        f"{summary['invalid']} invalid",
+        file=sys.stderr,
+    )
+    for action, changes in sorted(summary["actions"].items()):
+        detail = ", ".join(f"{kind} {n}" for kind, n in sorted(changes.items()))
+        print(f"  {action}: {detail}", file=sys.stderr)
+
+    if args.fail_on_change and summary["changed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Register, list, or remove clients in an AAP client registry
+
+The registry is a JSON file or an SQLite database (.db, .sqlite, .sqlite3);
+point the AS at it with AAP_CLIENT_REGISTRY_PATH. A running AS picks up
+changes within a second and drops its verified-credential cache.
+
+Usage:
+    python scripts/register_client.py clients.json add agent-researcher-01 \\
+        --operator org:acme-corp --audience https://api.example.com
+    python scripts/register_client.py clients.json list
+    python scripts/register_client.py clients.json remove agent-researcher-01
+"""
+
+import argparse
+import importlib
+import os
+import secrets
+import sys
+
+# Make the as package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ClientRegistry = importlib.import_module("as.client_registry").ClientRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the AAP client registry")
+    parser.add_argument("registry", help="Registry path (JSON file or SQLite database)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Add or replace a client")
+    add.add_argument("client_id")
+    add.add_argument("--secret", help="Client secret (default: generate one)")
+    add.add_argument("--operator", action="append", default=[], help="Allowed operator (repeatable, * for any)")
+    add.add_argument("--audience", action="append", default=[], help="Allowed audience (repeatable, * for any)")
+
+    commands.add_parser("list", help="List clients")
+
+    remove = commands.add_parser("remove", help="Remove a client")
+    remove.add_argument("client_id")
+
+    args = parser.parse_args()
+    registry = ClientRegistry(args.registry)
+
+    if args.command == "add":
+        secret = args.secret or secrets.token_urlsafe(32)
+        registry.register(args.client_id, secret, args.operator, args.audience)
+        print(f"Registered {args.client_id}")
+        if not args.secret:
+            print(f"Client secret (shown once): {secret}")
+
+    elif args.command == "list":
+        for client in registry.clients():
+            print(
+                f"{client.client_id}  operators={','.join(client.allowed_operators) or '-'}  "
+                f"audiences={','.join(client.allowed_audiences) or '-'}"
+            )
+
+    elif args.command == "remove":
+        if not registry.remove(args.client_id):
+            print(f"No such client: {args.client_id}")
+            sys.exit(1)
+        print(f"Removed {args.client_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Replay a captured RS request trace (AAP_RS_TRACE_DIR) and diff the decisions
+
+Feeds every trace record back through TokenValidator (or CachingTokenValidator)
+and the RS decision steps (capability match, resource scope,
+ConstraintEnforcer, oversight) on a virtual clock set to the time of each
+record, so token expiry, time windows and rate-limit windows behave as
+they did when the trace was captured. Replay is deterministic: the same trace
+gives the same decisions at any speed.
+
+Traces hold no tokens. Each token's redacted claims are re-signed once with a
+throwaway replay key, in the token's original format (reference tokens as
+JWTs), and reused for every record naming that token, so token reuse (and
+the verified-token cache) behaves as in production. Records whose token
+never validated carry no claims and are skipped, as are records of tokens
+whose claims were dropped from the trace. Proof-of-possession, revocation and
+introspection are not replayed.
+
+Reports, per endpoint and overall:
+- decisions: records whose outcome differs from the recorded one
+  (``allowed`` or the error / constraint code), by (recorded, replayed) pair
+- latency: recorded vs replayed authorization time percentiles (recorded
+  times also include PoP, revocation and introspection)
+
+--speed 0 (default) replays as fast as possible; --speed 1 paces records at
+their original intervals (2: twice as fast).
+
+Usage:
+    python scripts/replay_trace.py traces/
+    python scripts/replay_trace.py traces/ --engine compiled --speed 1 --output diffs.jsonl --summary summary.json
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+# Make the rs/common packages importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import cwt
+from rs.authorizer import RequestAuthorizer
+from rs.capability_matcher import CapabilityMatcher, CompiledCapabilityMatcher
+from rs.constraint_enforcer import (
+    RATE_LIMIT_SCOPES,
+    CompiledConstraintEnforcer,
+    ConstraintEnforcer,
+    ConstraintViolationError,
+)
+from rs.resource_matcher import ResourceMatcher
+from rs.trace import read_trace, trace_files
+from rs.validator import CachingTokenValidator, TokenValidator, ValidationError
+
+REPLAY_ISSUER = "https://as.replay.invalid"
+REPLAY_AUDIENCE = "https://rs.replay.invalid"
+
+PERCENTILES = (50, 90, 99)
+
+
+class VirtualClock:
+    """Time source for the validator and enforcer, set to each record's time"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Replayer:
+    """Validator and RS decision steps on a virtual clock, with re-signed tokens"""
+
+    def __init__(self, engine: str, rate_limit_scope: str, cache_size: int):
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        self.signing_key = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        public_key = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+
+        self.clock = VirtualClock()
+        options = dict(
+            public_key=public_key, audience=REPLAY_AUDIENCE, trusted_issuers=[REPLAY_ISSUER], clock=self.clock
+        )
+        if engine == "compiled":
+            self.validator = CachingTokenValidator(cache_size=cache_size, **options)
+            capability_matcher = CompiledCapabilityMatcher(cache_size=cache_size)
+            constraint_enforcer = CompiledConstraintEnforcer(rate_limit_scope, clock=self.clock)
+        else:
+            self.validator = TokenValidator(**options)
+            capability_matcher = CapabilityMatcher()
+            constraint_enforcer = ConstraintEnforcer(rate_limit_scope, clock=self.clock)
+        self.authorizer = RequestAuthorizer(capability_matcher, ResourceMatcher(), constraint_enforcer)
+
+        self.tokens: Dict[str, str] = {}  # pseudonym -> re-signed token
+
+    def learn(self, record: Dict[str, Any]):
+        """Re-sign the claims of a token seen for the first time"""
+        claims = record.get("claims")
+        if claims is None or record["tok"] in self.tokens:
+            return
+        payload = {**claims, "iss": REPLAY_ISSUER, "aud": REPLAY_AUDIENCE}
+        if record.get("fmt") == "cwt":
+            token = cwt.encode_cwt(payload, self.signing_key, "ES256")
+        else:
+            token = jwt.encode(payload, self.signing_key, algorithm="ES256")
+        self.tokens[record["tok"]] = token
+
+    def replay(self, record: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+        """
+        Decide one record at its recorded time
+
+        Returns:
+            (outcome, elapsed ns), or None if the record cannot be replayed
+        """
+        alias = record.get("tok")
+        if alias is not None:
+            self.learn(record)
+            if alias not in self.tokens:
+                return None
+
+        self.clock.now = record["ts"]
+        request_context = {"action": record["a"], "method": record["m"], "content_length": record["len"]}
+        if record.get("tgt"):
+            request_context["target_url"] = record["url"]
+
+        started = time.perf_counter_ns()
+        try:
+            if alias is None:
+                raise ValidationError("invalid_token", "Missing or invalid Authorization header", http_status=401)
+            payload = self.validator.validate(self.tokens[alias], request_context)
+            self.authorizer.authorize(payload, record["a"], request_context, record["url"])
+            outcome = "allowed"
+        except ValidationError as e:
+            outcome = e.error_code
+        except ConstraintViolationError as e:
+            outcome = e.constraint_type
+        return outcome, time.perf_counter_ns() - started
+
+
+def records(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Records of all segments, merged by time (each process writes its own segments)"""
+    return heapq.merge(*(read_trace(path) for path in trace_files(paths)), key=lambda record: record["ts"])
+
+
+def percentiles(histogram: Counter) -> Dict[str, int]:
+    """Percentiles (and max) of microsecond samples counted by value"""
+    total = sum(histogram.values())
+    if not total:
+        return {}
+    result = {}
+    ranks = [(f"p{p}", min(total - 1, total * p // 100)) for p in PERCENTILES]
+    seen = 0
+    for value, n in sorted(histogram.items()):
+        seen += n
+        while ranks and ranks[0][1] < seen:
+            result[ranks.pop(0)[0]] = value
+    result["max"] = value
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an AAP RS request trace and diff the decisions")
+    parser.add_argument("traces", nargs="+", help="Trace directories or segment files")
+    parser.add_argument("--engine", choices=("reference", "compiled"), default="reference", help="RS engine to replay on")
+    parser.add_argument("--rate-limit-scope", choices=RATE_LIMIT_SCOPES, default="token")
+    parser.add_argument("--cache-size", type=int, default=10_000, help="Compiled engine cache sizes")
+    parser.add_argument(
+        "--speed", type=float, default=0.0, help="0: as fast as possible; 1: original pace; 2: twice as fast"
+    )
+    parser.add_argument("--output", help="Write records whose decision differs (JSONL)")
+    parser.add_argument("--summary", help="Write the summary as JSON to this file")
+    parser.add_argument("--fail-on-diff", action="store_true", help="Exit with status 1 if any decision differs")
+    args = parser.parse_args()
+
+    if not trace_files(args.traces):
+        parser.error("No trace segments found")
+
+    replayer = Replayer(args.engine, args.rate_limit_scope, args.cache_size)
+    counts: Counter = Counter()
+    diffs: Counter = Counter()
+    # Latencies counted per microsecond value: exact percentiles in memory
+    # bounded by the latency range, not the trace length
+    recorded_us: Dict[str, Counter] = defaultdict(Counter)
+    replayed_us: Dict[str, Counter] = defaultdict(Counter)
+    output = open(args.output, "w") if args.output else None
+
+    first_ts = None
+    started = time.monotonic()
+    try:
+        for sequence, record in enumerate(records(args.traces)):
+            counts["records"] += 1
+            if args.speed > 0:
+                if first_ts is None:
+                    first_ts = record["ts"]
+                delay = started + (record["ts"] - first_ts) / args.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            result = replayer.replay(record)
+            if result is None:
+                counts["skipped"] += 1
+                continue
+            outcome, elapsed_ns = result
+            counts["replayed"] += 1
+
+            endpoint = record.get("ep") or "-"
+            for key in (endpoint, "all"):
+                recorded_us[key][record["us"]] += 1
+                replayed_us[key][elapsed_ns // 1000] += 1
+
+            if outcome != record["out"]:
+                counts["differ"] += 1
+                diffs[record["out"], outcome] += 1
+                if output is not None:
+                    diff = {
+                        "seq": sequence,
+                        "ts": record["ts"],
+                        "ep": record.get("ep"),
+                        "a": record["a"],
+                        "tok": record.get("tok"),
+                        "recorded": record["out"],
+                        "replayed": outcome,
+                    }
+                    output.write(json.dumps(diff, separators=(",", ":")) + "\n")
+    finally:
+        if output is not None:
+            output.close()
+    elapsed = time.monotonic() - started
+
+    summary = {
+        "records": counts["records"],
+        "replayed": counts["replayed"],
+        "skipped": counts["skipped"],
+        "differ": counts["differ"],
+        "engine": args.engine,
+        "decision_diffs": [
+            {"recorded": recorded, "replayed": replayed, "count": n} for (recorded, replayed), n in diffs.most_common()
+        ],
+        "latency_us": {
+            endpoint: {"recorded": percentiles(recorded_us[endpoint]), "replayed": percentiles(replayed_us[endpoint])}
+            for endpoint in sorted(recorded_us)
+        },
+    }
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    print(
+        f"{summary['records']} records in {elapsed:.1f}s: {summary['replayed']} replayed "
+        f"({args.engine} engine), {summary['skipped']} skipped, {summary['differ']} with a different decision"
+    )
+    for diff in summary["decision_diffs"]:
+        print(f"  {diff['recorded']} -> {diff['replayed']}: {diff['count']}")
+    print(f"{'latency (us)':<24} {'recorded p50/p90/p99':>24} {'replayed p50/p90/p99':>24}")
+    for endpoint, latency in summary["latency_us"].items():
+        columns = [
+            "/".join(str(latency[side].get(f"p{p}", "-")) for p in PERCENTILES) for side in ("recorded", "replayed")
+        ]
+        print(f"{endpoint:<24} {columns[0]:>24} {columns[1]:>24}")
+
+    if args.fail_on_diff and summary["differ"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
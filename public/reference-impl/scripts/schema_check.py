@@ -0,0 +1,163 @@
+"""
+Check that tokens issued by a local Authorization Server pass strict schema validation
+
+Starts the AS in-process on an ephemeral port (fresh signing keys, the
+bundled policies plus a namespace grant) and validates what it issues with
+``TokenValidator(strict_schema=True)`` and the compiled engine's
+``CachingTokenValidator``:
+
+- action:    a token for a concrete action (``search.web``) validates
+- namespace: a token for a namespace (``cms.*``) validates, and the
+             ``cms.*`` capability is kept as issued
+- grammar:   the issued payload with a malformed action name is still
+             rejected by the token schema
+
+Exits with status 1 on any failed check.
+
+Usage:
+    python scripts/schema_check.py
+"""
+
+import glob
+import importlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, List, Tuple
+
+import requests
+from werkzeug.serving import make_server
+
+# Make the as/rs/common packages importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.schemas import TOKEN_SCHEMA, get_validator, schema_error
+from introspection_check import write_keys
+from rs.validator import CachingTokenValidator, TokenValidator, ValidationError
+
+as_config = importlib.import_module("as.config")
+as_server = importlib.import_module("as.server")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIENCE = "https://api.example.com"
+ISSUER = "https://as.example.com"
+CLIENT = {"client_id": "agent-researcher-01", "client_secret": "secret"}
+NAMESPACE = {"action": "cms.*", "description": "Any CMS action"}
+
+
+def write_policies(directory: str) -> str:
+    """Copy the bundled policies, granting the cms.* namespace; returns the policy directory"""
+    policy_dir = os.path.join(directory, "policies")
+    os.makedirs(policy_dir)
+    for path in glob.glob(os.path.join(ROOT, "policies", "*.json")):
+        with open(path) as f:
+            policy = json.load(f)
+        policy["allowed_capabilities"].append(NAMESPACE)
+        with open(os.path.join(policy_dir, os.path.basename(path)), "w") as f:
+            json.dump(policy, f)
+    return policy_dir
+
+
+def start_server(directory: str) -> Tuple[str, bytes, Callable[[], None]]:
+    """Run an AS issuing JWTs; returns (base URL, public PEM, shutdown)"""
+    private_path, public_path, public_pem = write_keys(directory)
+
+    cfg = as_config.ASConfig()
+    cfg.issuer = ISSUER
+    cfg.private_key_path = private_path
+    cfg.public_key_path = public_path
+    cfg.policy_path = write_policies(directory)
+    cfg.token_format = "jwt"
+    cfg.client_registry_path = ""
+
+    app = as_server.create_app(cfg, warm_up=True)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", public_pem, server.shutdown
+
+
+def issue(base: str, capabilities: str) -> str:
+    response = requests.post(
+        f"{base}/token",
+        data=dict(
+            CLIENT,
+            grant_type="client_credentials",
+            operator="org:acme-corp",
+            task_purpose="publish_research_summary",
+            capabilities=capabilities,
+            task_id="schema-check",
+        ),
+        timeout=5,
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def validate(validator: TokenValidator, token: str) -> Tuple[bool, str]:
+    """(passed, detail) of validating a token"""
+    try:
+        validator.validate(token)
+    except ValidationError as e:
+        return False, str(e)
+    return True, ""
+
+
+def run_checks(base: str, public_pem: bytes) -> List[Tuple[str, bool, str]]:
+    results: List[Tuple[str, bool, str]] = []
+    validators = [
+        ("strict", TokenValidator(public_pem, AUDIENCE, [ISSUER], strict_schema=True)),
+        ("compiled", CachingTokenValidator(public_pem, AUDIENCE, [ISSUER], strict_schema=True)),
+    ]
+
+    for name, capabilities in (("action", "search.web"), ("namespace", "cms.*")):
+        token = issue(base, capabilities)
+        for label, validator in validators:
+            passed, detail = validate(validator, token)
+            results.append((f"{name} ({label})", passed, detail))
+
+    # The namespace token last issued, decoded without the schema check
+    payload = TokenValidator(public_pem, AUDIENCE, [ISSUER]).validate(token)
+    actions = [capability["action"] for capability in payload["capabilities"]]
+    results.append(("namespace (issued)", actions == ["cms.*"], f"actions={actions}"))
+
+    # grammar
+    schema = get_validator(TOKEN_SCHEMA)
+    for action in ("cms..publish", "cms.*.publish", "*", "cms.**"):
+        malformed = dict(payload, capabilities=[dict(payload["capabilities"][0], action=action)])
+        error = schema_error(schema, malformed)
+        results.append((
+            f"grammar ({action})",
+            error is not None and error.startswith("capabilities/0/action"),
+            error or "accepted",
+        ))
+
+    return results
+
+
+def main():
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # No per-request access log
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        base, public_pem, shutdown = start_server(directory)
+        try:
+            results = run_checks(base, public_pem)
+        finally:
+            shutdown()
+
+    failed = False
+    for name, passed, detail in results:
+        suffix = f"  ({detail})" if detail and not passed else ""
+        print(f"{name:<28} {'ok' if passed else 'FAILED'}{suffix}")
+        failed = failed or not passed
+    print(f"{len(results)} checks  {time.perf_counter() - started:.2f}s")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()